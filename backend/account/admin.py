@@ -1,11 +1,17 @@
-from .models import BillingAddress, OrderModel
+from .models import BillingAddress, OrderItem, OrderModel
 from django.contrib import admin
 
 class BillingAddressModelAdmin(admin.ModelAdmin):
     list_display = ("id", "name", "user", "phone_number", "pin_code", "house_no", "landmark", "city", "state")
 
+class OrderItemInline(admin.TabularInline):
+    model = OrderItem
+    extra = 0
+    raw_id_fields = ("product",)
+
 class OrderModelAdmin(admin.ModelAdmin):
     list_display = ("id", "name", "address", "ordered_item", "paid_status", "paid_at", "total_price", "is_delivered", "delivered_at", "user")
+    inlines = [OrderItemInline]
 
 admin.site.register(BillingAddress, BillingAddressModelAdmin)
 admin.site.register(OrderModel, OrderModelAdmin)
\ No newline at end of file
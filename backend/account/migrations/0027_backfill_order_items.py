@@ -0,0 +1,53 @@
+from django.db import migrations
+from django.db.models.functions import Lower
+
+from account.ordered_items import parse_ordered_item
+
+BATCH_SIZE = 500
+
+
+def backfill_order_items(apps, schema_editor):
+    OrderModel = apps.get_model('account', 'OrderModel')
+    OrderItem = apps.get_model('account', 'OrderItem')
+    Product = apps.get_model('product', 'Product')
+
+    # Index the catalogue by lowercased name; the earliest product wins
+    # when several share a name.
+    products = {}
+    for product in Product.objects.annotate(lower_name=Lower('name')).order_by('-id').only('id', 'name', 'price'):
+        products[product.lower_name] = product
+
+    orders = OrderModel.objects.filter(items__isnull=True).exclude(ordered_item__isnull=True)
+    items = []
+    for order in orders.only('id', 'ordered_item').iterator(chunk_size=BATCH_SIZE):
+        for name, quantity in parse_ordered_item(order.ordered_item, products):
+            product = products.get(name.lower())
+            if product is None:
+                # Unknown names stay readable in ordered_item only.
+                continue
+            items.append(OrderItem(
+                order_id=order.id,
+                product_id=product.id,
+                product_name=product.name,
+                quantity=quantity,
+                unit_price=product.price,
+            ))
+        if len(items) >= BATCH_SIZE:
+            OrderItem.objects.bulk_create(items)
+            items = []
+    OrderItem.objects.bulk_create(items)
+
+
+def remove_order_items(apps, schema_editor):
+    apps.get_model('account', 'OrderItem').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0026_orderitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_order_items, remove_order_items),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.13 on 2026-10-18 16:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0027_backfill_order_items'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ordermodel',
+            name='checkout_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='ordermodel',
+            constraint=models.UniqueConstraint(fields=('user', 'checkout_key'), name='unique_checkout_key_per_user'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.13 on 2026-10-18 16:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('account', '0028_ordermodel_checkout_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ordermodel',
+            name='user',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='ordermodel',
+            index=models.Index(fields=['user', 'id'], name='order_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordermodel',
+            index=models.Index(fields=['user', 'paid_status', 'is_delivered', 'id'], name='order_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ordermodel',
+            index=models.Index(fields=['paid_status', 'is_delivered', 'id'], name='order_status_idx'),
+        ),
+    ]
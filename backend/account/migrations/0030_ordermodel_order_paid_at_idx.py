@@ -0,0 +1,17 @@
+# Generated by Django 4.2.13 on 2026-10-18 16:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0029_order_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ordermodel',
+            index=models.Index(fields=['paid_at'], name='order_paid_at_idx'),
+        ),
+    ]
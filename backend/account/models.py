@@ -1,6 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.core.validators import RegexValidator
+from django.core.validators import MinValueValidator, RegexValidator
 
 
 class BillingAddress(models.Model):
@@ -29,7 +29,58 @@ class OrderModel(models.Model):
     total_price = models.DecimalField(max_digits=8, decimal_places=2, null=True, blank=True)
     is_delivered = models.BooleanField(default=False)
     delivered_at = models.DateTimeField(null=True, blank=True)
-    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True) 
+    # Covered by order_user_idx.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, db_index=False)
+    # Idempotency-Key sent with the checkout request that created the order.
+    checkout_key = models.CharField(max_length=64, null=True, blank=True, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "checkout_key"], name="unique_checkout_key_per_user"),
+        ]
+        indexes = [
+            # Order lists are newest first (by id) for one user, or for
+            # staff across users filtered by paid/delivered status.
+            models.Index(fields=["user", "id"], name="order_user_idx"),
+            models.Index(fields=["user", "paid_status", "is_delivered", "id"], name="order_user_status_idx"),
+            models.Index(fields=["paid_status", "is_delivered", "id"], name="order_status_idx"),
+            # Sales rollups find newly paid orders by paid_at.
+            models.Index(fields=["paid_at"], name="order_paid_at_idx"),
+        ]
     
     def __str__(self):
-        return f"Order {self.id} - {self.name}" 
\ No newline at end of file
+        return f"Order {self.id} - {self.name}"
+
+
+class OrderItem(models.Model):
+    order = models.ForeignKey(OrderModel, on_delete=models.CASCADE, related_name="items")
+    # Covered by the leading column of orderitem_product_order_idx.
+    product = models.ForeignKey(
+        "product.Product", on_delete=models.SET_NULL, null=True, blank=True,
+        related_name="order_items", db_index=False
+    )
+    # Snapshots taken when the order is placed, so later catalogue edits
+    # or deletions do not rewrite order history.
+    product_name = models.CharField(max_length=200)
+    quantity = models.PositiveIntegerField(default=1, validators=[MinValueValidator(1)])
+    unit_price = models.DecimalField(max_digits=8, decimal_places=2)
+
+    class Meta:
+        indexes = [
+            # Purchase checks look up a product's order lines and join the
+            # order by primary key to test its user and paid status.
+            models.Index(fields=["product", "order"], name="orderitem_product_order_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_name} (order {self.order_id})"
+
+    @property
+    def total_price(self):
+        return self.quantity * self.unit_price
+
+    @classmethod
+    def has_purchased(cls, user, product):
+        return cls.objects.filter(
+            product=product, order__user=user, order__paid_status=True
+        ).exists()
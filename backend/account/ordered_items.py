@@ -0,0 +1,49 @@
+"""Parsing of the legacy free-text ``OrderModel.ordered_item`` field.
+
+Older orders only recorded what was bought as text such as
+``"Office Chair"``, ``"Product 1, Product 2"`` or ``"2 x Rice, Tea (3)"``.
+These helpers turn that text into ``(name, quantity)`` pairs so the
+``OrderItem`` backfill migration can match them against the catalogue.
+"""
+import re
+
+ITEM_SEPARATORS = re.compile(r'[,;\n]+')
+# The multiplier must be set apart by whitespace so names such as
+# "Xbox 360" or "2xl Shirt" are not read as quantities.
+QUANTITY_PATTERNS = [
+    re.compile(r'^(?P<quantity>\d+)\s*[x×*]\s+(?P<name>.+)$', re.IGNORECASE),
+    re.compile(r'^(?P<name>.+?)\s+[x×*]\s*(?P<quantity>\d+)$', re.IGNORECASE),
+    re.compile(r'^(?P<name>.+?)\s*\(\s*[x×]?\s*(?P<quantity>\d+)\s*\)$', re.IGNORECASE),
+]
+PLACEHOLDERS = {'', 'not set'}
+
+
+def parse_item(text, known_names=()):
+    text = text.strip()
+    if text.lower() in known_names:
+        return text, 1
+    for pattern in QUANTITY_PATTERNS:
+        match = pattern.match(text)
+        if match and int(match.group('quantity')) > 0:
+            return match.group('name').strip(), int(match.group('quantity'))
+    return text, 1
+
+
+def parse_ordered_item(text, known_names=()):
+    """Split ``text`` into ``(name, quantity)`` pairs.
+
+    ``known_names`` holds lowercased product names; text matching one of
+    them is kept intact even if the name contains a separator or looks
+    like a quantity.
+    """
+    text = (text or '').strip()
+    if text.lower() in PLACEHOLDERS:
+        return []
+    if text.lower() in known_names:
+        return [(text, 1)]
+
+    items = []
+    for part in ITEM_SEPARATORS.split(text):
+        if part.strip():
+            items.append(parse_item(part, known_names))
+    return items
@@ -1,7 +1,8 @@
-from .models import BillingAddress, OrderModel
+from .models import BillingAddress, OrderItem, OrderModel
 from rest_framework import serializers
 from django.contrib.auth.models import User
 from rest_framework_simplejwt.tokens import RefreshToken
+from my_project.serializers import DynamicFieldsMixin
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -36,9 +37,19 @@ class BillingAddressSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
+class OrderItemSerializer(serializers.ModelSerializer):
+    total_price = serializers.ReadOnlyField()
+
+    class Meta:
+        model = OrderItem
+        fields = ["id", "product", "product_name", "quantity", "unit_price", "total_price"]
+
+
 # all orders list
-class AllOrdersListSerializer(serializers.ModelSerializer):
+class AllOrdersListSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    items = OrderItemSerializer(many=True, read_only=True)
 
     class Meta:
         model = OrderModel
-        fields = "__all__"
\ No newline at end of file
+        # The client's checkout Idempotency-Key stays server-side.
+        exclude = ["checkout_key"]
\ No newline at end of file
@@ -18,6 +18,9 @@ from .serializers import (
     AllOrdersListSerializer
 )
 import logging
+from my_project.filters import parse_bool, parse_date_bound
+from my_project.pagination import KeysetPagination, cursor_requested
+from my_project.serializers import get_requested_fields
 
 logger = logging.getLogger(__name__)
 
@@ -256,21 +259,61 @@ class DeleteUserAddressView(APIView):
             return Response({"details": "Not found."}, status=status.HTTP_404_NOT_FOUND)
 
 
+def filter_orders(orders, params):
+    """Apply the order list filters from ``params``.
+
+    ``paid`` and ``delivered`` take true/false; ``date_from``/``date_to``
+    bound ``paid_at`` (orders have no creation timestamp). Raises
+    ``ValueError`` for values that cannot be parsed.
+    """
+    if params.get("paid"):
+        orders = orders.filter(paid_status=parse_bool(params["paid"]))
+    if params.get("delivered"):
+        orders = orders.filter(is_delivered=parse_bool(params["delivered"]))
+    if params.get("date_from"):
+        orders = orders.filter(paid_at__gte=parse_date_bound(params["date_from"]))
+    if params.get("date_to"):
+        orders = orders.filter(paid_at__lt=parse_date_bound(params["date_to"], end=True))
+    return orders
+
+
 class OrdersListView(APIView):
+    """Orders, newest first: every order for staff, otherwise the user's own.
+
+    Staff can narrow the list with ``?user=<id>``. The full list is returned
+    unless cursor pagination is requested (``?pagination=cursor``).
+    """
 
     permission_classes = [permissions.IsAuthenticated]
+    ordering = ["-id"]
 
     def get(self, request):
-        user_staff_status = request.user.is_staff
-        
-        if user_staff_status:
-            all_users_orders = OrderModel.objects.all()
-            serializer = AllOrdersListSerializer(all_users_orders, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        else:
-            all_orders = OrderModel.objects.filter(user=request.user)
-            serializer = AllOrdersListSerializer(all_orders, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+        params = request.query_params
+        orders = OrderModel.objects.all()
+        if not request.user.is_staff:
+            orders = orders.filter(user=request.user)
+        elif params.get("user"):
+            if not params["user"].isdigit():
+                return Response({"detail": "Invalid user."}, status=status.HTTP_400_BAD_REQUEST)
+            orders = orders.filter(user_id=int(params["user"]))
+
+        try:
+            orders = filter_orders(orders, params)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        fields = get_requested_fields(request)
+        if fields is None or "items" in fields:
+            orders = orders.prefetch_related("items")
+
+        if cursor_requested(request):
+            paginator = KeysetPagination(self.ordering)
+            page = paginator.paginate_queryset(orders, request)
+            serializer = AllOrdersListSerializer(page, many=True, fields=fields)
+            return paginator.get_paginated_response(serializer.data)
+
+        serializer = AllOrdersListSerializer(orders.order_by(*self.ordering), many=True, fields=fields)
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
 class ChangeOrderStatus(APIView):
 
@@ -0,0 +1,31 @@
+from django.contrib import admin
+
+from .models import PaymentMethodRollup, ProductSalesRollup, RollupState, SalesRollup
+
+
+@admin.register(RollupState)
+class RollupStateAdmin(admin.ModelAdmin):
+    list_display = ['name', 'watermark', 'updated_at']
+    readonly_fields = ['name', 'watermark', 'updated_at']
+
+
+@admin.register(SalesRollup)
+class SalesRollupAdmin(admin.ModelAdmin):
+    list_display = ['period', 'start', 'orders', 'units', 'revenue']
+    list_filter = ['period']
+    ordering = ['-start']
+
+
+@admin.register(ProductSalesRollup)
+class ProductSalesRollupAdmin(admin.ModelAdmin):
+    list_display = ['period', 'start', 'product_name', 'units', 'revenue']
+    list_filter = ['period']
+    search_fields = ['product_name']
+    ordering = ['-start']
+
+
+@admin.register(PaymentMethodRollup)
+class PaymentMethodRollupAdmin(admin.ModelAdmin):
+    list_display = ['period', 'start', 'method', 'payments', 'amount']
+    list_filter = ['period', 'method']
+    ordering = ['-start']
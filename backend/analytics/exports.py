@@ -0,0 +1,173 @@
+"""Streaming CSV and NDJSON exports of orders, payments and products.
+
+Each dataset is read with ``values_list(...).iterator(chunk_size=...)`` in
+primary key order and encoded a batch of rows at a time, so memory use does
+not grow with the size of the table. Related names (payment method, user,
+category) are joined into the same query rather than fetched per row.
+"""
+import csv
+from datetime import date, datetime
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+
+from account.models import OrderModel
+from account.views import filter_orders
+from payments.models import Payment
+from payments.views import filter_payments
+from product.models import Product
+from product.search import search_products
+from product.views import filter_products
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+# Rows encoded into one chunk of the response.
+ROWS_PER_CHUNK = 500
+
+
+class Dataset:
+    """An exportable table: its base queryset, columns and list filters.
+
+    ``columns`` maps each output column to the ORM lookup it is read from.
+    ``filter`` applies the same query parameters as the matching list view
+    and may raise ``ValueError``.
+    """
+
+    def __init__(self, get_queryset, columns, filter=None):
+        self.get_queryset = get_queryset
+        self.columns = columns
+        self.filter = filter
+
+    def rows(self, params=None, chunk_size=None):
+        queryset = self.get_queryset()
+        if params and self.filter is not None:
+            queryset = self.filter(queryset, params)
+        return (
+            queryset.order_by('pk').values_list(*self.columns.values())
+            .iterator(chunk_size=chunk_size or settings.EXPORT_CHUNK_SIZE)
+        )
+
+
+def _filter_products(products, params):
+    # filter_products ranks ?search= results by the annotation search_products adds.
+    search = params.get('search', '')
+    if search:
+        products = search_products(products, search)
+    return filter_products(products, params)[0]
+
+
+DATASETS = {
+    'orders': Dataset(
+        OrderModel.objects.all,
+        {
+            'id': 'id',
+            'name': 'name',
+            'user_id': 'user_id',
+            'username': 'user__username',
+            'address': 'address',
+            'total_price': 'total_price',
+            'paid_status': 'paid_status',
+            'paid_at': 'paid_at',
+            'is_delivered': 'is_delivered',
+            'delivered_at': 'delivered_at',
+        },
+        filter_orders,
+    ),
+    'payments': Dataset(
+        Payment.objects.all,
+        {
+            'id': 'id',
+            'transaction_id': 'transaction_id',
+            'user_id': 'user_id',
+            'username': 'user__username',
+            'order_id': 'order_id',
+            'method': 'payment_method__name',
+            'amount': 'amount',
+            'currency': 'currency',
+            'status': 'status',
+            'refund_amount': 'refund_amount',
+            'created_at': 'created_at',
+            'processed_at': 'processed_at',
+        },
+        filter_payments,
+    ),
+    'products': Dataset(
+        Product.objects.all,
+        {
+            'id': 'id',
+            'name': 'name',
+            'category_id': 'category_id',
+            'category': 'category__name',
+            'price': 'price',
+            'stock': 'stock',
+            'is_featured': 'is_featured',
+            'average_rating': 'average_rating',
+            'rating_count': 'rating_count',
+            'created_at': 'created_at',
+        },
+        _filter_products,
+    ),
+}
+
+
+class _Echo:
+    """File-like object whose ``write`` hands back the line csv.writer formats."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def encode_csv(columns, rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(columns)
+    batch = []
+    for row in rows:
+        batch.append(writer.writerow([_csv_value(value) for value in row]))
+        if len(batch) >= ROWS_PER_CHUNK:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def encode_ndjson(columns, rows):
+    encoder = DjangoJSONEncoder()
+    batch = []
+    for row in rows:
+        batch.append(encoder.encode(dict(zip(columns, row))) + '\n')
+        if len(batch) >= ROWS_PER_CHUNK:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+ENCODERS = {
+    'csv': encode_csv,
+    'ndjson': encode_ndjson,
+}
+
+
+def export(name, fmt, params=None, chunk_size=None):
+    """Return a generator of text chunks exporting dataset ``name`` as ``fmt``.
+
+    Filters are applied before the generator is returned, so invalid
+    ``params`` raise ``ValueError`` here rather than halfway through a
+    response. Unknown datasets or formats raise ``KeyError``.
+    """
+    dataset = DATASETS[name]
+    encode = ENCODERS[fmt]
+    try:
+        rows = dataset.rows(params, chunk_size=chunk_size)
+    except ValidationError as exc:
+        raise ValueError(' '.join(exc.messages))
+    return encode(list(dataset.columns), rows)
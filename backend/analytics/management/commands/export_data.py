@@ -0,0 +1,54 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics.exports import DATASETS, ENCODERS, export
+
+
+class Command(BaseCommand):
+    help = 'Stream orders, payments or products as CSV or NDJSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=sorted(DATASETS))
+        parser.add_argument(
+            '--format',
+            dest='fmt',
+            choices=sorted(ENCODERS),
+            default='csv',
+            help='Output format (default: csv)',
+        )
+        parser.add_argument(
+            '--output',
+            help='File to write to (default: stdout)',
+        )
+        parser.add_argument(
+            '--filter',
+            action='append',
+            default=[],
+            metavar='NAME=VALUE',
+            help='List filter, as accepted by the matching API list view; may be repeated',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            help='Rows fetched per database round trip (default: EXPORT_CHUNK_SIZE)',
+        )
+
+    def handle(self, *args, **options):
+        params = {}
+        for item in options['filter']:
+            name, sep, value = item.partition('=')
+            if not sep:
+                raise CommandError(f'Filters must look like NAME=VALUE: {item}')
+            params[name] = value
+
+        try:
+            chunks = export(options['dataset'], options['fmt'], params, chunk_size=options['chunk_size'])
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        if not options['output']:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
+            return
+        with open(options['output'], 'w', encoding='utf-8', newline='') as output:
+            output.writelines(chunks)
+        self.stderr.write(f"Exported {options['dataset']} to {options['output']}.")
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from analytics.rollup import refresh_sales_rollups
+
+
+class Command(BaseCommand):
+    help = 'Refresh the hourly and daily sales rollups from the last watermark.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Discard the rollups and rebuild them from all orders and payments',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        hours, days = refresh_sales_rollups(full=options['full'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {hours} hourly and {days} daily buckets in {time.perf_counter() - started:.2f} s.'
+        ))
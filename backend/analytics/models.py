@@ -0,0 +1,95 @@
+from django.db import models
+from django.utils import timezone
+
+
+PERIODS = [
+    ('hour', 'Hour'),
+    ('day', 'Day'),
+]
+
+
+class RollupState(models.Model):
+    """How far the rollups have been refreshed (see ``analytics.rollup``)."""
+
+    name = models.CharField(max_length=50, unique=True)
+    watermark = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} through {self.watermark}"
+
+
+class SalesRollup(models.Model):
+    """Paid orders per hour or local day."""
+
+    period = models.CharField(max_length=4, choices=PERIODS)
+    start = models.DateTimeField()
+    orders = models.PositiveIntegerField(default=0)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['period', 'start']
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'start'], name='unique_sales_rollup'),
+        ]
+
+    def __str__(self):
+        return f"{self.period} {self.start}: {self.revenue}"
+
+
+class ProductSalesRollup(models.Model):
+    """Units and revenue per product (and its category) per hour or day."""
+
+    period = models.CharField(max_length=4, choices=PERIODS)
+    start = models.DateTimeField()
+    # Plain ids rather than foreign keys, so deleting a product or category
+    # does not rewrite sales history.
+    product_id = models.IntegerField(null=True, blank=True)
+    product_name = models.CharField(max_length=200)
+    category_id = models.IntegerField(null=True, blank=True)
+    units = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['period', 'start']
+        indexes = [
+            models.Index(fields=['period', 'start'], name='product_rollup_period_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.period} {self.start}: {self.product_name} x{self.units}"
+
+
+class PaymentMethodRollup(models.Model):
+    """Completed payments per payment method per hour or day."""
+
+    period = models.CharField(max_length=4, choices=PERIODS)
+    start = models.DateTimeField()
+    method = models.CharField(max_length=20)
+    payments = models.PositiveIntegerField(default=0)
+    amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        ordering = ['period', 'start']
+        constraints = [
+            models.UniqueConstraint(fields=['period', 'start', 'method'], name='unique_payment_method_rollup'),
+        ]
+
+    def __str__(self):
+        return f"{self.period} {self.start}: {self.method} {self.amount}"
+
+
+class RollupChange(models.Model):
+    """A paid order or completed payment that was edited or deleted.
+
+    Those rows no longer show up by their own timestamps, so the next
+    refresh rebuilds the hour of ``occurred_at`` from this record.
+    """
+
+    # paid_at or processed_at of the changed row.
+    occurred_at = models.DateTimeField()
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"change at {self.occurred_at}"
@@ -0,0 +1,192 @@
+"""Incremental refresh of the sales rollup tables.
+
+``refresh_sales_rollups()`` finds the hours touched since the stored
+watermark and rebuilds only those. Touched hours are hours with orders paid
+or payments updated (in any status, so refunds drop out) since the
+watermark, plus the hours of edited or deleted orders recorded as
+``RollupChange`` rows by ``analytics.signals``. Each hour is rebuilt from the
+source tables with a few GROUP BY queries, and the touched local days are
+then re-summed from the hourly rows. Rebuilding whole buckets keeps a
+refresh idempotent. The watermark is moved back by
+``SALES_ROLLUP_LATE_WINDOW_MINUTES`` so rows committed late by slow
+transactions are still picked up.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Max, Sum
+from django.db.models.functions import TruncDay, TruncHour
+from django.utils import timezone
+
+from account.models import OrderItem, OrderModel
+from payments.models import Payment
+
+from .models import PaymentMethodRollup, ProductSalesRollup, RollupChange, RollupState, SalesRollup
+
+STATE_NAME = 'sales'
+HOUR = timedelta(hours=1)
+# Hours rebuilt per transaction.
+CHUNK_HOURS = 24 * 7
+
+
+def _line_total():
+    return ExpressionWrapper(
+        F('quantity') * F('unit_price'), output_field=DecimalField(max_digits=14, decimal_places=2)
+    )
+
+
+def _paid_orders():
+    return OrderModel.objects.filter(paid_status=True, paid_at__isnull=False)
+
+
+def _completed_payments():
+    return Payment.objects.filter(status='completed', processed_at__isnull=False)
+
+
+def touched_hours(since, until):
+    """Hour buckets with source changes in ``[since, until)``; all when ``since`` is None."""
+    orders = _paid_orders().filter(paid_at__lt=until)
+    # Any status: a payment refunded after completing must leave its hour.
+    payments = Payment.objects.filter(processed_at__isnull=False, processed_at__lt=until)
+    changes = RollupChange.objects.filter(created_at__lt=until)
+    if since is not None:
+        orders = orders.filter(paid_at__gte=since)
+        # A payment can complete long after it was created; updated_at says
+        # when its status last changed.
+        payments = payments.filter(updated_at__gte=since)
+        changes = changes.filter(created_at__gte=since)
+
+    hours = set()
+    for queryset, field in ((orders, 'paid_at'), (payments, 'processed_at'), (changes, 'occurred_at')):
+        hours.update(
+            queryset.order_by().annotate(hour=TruncHour(field)).values_list('hour', flat=True).distinct()
+        )
+    return sorted(hours)
+
+
+def rebuild_hours(hours):
+    """Recompute the hourly rollup rows for ``hours`` (hour start datetimes)."""
+    wanted = set(hours)
+    low, high = min(hours), max(hours) + HOUR
+
+    orders = (
+        _paid_orders().filter(paid_at__gte=low, paid_at__lt=high)
+        .order_by().annotate(hour=TruncHour('paid_at')).values('hour')
+        .annotate(orders=Count('id'), revenue=Sum('total_price'))
+    )
+    items = (
+        OrderItem.objects.filter(order__paid_status=True, order__paid_at__gte=low, order__paid_at__lt=high)
+        .order_by().annotate(hour=TruncHour('order__paid_at'))
+        .values('hour', 'product_id', 'product_name', category_id=F('product__category_id'))
+        .annotate(units=Sum('quantity'), revenue=Sum(_line_total()))
+    )
+    payments = (
+        _completed_payments().filter(processed_at__gte=low, processed_at__lt=high)
+        .order_by().annotate(hour=TruncHour('processed_at')).values('hour', method=F('payment_method__name'))
+        .annotate(payments=Count('id'), amount=Sum('amount'))
+    )
+
+    sales = {hour: SalesRollup(period='hour', start=hour) for hour in wanted}
+    for row in orders:
+        if row['hour'] in wanted:
+            sales[row['hour']].orders = row['orders']
+            sales[row['hour']].revenue = row['revenue'] or 0
+    products = []
+    for row in items:
+        if row['hour'] in wanted:
+            sales[row['hour']].units += row['units']
+            products.append(ProductSalesRollup(
+                period='hour', start=row['hour'], product_id=row['product_id'],
+                product_name=row['product_name'], category_id=row['category_id'],
+                units=row['units'], revenue=row['revenue'],
+            ))
+    methods = [
+        PaymentMethodRollup(
+            period='hour', start=row['hour'], method=row['method'],
+            payments=row['payments'], amount=row['amount'],
+        )
+        for row in payments if row['hour'] in wanted
+    ]
+
+    with transaction.atomic():
+        for model in (SalesRollup, ProductSalesRollup, PaymentMethodRollup):
+            model.objects.filter(period='hour', start__in=wanted).delete()
+        SalesRollup.objects.bulk_create(row for row in sales.values() if row.orders or row.units)
+        ProductSalesRollup.objects.bulk_create(products)
+        PaymentMethodRollup.objects.bulk_create(methods)
+
+
+def rebuild_days(days):
+    """Re-sum the daily rows for ``days`` (local midnight datetimes) from the hourly rows."""
+    wanted = set(days)
+    low, high = min(days), max(days) + timedelta(days=1)
+
+    def hourly(model, *dimensions, **sums):
+        rows = (
+            model.objects.filter(period='hour', start__gte=low, start__lt=high)
+            .order_by().annotate(day=TruncDay('start')).values('day', *dimensions).annotate(**sums)
+        )
+        return [row for row in rows if row['day'] in wanted]
+
+    sales = [
+        SalesRollup(period='day', start=row['day'], orders=row['orders'], units=row['units'], revenue=row['revenue'])
+        for row in hourly(SalesRollup, orders=Sum('orders'), units=Sum('units'), revenue=Sum('revenue'))
+    ]
+    products = [
+        ProductSalesRollup(
+            period='day', start=row['day'], product_id=row['product_id'], product_name=row['name'],
+            category_id=row['category_id'], units=row['units'], revenue=row['revenue'],
+        )
+        for row in hourly(
+            ProductSalesRollup, 'product_id', 'category_id',
+            name=Max('product_name'), units=Sum('units'), revenue=Sum('revenue'),
+        )
+    ]
+    methods = [
+        PaymentMethodRollup(
+            period='day', start=row['day'], method=row['method'], payments=row['payments'], amount=row['amount'],
+        )
+        for row in hourly(PaymentMethodRollup, 'method', payments=Sum('payments'), amount=Sum('amount'))
+    ]
+
+    with transaction.atomic():
+        for model in (SalesRollup, ProductSalesRollup, PaymentMethodRollup):
+            model.objects.filter(period='day', start__in=wanted).delete()
+        SalesRollup.objects.bulk_create(sales)
+        ProductSalesRollup.objects.bulk_create(products)
+        PaymentMethodRollup.objects.bulk_create(methods)
+
+
+def local_day(moment):
+    local = timezone.localtime(moment)
+    return local.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def refresh_sales_rollups(full=False, now=None):
+    """Bring the rollups up to date; returns ``(hours, days)`` rebuilt."""
+    until = now or timezone.now()
+    state, _ = RollupState.objects.get_or_create(name=STATE_NAME)
+    since = None
+    if not full and state.watermark is not None:
+        since = state.watermark - timedelta(minutes=settings.SALES_ROLLUP_LATE_WINDOW_MINUTES)
+
+    if full:
+        for model in (SalesRollup, ProductSalesRollup, PaymentMethodRollup):
+            model.objects.all().delete()
+    elif since is not None:
+        # Earlier refreshes have already rebuilt these.
+        RollupChange.objects.filter(created_at__lt=since).delete()
+
+    hours = touched_hours(since, until)
+    for index in range(0, len(hours), CHUNK_HOURS):
+        rebuild_hours(hours[index:index + CHUNK_HOURS])
+
+    days = sorted({local_day(hour) for hour in hours})
+    for index in range(0, len(days), CHUNK_HOURS // 24):
+        rebuild_days(days[index:index + CHUNK_HOURS // 24])
+
+    if full:
+        RollupChange.objects.filter(created_at__lt=until).delete()
+    RollupState.objects.filter(pk=state.pk).update(watermark=until)
+    return len(hours), len(days)
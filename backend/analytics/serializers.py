@@ -0,0 +1,9 @@
+from rest_framework import serializers
+
+from .models import SalesRollup
+
+
+class SalesRollupSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SalesRollup
+        fields = ['start', 'orders', 'units', 'revenue']
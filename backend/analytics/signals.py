@@ -0,0 +1,42 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from account.models import OrderItem, OrderModel
+from payments.models import Payment
+
+from .models import RollupChange
+
+
+def record_change(occurred_at):
+    if occurred_at is not None:
+        RollupChange.objects.create(occurred_at=occurred_at)
+
+
+def paid_at(order_id):
+    return OrderModel.objects.filter(pk=order_id, paid_status=True).values_list('paid_at', flat=True).first()
+
+
+@receiver(pre_save, sender=OrderModel)
+def record_previous_order_hour(sender, instance, raw=False, **kwargs):
+    # The stored row may be moved to another hour or unpaid by this save.
+    if instance.pk is not None and not raw:
+        record_change(paid_at(instance.pk))
+
+
+@receiver(post_save, sender=OrderModel)
+@receiver(post_delete, sender=OrderModel)
+def record_order_hour(sender, instance, **kwargs):
+    if instance.paid_status:
+        record_change(instance.paid_at)
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def record_order_item_hour(sender, instance, **kwargs):
+    record_change(paid_at(instance.order_id))
+
+
+@receiver(post_delete, sender=Payment)
+def record_payment_hour(sender, instance, **kwargs):
+    if instance.status == 'completed':
+        record_change(instance.processed_at)
@@ -0,0 +1,301 @@
+import csv
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from account.models import OrderItem, OrderModel
+from payments.models import Payment, PaymentMethod
+from payments.transitions import transition
+from product.models import Category, Product
+
+from .exports import export
+from .models import PaymentMethodRollup, ProductSalesRollup, RollupState, SalesRollup
+from .rollup import refresh_sales_rollups
+
+
+def local(*args):
+    return timezone.make_aware(datetime(*args))
+
+
+class SalesDataMixin:
+    def create_sales_data(self):
+        self.user = User.objects.create_user(username="shopper", password="testpass123")
+        self.phones = Category.objects.create(name='Phones')
+        self.books = Category.objects.create(name='Books')
+        self.phone = Product.objects.create(name='Phone', price=Decimal('300.00'), category=self.phones)
+        self.book = Product.objects.create(name='Book', price=Decimal('20.00'), category=self.books)
+        self.bkash = PaymentMethod.objects.create(name='bkash', display_name='bKash')
+        self.visa = PaymentMethod.objects.create(name='visa', display_name='Visa')
+
+        self.order(local(2024, 3, 10, 10, 15), [(self.phone, 1), (self.book, 2)], self.bkash)
+        self.order(local(2024, 3, 10, 10, 45), [(self.book, 1)], self.visa)
+        self.order(local(2024, 3, 10, 14, 5), [(self.phone, 2)], self.bkash)
+        self.order(local(2024, 3, 11, 9, 0), [(self.book, 3)], self.bkash)
+        # Unpaid orders are not sales.
+        OrderModel.objects.create(name='Cart', user=self.user, total_price=Decimal('20.00'), paid_status=False)
+
+    def order(self, paid_at, lines, method):
+        total = sum(product.price * quantity for product, quantity in lines)
+        order = OrderModel.objects.create(
+            name='Order', user=self.user, total_price=total, paid_status=True, paid_at=paid_at
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, product_name=product.name, quantity=quantity, unit_price=product.price)
+            for product, quantity in lines
+        ])
+        payment = Payment.objects.create(
+            user=self.user, payment_method=method, amount=total, status='completed',
+            transaction_id=f'RLP{order.id}', processed_at=paid_at,
+        )
+        Payment.objects.filter(pk=payment.pk).update(created_at=paid_at, updated_at=paid_at)
+        return order
+
+
+class SalesRollupRefreshTest(SalesDataMixin, TestCase):
+    def setUp(self):
+        self.create_sales_data()
+
+    def test_full_refresh_builds_hourly_and_daily_rollups(self):
+        hours, days = refresh_sales_rollups(full=True, now=local(2024, 3, 12))
+
+        self.assertEqual((hours, days), (3, 2))
+        hourly = {
+            timezone.localtime(row.start).hour: (row.orders, row.units, row.revenue)
+            for row in SalesRollup.objects.filter(period='hour', start__lt=local(2024, 3, 11))
+        }
+        self.assertEqual(hourly, {10: (2, 4, Decimal('360.00')), 14: (1, 2, Decimal('600.00'))})
+        daily = SalesRollup.objects.filter(period='day').values_list('start', 'orders', 'units', 'revenue')
+        self.assertEqual(list(daily), [
+            (local(2024, 3, 10), 3, 6, Decimal('960.00')),
+            (local(2024, 3, 11), 1, 3, Decimal('60.00')),
+        ])
+
+        day_products = ProductSalesRollup.objects.filter(period='day', start=local(2024, 3, 10))
+        self.assertEqual(
+            {row.product_name: (row.units, row.revenue, row.category_id) for row in day_products},
+            {'Phone': (3, Decimal('900.00'), self.phones.id), 'Book': (3, Decimal('60.00'), self.books.id)},
+        )
+        methods = PaymentMethodRollup.objects.filter(period='day', start=local(2024, 3, 10))
+        self.assertEqual(
+            {row.method: (row.payments, row.amount) for row in methods},
+            {'bkash': (2, Decimal('940.00')), 'visa': (1, Decimal('20.00'))},
+        )
+        self.assertEqual(RollupState.objects.get().watermark, local(2024, 3, 12))
+
+    def test_incremental_refresh_only_rebuilds_new_hours(self):
+        refresh_sales_rollups(now=local(2024, 3, 12))
+        self.order(local(2024, 3, 12, 8, 30), [(self.phone, 1)], self.visa)
+
+        hours, days = refresh_sales_rollups(now=local(2024, 3, 12, 9))
+
+        self.assertEqual((hours, days), (1, 1))
+        self.assertEqual(SalesRollup.objects.filter(period='day').count(), 3)
+        self.assertEqual(
+            SalesRollup.objects.get(period='day', start=local(2024, 3, 12)).revenue, Decimal('300.00')
+        )
+
+    def test_refresh_is_idempotent(self):
+        refresh_sales_rollups(now=local(2024, 3, 12))
+        before = list(SalesRollup.objects.values_list('period', 'start', 'orders', 'units', 'revenue'))
+
+        refresh_sales_rollups(full=True, now=local(2024, 3, 12))
+        refresh_sales_rollups(now=local(2024, 3, 12))
+
+        self.assertEqual(list(SalesRollup.objects.values_list('period', 'start', 'orders', 'units', 'revenue')), before)
+
+    def test_late_payment_completion_updates_its_original_hour(self):
+        now = timezone.now()
+        refresh_sales_rollups(now=now - timedelta(minutes=30))
+        payment = Payment.objects.create(
+            user=self.user, payment_method=self.visa, amount=Decimal('99.00'),
+            transaction_id='LATE', status='processing',
+        )
+        transition(payment, 'processing', 'completed', processed_at=now - timedelta(hours=5))
+
+        refresh_sales_rollups(now=now + timedelta(minutes=1))
+
+        rollup = PaymentMethodRollup.objects.get(period='hour', method='visa', start__gte=now - timedelta(hours=6))
+        self.assertEqual((rollup.payments, rollup.amount), (1, Decimal('99.00')))
+
+    def test_refunded_payment_leaves_its_hour(self):
+        now = timezone.now()
+        payment = Payment.objects.create(
+            user=self.user, payment_method=self.visa, amount=Decimal('99.00'),
+            transaction_id='REFUND', status='processing',
+        )
+        transition(payment, 'processing', 'completed', processed_at=now - timedelta(hours=5))
+        refresh_sales_rollups(now=now)
+        self.assertTrue(PaymentMethodRollup.objects.filter(period='hour', method='visa', start__gte=now - timedelta(hours=6)))
+
+        transition(Payment.objects.get(pk=payment.pk), 'completed', 'refunded')
+        refresh_sales_rollups(now=now + timedelta(minutes=1))
+
+        self.assertFalse(PaymentMethodRollup.objects.filter(method='visa', start__gte=now - timedelta(hours=6)))
+
+    def test_edited_and_deleted_orders_leave_their_hours(self):
+        now = timezone.now()
+        refresh_sales_rollups(now=now)
+        hour_10 = SalesRollup.objects.get(period='hour', start=local(2024, 3, 10, 10))
+        self.assertEqual(hour_10.orders, 2)
+
+        order = OrderModel.objects.get(paid_at=local(2024, 3, 10, 10, 45))
+        order.paid_status = False
+        order.save()
+        OrderModel.objects.get(paid_at=local(2024, 3, 10, 14, 5)).delete()
+        moved = OrderModel.objects.get(paid_at=local(2024, 3, 11, 9, 0))
+        moved.paid_at = local(2024, 3, 11, 12, 30)
+        moved.save()
+        refresh_sales_rollups(now=now + timedelta(minutes=1))
+
+        hourly = {
+            row.start: (row.orders, row.revenue) for row in SalesRollup.objects.filter(period='hour')
+        }
+        self.assertEqual(hourly, {
+            local(2024, 3, 10, 10): (1, Decimal('340.00')),
+            local(2024, 3, 11, 12): (1, Decimal('60.00')),
+        })
+        daily = SalesRollup.objects.filter(period='day').values_list('start', 'orders')
+        self.assertEqual(list(daily), [(local(2024, 3, 10), 1), (local(2024, 3, 11), 1)])
+
+    def test_command(self):
+        out = StringIO()
+        call_command('sales_rollup', '--full', stdout=out)
+        self.assertIn('Rebuilt 3 hourly and 2 daily buckets', out.getvalue())
+
+
+class SalesRollupAPITest(SalesDataMixin, APITestCase):
+    def setUp(self):
+        self.create_sales_data()
+        refresh_sales_rollups(now=local(2024, 3, 12))
+        self.admin = User.objects.create_superuser(username="analyst", email="a@example.com", password="pass12345")
+        self.client.force_authenticate(user=self.admin)
+        self.range = {'date_from': '2024-03-10', 'date_to': '2024-03-11'}
+
+    def test_reports_read_only_rollup_tables(self):
+        for url in ['/api/analytics/sales/', '/api/analytics/products/',
+                    '/api/analytics/categories/', '/api/analytics/payment-methods/']:
+            with self.subTest(url=url), CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url, self.range)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                sql = ' '.join(query['sql'] for query in queries)
+                self.assertNotIn('account_ordermodel', sql)
+                self.assertNotIn('payments_payment"', sql)
+
+    def test_sales_series(self):
+        response = self.client.get('/api/analytics/sales/', self.range)
+
+        self.assertEqual(response.data['refreshed_through'], local(2024, 3, 12))
+        self.assertEqual(
+            [(row['orders'], row['revenue']) for row in response.data['results']],
+            [(3, '960.00'), (1, '60.00')],
+        )
+
+    def test_hourly_series(self):
+        response = self.client.get('/api/analytics/sales/', {'period': 'hour', 'date_from': '2024-03-10', 'date_to': '2024-03-10'})
+        self.assertEqual([row['units'] for row in response.data['results']], [4, 2])
+
+    def test_products_categories_and_payment_mix(self):
+        products = self.client.get('/api/analytics/products/', {**self.range, 'limit': 1}).data['results']
+        self.assertEqual(
+            [(row['product_name'], row['units'], row['revenue']) for row in products],
+            [('Phone', 3, Decimal('900.00'))],
+        )
+
+        categories = self.client.get('/api/analytics/categories/', self.range).data['results']
+        self.assertEqual(
+            [(row['category_name'], row['units']) for row in categories],
+            [('Phones', 3), ('Books', 6)],
+        )
+
+        methods = self.client.get('/api/analytics/payment-methods/', self.range).data['results']
+        self.assertEqual([(row['method'], row['payments']) for row in methods], [('bkash', 3), ('visa', 1)])
+        self.assertAlmostEqual(sum(row['share'] for row in methods), 1, places=3)
+
+    def test_invalid_period(self):
+        response = self.client.get('/api/analytics/sales/', {'period': 'week'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_admin_only(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get('/api/analytics/sales/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ExportTest(SalesDataMixin, APITestCase):
+    def setUp(self):
+        self.create_sales_data()
+        self.admin = User.objects.create_superuser(username="exporter", email="e@example.com", password="pass12345")
+        self.client.force_authenticate(user=self.admin)
+
+    def read(self, response):
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    def test_csv_export_streams_every_row(self):
+        response = self.client.get('/api/analytics/export/orders.csv')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment; filename="orders-', response['Content-Disposition'])
+        rows = list(csv.DictReader(StringIO(self.read(response))))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['username'], 'shopper')
+        self.assertEqual(rows[0]['paid_at'], local(2024, 3, 10, 10, 15).astimezone(dt_timezone.utc).isoformat())
+        self.assertEqual(rows[-1]['paid_status'], 'False')
+
+    def test_ndjson_export_applies_list_filters(self):
+        response = self.client.get('/api/analytics/export/payments.ndjson', {'method': 'bkash'})
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual([row['method'] for row in rows], ['bkash'] * 3)
+        self.assertEqual(rows[0]['amount'], '340.00')
+
+    def test_product_export_applies_search(self):
+        response = self.client.get('/api/analytics/export/products.csv', {'search': 'phone'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = list(csv.DictReader(StringIO(self.read(response))))
+        self.assertEqual([row['name'] for row in rows], ['Phone'])
+
+    def test_export_is_one_query_in_chunks(self):
+        Product.objects.bulk_create(
+            Product(name=f'Bulk {i}', price=Decimal('1.00'), category=self.books) for i in range(30)
+        )
+        chunks = export('products', 'csv', chunk_size=10)
+        with self.assertNumQueries(1):
+            lines = ''.join(chunks).splitlines()
+        self.assertEqual(len(lines), 33)
+        self.assertIn(',Bulk 29,', lines[-1])
+
+    def test_invalid_filter_and_unknown_export(self):
+        response = self.client.get('/api/analytics/export/payments.csv', {'amount_min': 'lots'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get('/api/analytics/export/users.csv')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get('/api/analytics/export/orders.xlsx')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_admin_only(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get('/api/analytics/export/orders.csv')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('export_data', 'orders', '--format', 'ndjson', '--filter', 'paid=false', stdout=out)
+        rows = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([row['name'] for row in rows], ['Cart'])
+
+        with self.assertRaises(CommandError):
+            call_command('export_data', 'orders', '--filter', 'paid')
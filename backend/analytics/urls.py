@@ -0,0 +1,11 @@
+from django.urls import path
+
+from analytics.views import CategorySalesView, ExportView, PaymentMethodMixView, ProductSalesView, SalesSeriesView
+
+urlpatterns = [
+    path('sales/', SalesSeriesView.as_view(), name='analytics-sales'),
+    path('products/', ProductSalesView.as_view(), name='analytics-products'),
+    path('categories/', CategorySalesView.as_view(), name='analytics-categories'),
+    path('payment-methods/', PaymentMethodMixView.as_view(), name='analytics-payment-methods'),
+    path('export/<slug:dataset>.<slug:fmt>', ExportView.as_view(), name='analytics-export'),
+]
@@ -0,0 +1,126 @@
+from datetime import timedelta
+
+from django.db.models import Max, Sum
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from my_project.filters import parse_date_bound
+from product.models import Category
+
+from .exports import DATASETS, FORMATS, export
+from .models import PaymentMethodRollup, ProductSalesRollup, RollupState, SalesRollup
+from .rollup import STATE_NAME
+from .serializers import SalesRollupSerializer
+
+
+class RollupView(APIView):
+    """Base for the read-only reports over the rollup tables.
+
+    ``?period=hour|day`` (default ``day``) picks the rollup granularity and
+    ``date_from``/``date_to`` bound the range; without them the last
+    ``DEFAULT_RANGE`` of the period is returned.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    DEFAULT_RANGE = {'hour': timedelta(hours=48), 'day': timedelta(days=30)}
+
+    def get(self, request):
+        period = request.query_params.get('period', 'day')
+        if period not in self.DEFAULT_RANGE:
+            return Response({"detail": "period must be 'hour' or 'day'."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            date_from = request.query_params.get('date_from')
+            date_to = request.query_params.get('date_to')
+            start = parse_date_bound(date_from) if date_from else timezone.now() - self.DEFAULT_RANGE[period]
+            end = parse_date_bound(date_to, end=True) if date_to else None
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        filters = {'period': period, 'start__gte': start}
+        if end is not None:
+            filters['start__lt'] = end
+        watermark = RollupState.objects.filter(name=STATE_NAME).values_list('watermark', flat=True).first()
+        return Response({
+            'period': period,
+            'refreshed_through': watermark,
+            'results': self.get_results(filters),
+        }, status=status.HTTP_200_OK)
+
+    def get_results(self, filters):
+        raise NotImplementedError
+
+
+class SalesSeriesView(RollupView):
+    """Orders, units and revenue per hour or day."""
+
+    def get_results(self, filters):
+        return SalesRollupSerializer(SalesRollup.objects.filter(**filters).order_by('start'), many=True).data
+
+
+class ProductSalesView(RollupView):
+    """Best-selling products over the range (``?limit=``, default 20)."""
+
+    def get_results(self, filters):
+        try:
+            limit = min(max(int(self.request.query_params.get('limit', 20)), 1), 100)
+        except ValueError:
+            limit = 20
+        return list(
+            ProductSalesRollup.objects.filter(**filters).order_by().values('product_id')
+            .annotate(product_name=Max('product_name'), units=Sum('units'), revenue=Sum('revenue'))
+            .order_by('-revenue', 'product_id')[:limit]
+        )
+
+
+class CategorySalesView(RollupView):
+    """Units and revenue per category over the range."""
+
+    def get_results(self, filters):
+        rows = list(
+            ProductSalesRollup.objects.filter(**filters).order_by().values('category_id')
+            .annotate(units=Sum('units'), revenue=Sum('revenue'))
+            .order_by('-revenue', 'category_id')
+        )
+        names = dict(Category.objects.filter(id__in=[row['category_id'] for row in rows]).values_list('id', 'name'))
+        for row in rows:
+            row['category_name'] = names.get(row['category_id'])
+        return rows
+
+
+class PaymentMethodMixView(RollupView):
+    """Completed payments per method with each method's share of the amount."""
+
+    def get_results(self, filters):
+        rows = list(
+            PaymentMethodRollup.objects.filter(**filters).order_by().values('method')
+            .annotate(payments=Sum('payments'), amount=Sum('amount'))
+            .order_by('-amount', 'method')
+        )
+        total = sum(row['amount'] for row in rows)
+        for row in rows:
+            row['share'] = round(float(row['amount'] / total), 4) if total else 0
+        return rows
+
+
+class ExportView(APIView):
+    """Stream a whole table as CSV or NDJSON, e.g. ``export/payments.csv``.
+
+    Accepts the list filters of the matching list view. Rows are written as
+    they are read, so the response never holds the table in memory.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, dataset, fmt):
+        if dataset not in DATASETS or fmt not in FORMATS:
+            return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            chunks = export(dataset, fmt, request.query_params)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(chunks, content_type=FORMATS[fmt])
+        filename = f'{dataset}-{timezone.localdate().isoformat()}.{fmt}'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
@@ -5,4 +5,5 @@ python -m pip install --upgrade pip
 pip install -r requirements.txt
 python manage.py collectstatic --noinput
 python manage.py migrate
+python manage.py createcachetable
 python manage.py bootstrap_production
\ No newline at end of file
@@ -0,0 +1,39 @@
+"""Parsing helpers for the list filters read from query parameters."""
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+
+def parse_date_bound(value, end=False):
+    """Parse a date or datetime filter value into an aware datetime.
+
+    A bare date covers the whole day, so ``end=True`` returns the start of
+    the following day; use it with ``__lt``. Raises ``ValueError`` for
+    values that cannot be parsed.
+    """
+    # Dates first: parse_datetime() also accepts a bare date as midnight.
+    day = parse_date(value)
+    if day is not None:
+        if end:
+            day += timedelta(days=1)
+        moment = datetime.combine(day, time.min)
+    else:
+        moment = parse_datetime(value)
+        if moment is None:
+            raise ValueError(f'Invalid date: {value}')
+        if end:
+            moment += timedelta(microseconds=1)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def parse_bool(value):
+    """Parse ``true``/``false`` (also ``1``/``0``); raises ``ValueError`` otherwise."""
+    normalized = value.strip().lower()
+    if normalized in ('true', '1'):
+        return True
+    if normalized in ('false', '0'):
+        return False
+    raise ValueError(f'Invalid boolean: {value}')
@@ -0,0 +1,186 @@
+"""Database-backed job queues shared by the payment and image workers.
+
+A queue model has ``status``, ``attempts``, ``max_attempts``,
+``run_after``, ``locked_by``, ``locked_at`` and ``last_error`` columns.
+``JobQueue`` claims due jobs with a conditional UPDATE (so several workers
+never run the same job, without needing ``SELECT ... SKIP LOCKED``), runs
+them and retries failures with exponential backoff. The lock is renewed as
+each job of a claimed batch starts, and a job whose lock is older than the
+lock timeout is handed to another worker.
+``JobWorkerCommand`` is the polling management command around a queue.
+"""
+import logging
+import os
+import signal
+import socket
+import time
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+
+class JobQueue:
+    """Claim, run and retry the jobs of ``model``.
+
+    Subclasses implement ``process()``; ``is_retryable()``, ``retry()`` and
+    ``fail()`` decide what happens to a job that raised.
+    """
+    model = None
+    # Name of the setting holding the lock timeout in seconds.
+    lock_timeout_setting = None
+    select_related = ()
+    retry_base_delay = 5
+    logger = logging.getLogger(__name__)
+
+    def claimable(self, now):
+        stale = now - timedelta(seconds=getattr(settings, self.lock_timeout_setting))
+        return Q(status='queued', run_after__lte=now) | Q(status='running', locked_at__lt=stale)
+
+    def claim(self, worker_id, limit=10):
+        """Lock up to ``limit`` due jobs for ``worker_id`` and return them."""
+        now = timezone.now()
+        candidates = list(
+            self.model.objects.filter(self.claimable(now)).order_by('run_after', 'id')
+            .values_list('id', flat=True)[:limit]
+        )
+        claimed = [
+            job_id for job_id in candidates
+            if self.model.objects.filter(self.claimable(now), pk=job_id).update(
+                status='running', locked_by=worker_id, locked_at=now, attempts=F('attempts') + 1
+            )
+        ]
+        return list(
+            self.model.objects.filter(id__in=claimed).select_related(*self.select_related).order_by('run_after', 'id')
+        )
+
+    def owned(self, job):
+        # Requeueing clears locked_by, so a worker still finishing a job
+        # that was queued again does not overwrite it.
+        return self.model.objects.filter(pk=job.pk, locked_by=job.locked_by)
+
+    def renew_lock(self, job):
+        """Restart the lock timeout of ``job``; False when this worker no longer holds it."""
+        now = timezone.now()
+        if not self.owned(job).filter(status='running').update(locked_at=now):
+            return False
+        job.locked_at = now
+        return True
+
+    def batch(self):
+        """Context manager around each claimed batch; its value is passed to ``process()``."""
+        return nullcontext()
+
+    def process(self, job, context=None):
+        """Do the work of ``job``; the return value is returned by ``run_job()``."""
+        raise NotImplementedError
+
+    def is_retryable(self, exc):
+        return getattr(exc, 'retryable', True)
+
+    def run_job(self, job, context=None):
+        """Process one claimed job; return the result of ``process()``, or False when it raised."""
+        try:
+            result = self.process(job, context)
+        except Exception as exc:
+            self.logger.exception(
+                "%s %s failed (attempt %s/%s)", self.model._meta.verbose_name.capitalize(),
+                job.pk, job.attempts, job.max_attempts,
+            )
+            self.record_failure(job, exc, context)
+            return False
+
+        self.owned(job).update(status='done', last_error='', locked_at=None)
+        return result
+
+    def record_failure(self, job, exc, context=None):
+        if job.attempts < job.max_attempts and self.is_retryable(exc):
+            self.retry(job, exc, context)
+        else:
+            self.fail(job, exc, context)
+
+    def retry(self, job, exc, context=None):
+        """Queue ``job`` again after a backoff; return False when another worker holds it."""
+        return bool(self.owned(job).update(
+            status='queued',
+            run_after=timezone.now() + timedelta(seconds=self.retry_base_delay * 2 ** (job.attempts - 1)),
+            last_error=str(exc),
+            locked_at=None,
+        ))
+
+    def fail(self, job, exc, context=None):
+        """Give up on ``job`` after its last attempt or a permanent error."""
+        self.owned(job).update(status='failed', last_error=str(exc), locked_at=None)
+
+    def run_pending(self, worker_id, batch_size=10):
+        """Process due jobs until none are left; return how many were run."""
+        processed = 0
+        while True:
+            jobs = self.claim(worker_id, limit=batch_size)
+            if not jobs:
+                return processed
+            with self.batch() as context:
+                for job in jobs:
+                    # Jobs late in a slow batch may have been reclaimed by
+                    # another worker meanwhile.
+                    if not self.renew_lock(job):
+                        continue
+                    self.run_job(job, context)
+                    processed += 1
+
+
+class JobWorkerCommand(BaseCommand):
+    """Management command that polls ``queue`` until stopped by SIGTERM or SIGINT."""
+    queue = None
+    # Names the jobs in output, e.g. "payment".
+    noun = 'job'
+    default_poll_interval = 1.0
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process the jobs that are due now and exit',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10,
+            help='Number of jobs to claim at a time (default: 10)',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=self.default_poll_interval,
+            help=f'Seconds to sleep when the queue is empty (default: {self.default_poll_interval:g})',
+        )
+
+    def handle(self, *args, **options):
+        worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        if options['once']:
+            processed = self.queue.run_pending(worker_id, batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Processed {processed} {self.noun} jobs.'))
+            return
+
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        self.stdout.write(f'{self.noun.capitalize()} worker {worker_id} started.')
+
+        while not self.stopping:
+            close_old_connections()
+            processed = self.queue.run_pending(worker_id, batch_size=options['batch_size'])
+            if processed:
+                self.stdout.write(f'Processed {processed} {self.noun} jobs.')
+            else:
+                time.sleep(options['poll_interval'])
+
+        self.stdout.write(f'{self.noun.capitalize()} worker stopped.')
+
+    def _stop(self, signum, frame):
+        # Finish the current batch, then exit.
+        self.stopping = True
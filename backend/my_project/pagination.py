@@ -0,0 +1,105 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def cursor_requested(request):
+    """Keyset pagination is opt-in: ``?pagination=cursor`` or any ``cursor`` parameter."""
+    return request.GET.get('pagination') == 'cursor' or 'cursor' in request.GET
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination that seeks past the last row instead of using OFFSET.
+
+    ``ordering`` must end with a unique field (``id``) so every row has a
+    distinct position. The cursor encodes the sort values of the last row
+    on the page, and no COUNT query is issued.
+    """
+    page_size = 12
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self, ordering):
+        self.ordering = list(ordering)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+        except (binascii.Error, UnicodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def encode_cursor(self, position):
+        # DjangoJSONEncoder drops microseconds, which would skip rows that
+        # share a millisecond, so datetimes keep their full ISO form here.
+        position = [value.isoformat() if isinstance(value, datetime) else value for value in position]
+        raw = json.dumps(position, cls=DjangoJSONEncoder)
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+    def build_filter(self, position):
+        # (a, b, id) > (va, vb, vid) expanded as
+        # a > va OR (a = va AND b > vb) OR (a = va AND b = vb AND id > vid),
+        # with > flipped to < for descending fields.
+        condition = Q()
+        equal = {}
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        position = self.decode_cursor(request)
+        if position is not None:
+            try:
+                queryset = queryset.filter(self.build_filter(position))
+            except (TypeError, ValueError, ValidationError):
+                raise NotFound(self.invalid_cursor_message)
+
+        rows = list(queryset.order_by(*self.ordering)[:page_size + 1])
+        page = rows[:page_size]
+        self.next_position = None
+        if len(rows) > page_size:
+            last = page[-1]
+            self.next_position = [getattr(last, field.lstrip('-')) for field in self.ordering]
+        return page
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
@@ -0,0 +1,17 @@
+def get_requested_fields(request):
+    """Field names from the comma-separated ``?fields=`` parameter, or None."""
+    fields = request.GET.get('fields')
+    if not fields:
+        return None
+    return [field.strip() for field in fields.split(',') if field.strip()]
+
+
+class DynamicFieldsMixin:
+    """Restrict the serialized fields to the optional ``fields`` keyword argument."""
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
@@ -1,4 +1,5 @@
 import os
+from importlib.util import find_spec
 from pathlib import Path
 from datetime import timedelta
 from dotenv import load_dotenv
@@ -46,6 +47,7 @@ INSTALLED_APPS = [
     'product',
     'payments',
     'account',
+    'analytics',
 ]
 
 MIDDLEWARE = [
@@ -226,6 +228,7 @@ CORS_ALLOW_HEADERS = [
     'authorization',
     'content-type',
     'dnt',
+    'idempotency-key',
     'origin',
     'user-agent',
     'x-csrftoken',
@@ -250,7 +253,8 @@ CSRF_COOKIE_SAMESITE = 'Lax'
 APPEND_SLASH = True
 
 # File upload settings
-FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
+# Uploads larger than this are written to a temporary file instead of memory.
+FILE_UPLOAD_MAX_MEMORY_SIZE = 256 * 1024  # 256KB
 DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 FILE_UPLOAD_PERMISSIONS = 0o644
 
@@ -321,13 +325,87 @@ if DEBUG:
     LOGGING['loggers']['payments']['handlers'] = ['file', 'error_file']
     LOGGING['loggers']['account']['handlers'] = ['file', 'error_file']
 
-if not DEBUG:
-    CACHES = {
-        'default': {
+# Cache tier. CACHE_BACKEND selects one of:
+#   locmem   - per-process memory (development default)
+#   file     - files under CACHE_DIR, shared by all workers on a host
+#   database - django_cache_<namespace> tables in the default database (SQLite
+#              locally), created by `manage.py createcachetable`
+#   redis    - REDIS_URL, picked automatically when set and redis-py is installed
+# Each namespace becomes its own cache alias with its own TTL and size cap.
+REDIS_URL = os.getenv('REDIS_URL', '')
+CACHE_DIR = Path(os.getenv('CACHE_DIR') or BASE_DIR / '.cache')
+
+if REDIS_URL and find_spec('redis'):
+    default_cache_backend = 'redis'
+else:
+    default_cache_backend = 'locmem' if DEBUG else 'file'
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', default_cache_backend).lower()
+
+if CACHE_BACKEND == 'redis' and not (REDIS_URL and find_spec('redis')):
+    from django.core.exceptions import ImproperlyConfigured
+
+    raise ImproperlyConfigured('CACHE_BACKEND=redis requires REDIS_URL and the redis package.')
+
+CACHE_NAMESPACES = {
+    'default': {
+        'TIMEOUT': int(os.getenv('DEFAULT_CACHE_TIMEOUT', '300')),
+        'MAX_ENTRIES': int(os.getenv('DEFAULT_CACHE_MAX_ENTRIES', '1000')),
+    },
+    'catalogue': {
+        'TIMEOUT': int(os.getenv('CATALOGUE_CACHE_TIMEOUT', '300')),
+        'MAX_ENTRIES': int(os.getenv('CATALOGUE_CACHE_MAX_ENTRIES', '2000')),
+    },
+}
+
+
+def cache_config(namespace, timeout, max_entries):
+    config = {'TIMEOUT': timeout, 'KEY_PREFIX': namespace}
+    if CACHE_BACKEND == 'redis':
+        # Redis enforces its size cap server-side through maxmemory.
+        config.update({
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        })
+        return config
+
+    config['OPTIONS'] = {'MAX_ENTRIES': max_entries, 'CULL_FREQUENCY': 4}
+    if CACHE_BACKEND == 'file':
+        config.update({
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': str(CACHE_DIR / namespace),
+        })
+    elif CACHE_BACKEND == 'database':
+        config.update({
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': f'django_cache_{namespace}',
+        })
+    else:
+        config.update({
             'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-            'LOCATION': 'auntor-shopping-mall-cache',
-        }
-    }
+            'LOCATION': f'auntor-shopping-mall-{namespace}',
+        })
+    return config
+
+
+CACHES = {
+    namespace: cache_config(namespace, options['TIMEOUT'], options['MAX_ENTRIES'])
+    for namespace, options in CACHE_NAMESPACES.items()
+}
+
+# Each worker reuses its copy of the SiteSettings row for this many seconds
+# before checking the shared version counter that saves bump.
+SITE_SETTINGS_CACHE_TTL = float(os.getenv('SITE_SETTINGS_CACHE_TTL', '30'))
+# Browsers and CDNs may reuse /api/site-settings/ responses for this long.
+SITE_SETTINGS_MAX_AGE = int(os.getenv('SITE_SETTINGS_MAX_AGE', '60'))
+
+# Host used to build catalogue cache keys when warming the cache outside a
+# request. It must be the host clients use, or warmed entries are never hit;
+# Render provides its own as RENDER_EXTERNAL_HOSTNAME. Set CACHE_WARMUP_HOST
+# when a custom domain serves the API.
+CACHE_WARMUP_HOST = os.getenv('CACHE_WARMUP_HOST') or os.getenv('RENDER_EXTERNAL_HOSTNAME') or next(
+    (host for host in ALLOWED_HOSTS if not host.startswith('.') and host != '*'),
+    'localhost',
+)
 
 if not DEBUG:
     EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -347,10 +425,66 @@ PAYMENT_GATEWAYS = {
         'USERNAME': os.getenv('BKASH_USERNAME', ''),
         'PASSWORD': os.getenv('BKASH_PASSWORD', ''),
         'BASE_URL': os.getenv('BKASH_BASE_URL', 'https://tokenized.sandbox.bka.sh/v1.2.0-beta'),
+        'CALLBACK_URL': os.getenv('BKASH_CALLBACK_URL', f'{FRONTEND_URL}/payment/callback'),
         'SANDBOX': DEBUG,
     },
+    'CARD': {
+        'API_KEY': os.getenv('CARD_GATEWAY_API_KEY', ''),
+        'BASE_URL': os.getenv('CARD_GATEWAY_URL', ''),
+    },
+}
+
+# Gateways without credentials/URL are simulated. All gateway calls share one
+# pooled HTTP session; only requests the gateway cannot have acted on
+# (connection errors, 429/503) are retried at the HTTP level.
+PAYMENT_GATEWAY_HTTP = {
+    'CONNECT_TIMEOUT': float(os.getenv('PAYMENT_GATEWAY_CONNECT_TIMEOUT', '3.05')),
+    'READ_TIMEOUT': float(os.getenv('PAYMENT_GATEWAY_READ_TIMEOUT', '15')),
+    'RETRIES': int(os.getenv('PAYMENT_GATEWAY_RETRIES', '2')),
+    'BACKOFF_FACTOR': float(os.getenv('PAYMENT_GATEWAY_BACKOFF_FACTOR', '0.5')),
+    'POOL_SIZE': int(os.getenv('PAYMENT_GATEWAY_POOL_SIZE', '10')),
 }
 
+# Stored responses for Idempotency-Key replays on payment endpoints are kept
+# this long before `purge_idempotency_keys` removes them.
+IDEMPOTENCY_KEY_TTL_HOURS = int(os.getenv('IDEMPOTENCY_KEY_TTL_HOURS', '24'))
+
+# Payments are queued as PaymentJob rows and processed by
+# `manage.py process_payment_jobs`. A worker renews a job's lock as it starts
+# the job, so PAYMENT_JOB_LOCK_TIMEOUT must cover one gateway call (with its
+# retries), not a whole batch; a job locked for longer is handed to another
+# worker, which skips a payment that is still processing.
+PAYMENT_JOB_LOCK_TIMEOUT = int(os.getenv('PAYMENT_JOB_LOCK_TIMEOUT', '300'))
+# Upper bound for PaymentStatusView long polling (?wait=<seconds>). A waiting
+# request holds a gunicorn thread, so keep this short.
+PAYMENT_STATUS_MAX_WAIT = int(os.getenv('PAYMENT_STATUS_MAX_WAIT', '5'))
+# `purge_payment_logs` keeps the payment audit trail for this many days.
+PAYMENT_LOG_RETENTION_DAYS = int(os.getenv('PAYMENT_LOG_RETENTION_DAYS', '365'))
+
+# `manage.py process_image_jobs` resizes uploaded product and site images to
+# these widths (pixels) and saves WebP/AVIF and JPEG/PNG copies beside them.
+IMAGE_DERIVATIVE_WIDTHS = [
+    int(width) for width in os.getenv('IMAGE_DERIVATIVE_WIDTHS', '320,640,1024,1600').split(',') if width.strip()
+]
+IMAGE_DERIVATIVE_QUALITY = int(os.getenv('IMAGE_DERIVATIVE_QUALITY', '80'))
+# Like PAYMENT_JOB_LOCK_TIMEOUT, per image rather than per batch.
+IMAGE_JOB_LOCK_TIMEOUT = int(os.getenv('IMAGE_JOB_LOCK_TIMEOUT', '300'))
+# A worker on another host cannot share local media with the web service;
+# with this set, `process_image_jobs` refuses to start without Cloudinary.
+IMAGE_JOBS_REQUIRE_CLOUDINARY = env_bool('IMAGE_JOBS_REQUIRE_CLOUDINARY', False)
+# Limits on product and site image uploads. Requests whose Content-Length
+# exceeds the request limit are refused before the body is read; the
+# product and site settings forms carry at most two images.
+IMAGE_UPLOAD_MAX_SIZE = int(os.getenv('IMAGE_UPLOAD_MAX_SIZE', str(5 * 1024 * 1024)))
+IMAGE_UPLOAD_MAX_REQUEST_SIZE = int(os.getenv('IMAGE_UPLOAD_MAX_REQUEST_SIZE', str(2 * IMAGE_UPLOAD_MAX_SIZE + 1024 * 1024)))
+IMAGE_UPLOAD_MAX_PIXELS = int(os.getenv('IMAGE_UPLOAD_MAX_PIXELS', str(40_000_000)))
+
+# `manage.py sales_rollup` re-reads this many minutes before its last
+# watermark, so orders and payments committed late are not missed.
+SALES_ROLLUP_LATE_WINDOW_MINUTES = int(os.getenv('SALES_ROLLUP_LATE_WINDOW_MINUTES', '15'))
+# Rows fetched per database round trip by the streaming CSV/NDJSON exports.
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '2000'))
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'Auntor Shopping Mall API',
     'DESCRIPTION': 'API for the Auntor Shopping Mall E-commerce Platform',
@@ -30,6 +30,7 @@ urlpatterns = [
     path('api/', include('product.urls')),
     path('payments/', include('payments.urls')),
     path('account/', include('account.urls')),
+    path('api/analytics/', include('analytics.urls')),
 ]
 
 # Serve static and media files during development
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import PaymentMethod, Payment, BkashPayment, CardPayment, PaymentLog
+from .models import PaymentMethod, Payment, BkashPayment, CardPayment, PaymentLog, IdempotencyKey
 
 
 @admin.register(PaymentMethod)
@@ -21,7 +21,9 @@ class PaymentLogInline(admin.TabularInline):
 class BkashPaymentInline(admin.StackedInline):
     model = BkashPayment
     extra = 0
-    readonly_fields = ['mobile_number', 'bkash_transaction_id', 'sender_reference']
+    readonly_fields = [
+        'mobile_number', 'bkash_transaction_id', 'sender_reference', 'bkash_payment_id', 'bkash_url', 'authorized_at'
+    ]
 
 
 class CardPaymentInline(admin.StackedInline):
@@ -98,4 +100,13 @@ class PaymentLogAdmin(admin.ModelAdmin):
     list_filter = ['status_from', 'status_to', 'created_at']
     search_fields = ['payment__transaction_id', 'message']
     readonly_fields = ['payment', 'status_from', 'status_to', 'message', 'created_at', 'created_by']
-    ordering = ['-created_at']
\ No newline at end of file
+    ordering = ['-created_at']
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ['key', 'scope', 'user', 'status_code', 'created_at']
+    list_filter = ['scope', 'status_code']
+    search_fields = ['key', 'user__username']
+    readonly_fields = ['user', 'key', 'scope', 'request_hash', 'status_code', 'response_body', 'created_at']
+    ordering = ['-created_at']
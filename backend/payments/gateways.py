@@ -0,0 +1,276 @@
+"""Adapters that talk to the external payment gateways.
+
+``get_gateway(method_name)`` returns a shared adapter for a payment method.
+All adapters send their requests through one pooled ``requests.Session``, so
+connections to a gateway are kept alive between payments. Requests have
+connect and read timeouts. A request is retried with backoff only when the
+gateway cannot have acted on it: a connection failure, or a 429/503
+response. A gateway whose credentials are not configured is replaced by a
+simulated one, so development and tests keep working offline.
+``manage.py run_stub_gateway`` serves a local imitation of both gateways.
+"""
+import threading
+import time
+import uuid
+
+import requests
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class GatewayError(Exception):
+    """A gateway call failed.
+
+    ``retryable`` is False when retrying cannot help, e.g. the payment was
+    declined. The job queue then fails the payment at once.
+    """
+
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+def build_session(pool_size=10, retries=2, backoff_factor=0.5):
+    retry = Retry(
+        total=retries,
+        connect=retries,
+        read=0,
+        status=retries,
+        status_forcelist=(429, 503),
+        allowed_methods=frozenset({'GET', 'POST'}),
+        backoff_factor=backoff_factor,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({'Accept': 'application/json'})
+    return session
+
+
+class Gateway:
+    """Base adapter. Subclasses implement ``charge(payment)``.
+
+    ``charge`` returns the fields to store on the payment's details row.
+    Adapters with ``requires_authorization`` also implement
+    ``create(payment)``, which starts a payment the customer must approve
+    before it can be charged.
+    """
+
+    requires_authorization = False
+
+    def __init__(self, config, session=None, timeout=(3.05, 15)):
+        self.config = config
+        self.base_url = config.get('BASE_URL', '').rstrip('/')
+        self.session = session or build_session()
+        self.timeout = timeout
+
+    def charge(self, payment):
+        raise NotImplementedError
+
+    def request(self, method, path, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        try:
+            response = self.session.request(method, f'{self.base_url}{path}', **kwargs)
+        except requests.Timeout as exc:
+            raise GatewayError(f'{self.name} timed out: {exc}') from exc
+        except requests.RequestException as exc:
+            raise GatewayError(f'{self.name} unreachable: {exc}') from exc
+
+        if response.status_code >= 500 or response.status_code == 429:
+            raise GatewayError(f'{self.name} returned HTTP {response.status_code}')
+        return response
+
+    def json(self, response):
+        try:
+            return response.json()
+        except ValueError:
+            raise GatewayError(f'{self.name} returned an invalid response (HTTP {response.status_code})')
+
+
+class BkashGateway(Gateway):
+    """bKash tokenized checkout.
+
+    ``create`` starts the checkout and returns the ``bkashURL`` where the
+    customer approves it; ``charge`` executes it once bKash has redirected
+    the customer back. The grant token is cached per process until shortly
+    before it expires rather than requested for every payment.
+    """
+
+    name = 'bKash'
+    requires_authorization = True
+    TOKEN_EXPIRY_MARGIN = 60
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._token = None
+        self._token_expires_at = 0
+        self._token_lock = threading.Lock()
+
+    def get_token(self, refresh=False):
+        with self._token_lock:
+            if refresh or self._token is None or time.monotonic() >= self._token_expires_at:
+                response = self.request(
+                    'POST',
+                    '/tokenized/checkout/token/grant',
+                    headers={'username': self.config['USERNAME'], 'password': self.config['PASSWORD']},
+                    json={'app_key': self.config['APP_KEY'], 'app_secret': self.config['APP_SECRET']},
+                )
+                data = self._result(response)
+                self._token = data['id_token']
+                self._token_expires_at = (
+                    time.monotonic() + int(data.get('expires_in', 3600)) - self.TOKEN_EXPIRY_MARGIN
+                )
+            return self._token
+
+    def call(self, path, payload):
+        """POST ``payload`` with the cached token, granting a new one on 401."""
+        for refresh in (False, True):
+            response = self.request('POST', path, json=payload, headers={
+                'Authorization': self.get_token(refresh=refresh),
+                'X-APP-Key': self.config['APP_KEY'],
+            })
+            if response.status_code != 401:
+                return self._result(response)
+        raise GatewayError('bKash rejected a freshly granted token', retryable=False)
+
+    def _result(self, response):
+        data = self.json(response)
+        if response.status_code >= 400 or data.get('statusCode', '0000') != '0000':
+            message = data.get('statusMessage') or data.get('errorMessage') or f'HTTP {response.status_code}'
+            raise GatewayError(f'bKash: {message}', retryable=False)
+        return data
+
+    def create(self, payment):
+        created = self.call('/tokenized/checkout/create', {
+            'mode': '0011',
+            'payerReference': payment.bkash_details.mobile_number,
+            'callbackURL': self.config.get('CALLBACK_URL', ''),
+            'amount': str(payment.amount),
+            'currency': payment.currency,
+            'intent': 'sale',
+            'merchantInvoiceNumber': payment.transaction_id,
+        })
+        return {'bkash_payment_id': created['paymentID'], 'bkash_url': created['bkashURL']}
+
+    def charge(self, payment):
+        payment_id = payment.bkash_details.bkash_payment_id
+        if not payment_id:
+            raise GatewayError('bKash payment has not been created', retryable=False)
+        # A retried job may follow an execute whose reply was lost; query the
+        # stored paymentID first so it is never executed twice.
+        result = self.call('/tokenized/checkout/payment/status', {'paymentID': payment_id})
+        if result.get('transactionStatus') != 'Completed':
+            result = self.call('/tokenized/checkout/execute', {'paymentID': payment_id})
+        return {
+            'bkash_transaction_id': result['trxID'],
+            'customer_msisdn': result.get('customerMsisdn') or None,
+        }
+
+
+class CardGateway(Gateway):
+    """Card acquirer API. Card numbers are never stored, so the charge only
+    carries the reference, amount and card summary."""
+
+    name = 'Card gateway'
+
+    def charge(self, payment):
+        details = payment.card_details
+        response = self.request('POST', '/v1/charges', headers={
+            'Authorization': f"Bearer {self.config.get('API_KEY', '')}",
+            'Idempotency-Key': payment.transaction_id,
+        }, json={
+            'reference': payment.transaction_id,
+            'amount': str(payment.amount),
+            'currency': payment.currency,
+            'card_type': details.card_type,
+            'card_last_four': details.card_last_four,
+            'card_holder_name': details.card_holder_name,
+        })
+        data = self.json(response)
+        if response.status_code >= 400 or data.get('status') != 'approved':
+            raise GatewayError(
+                f"Card declined: {data.get('message') or data.get('status') or response.status_code}",
+                retryable=False,
+            )
+        return {'authorization_code': data['authorization_code']}
+
+
+class SimulatedBkashGateway(Gateway):
+    name = 'bKash (simulated)'
+
+    def charge(self, payment):
+        return {'bkash_transaction_id': f"BKS{uuid.uuid4().hex[:8].upper()}"}
+
+
+class SimulatedCardGateway(Gateway):
+    name = 'Card gateway (simulated)'
+
+    def charge(self, payment):
+        return {'authorization_code': f"AUTH{uuid.uuid4().hex[:8].upper()}"}
+
+
+# Payment method name -> (settings key, adapter, fallback used when the
+# gateway is not configured).
+GATEWAY_CLASSES = {
+    'bkash': ('BKASH', BkashGateway, SimulatedBkashGateway),
+    'visa': ('CARD', CardGateway, SimulatedCardGateway),
+    'mastercard': ('CARD', CardGateway, SimulatedCardGateway),
+}
+REQUIRED_SETTINGS = {
+    'BKASH': ('APP_KEY', 'APP_SECRET', 'USERNAME', 'PASSWORD', 'BASE_URL'),
+    'CARD': ('BASE_URL',),
+}
+
+_gateways = {}
+_session = None
+_lock = threading.Lock()
+
+
+def get_session():
+    global _session
+    if _session is None:
+        http = settings.PAYMENT_GATEWAY_HTTP
+        _session = build_session(http['POOL_SIZE'], http['RETRIES'], http['BACKOFF_FACTOR'])
+    return _session
+
+
+def get_gateway(method_name):
+    """Return the shared adapter for ``method_name`` ('bkash', 'visa', ...)."""
+    try:
+        key, gateway_class, fallback_class = GATEWAY_CLASSES[method_name]
+    except KeyError:
+        raise GatewayError(f'No gateway configured for {method_name}', retryable=False)
+
+    with _lock:
+        if key not in _gateways:
+            config = settings.PAYMENT_GATEWAYS.get(key, {})
+            if not all(config.get(name) for name in REQUIRED_SETTINGS[key]):
+                gateway_class = fallback_class
+            http = settings.PAYMENT_GATEWAY_HTTP
+            _gateways[key] = gateway_class(
+                config,
+                session=get_session(),
+                timeout=(http['CONNECT_TIMEOUT'], http['READ_TIMEOUT']),
+            )
+        return _gateways[key]
+
+
+def reset_gateways():
+    """Drop the cached adapters, tokens and pooled connections."""
+    global _session
+    with _lock:
+        _gateways.clear()
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+@receiver(setting_changed)
+def _reset_on_setting_change(setting, **kwargs):
+    if setting in ('PAYMENT_GATEWAYS', 'PAYMENT_GATEWAY_HTTP'):
+        reset_gateways()
@@ -0,0 +1,120 @@
+import hashlib
+import json
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 64
+
+
+def get_ttl():
+    return timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+
+
+def hash_request(request):
+    body = json.dumps(request.data, cls=JSONEncoder, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode('utf-8')).hexdigest()
+
+
+def _claim(user, scope, key, request_hash):
+    """Insert the in-progress marker; return the existing row if the key is taken."""
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                IdempotencyKey.objects.create(user=user, scope=scope, key=key, request_hash=request_hash)
+            return None
+        except IntegrityError:
+            existing = IdempotencyKey.objects.filter(user=user, scope=scope, key=key).first()
+            if existing is None:
+                # Deleted between the insert and the lookup; try again.
+                continue
+            if existing.created_at >= timezone.now() - get_ttl():
+                return existing
+            # Expired but not yet purged: the key may be reused.
+            IdempotencyKey.objects.filter(pk=existing.pk).delete()
+    return None
+
+
+def idempotent(scope):
+    """Make a POST handler safe to retry with an ``Idempotency-Key`` header.
+
+    The first request with a key stores its response; later requests with
+    the same key and body get that response back without running the
+    handler again. A request that arrives while the first is still running
+    gets 409, and reusing a key with a different body gets 422. Server
+    errors are not stored, so they can be retried. Requests without the
+    header are handled as before.
+    """
+
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(view, request, *args, **kwargs):
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if not key:
+                return view_method(view, request, *args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return Response({
+                    'message': f'{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters',
+                    'success': False
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            request_hash = hash_request(request)
+            existing = _claim(request.user, scope, key, request_hash)
+            if existing is not None:
+                if existing.request_hash != request_hash:
+                    return Response({
+                        'message': f'{IDEMPOTENCY_HEADER} was already used for a different request',
+                        'success': False
+                    }, status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+                if existing.status_code is None:
+                    return Response({
+                        'message': 'A request with this key is still being processed',
+                        'success': False
+                    }, status=status.HTTP_409_CONFLICT, headers={'Retry-After': '1'})
+                return Response(
+                    existing.response_body,
+                    status=existing.status_code,
+                    headers={'Idempotent-Replayed': 'true'}
+                )
+
+            record = IdempotencyKey.objects.filter(user=request.user, scope=scope, key=key)
+            try:
+                response = view_method(view, request, *args, **kwargs)
+            except Exception:
+                record.delete()
+                raise
+
+            if response.status_code >= 500:
+                record.delete()
+            else:
+                record.update(
+                    status_code=response.status_code,
+                    response_body=json.loads(json.dumps(response.data, cls=JSONEncoder)),
+                )
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def purge_expired_keys(batch_size=1000):
+    """Delete stored responses older than the TTL in batches; return the count."""
+    cutoff = timezone.now() - get_ttl()
+    deleted = 0
+    while True:
+        ids = list(
+            IdempotencyKey.objects.filter(created_at__lt=cutoff).values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(id__in=ids).delete()[0]
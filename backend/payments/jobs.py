@@ -0,0 +1,118 @@
+"""Database-backed queue that runs payment gateway work outside the request.
+
+The payment serializers create a ``pending`` payment together with a
+``PaymentJob``; ``manage.py process_payment_jobs`` claims due jobs (see
+``my_project.jobs``), charges the payment through its gateway adapter
+(see ``gateways.py``) and records the outcome. Failed attempts are retried
+with exponential backoff unless the gateway reports that retrying cannot
+help.
+"""
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+
+from my_project.jobs import JobQueue
+
+from .gateways import get_gateway
+from .models import BkashPayment, CardPayment, Payment, PaymentJob
+from .transitions import PaymentLogBuffer, transition
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_payment(payment):
+    return PaymentJob.objects.create(payment=payment)
+
+
+PAYMENT_DETAILS = {
+    'bkash': BkashPayment,
+    'visa': CardPayment,
+    'mastercard': CardPayment,
+}
+
+
+def requeue_payment(payment):
+    """Queue the job of ``payment`` to run again now, e.g. after customer approval."""
+    # Clearing locked_by stops a worker still finishing the previous run
+    # from marking the job done.
+    return PaymentJob.objects.filter(payment=payment).update(
+        status='queued', attempts=0, run_after=timezone.now(), locked_by='', locked_at=None, last_error=''
+    )
+
+
+def process_payment(payment, log=None):
+    """Run the gateway call for ``payment`` and mark it completed.
+
+    Returns False without charging unless this call moved the payment from
+    pending to processing: it was cancelled, settled or is being charged by
+    another worker. For gateways that need the
+    customer's approval (bKash) the first run only creates the payment at
+    the gateway; the callback queues the job again once it is approved.
+    """
+    method = payment.payment_method.name
+    gateway = get_gateway(method)
+    if gateway.requires_authorization and not payment.bkash_details.authorized_at:
+        details = payment.bkash_details
+        if not details.bkash_payment_id and Payment.objects.filter(pk=payment.pk, status='pending').exists():
+            created = gateway.create(payment)
+            BkashPayment.objects.filter(pk=details.pk, bkash_payment_id__isnull=True).update(**created)
+        return False
+
+    if transition(payment, 'pending', 'processing', log=log) is None:
+        # Failed attempts put the payment back to pending before retrying, so
+        # one still ``processing`` belongs to a worker that may be charging
+        # it right now, or that died mid-charge and needs reconciling.
+        payment.refresh_from_db(fields=['status'])
+        log_level = logging.WARNING if payment.status == 'processing' else logging.INFO
+        logger.log(log_level, "Skipping payment %s: it is already %s", payment.pk, payment.status)
+        return False
+
+    # The gateway call happens outside any transaction so no locks are held
+    # while waiting on the network.
+    result = gateway.charge(payment)
+
+    with transaction.atomic():
+        PAYMENT_DETAILS[method].objects.filter(payment=payment).update(**result)
+        transition(
+            payment, 'processing', 'completed', log=log,
+            message=f'{payment.payment_method.display_name} payment processed successfully',
+        )
+    return True
+
+
+class PaymentJobQueue(JobQueue):
+    model = PaymentJob
+    lock_timeout_setting = 'PAYMENT_JOB_LOCK_TIMEOUT'
+    select_related = ('payment__payment_method', 'payment__bkash_details', 'payment__card_details')
+    logger = logging.getLogger(__name__)
+
+    def batch(self):
+        # The batch's log rows are written together once it is done.
+        return PaymentLogBuffer()
+
+    def process(self, job, log=None):
+        """Return True when the payment completed."""
+        return process_payment(job.payment, log=log)
+
+    def retry(self, job, exc, log=None):
+        with transaction.atomic():
+            retried = super().retry(job, exc, log)
+            if retried:
+                transition(job.payment_id, 'processing', 'pending', log=log, message=f'Retrying after: {exc}')
+        return retried
+
+    def fail(self, job, exc, log=None):
+        with transaction.atomic():
+            super().fail(job, exc, log)
+            transition(
+                job.payment_id, ('processing', 'pending'), 'failed', log=log,
+                message=f'Payment failed after {job.attempts} attempt(s): {exc}',
+                failure_reason=str(exc),
+            )
+
+
+payment_jobs = PaymentJobQueue()
+claim_jobs = payment_jobs.claim
+run_job = payment_jobs.run_job
+run_pending_jobs = payment_jobs.run_pending
@@ -0,0 +1,82 @@
+import statistics
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from payments.gateways import BkashGateway, CardGateway, GatewayError, build_session
+from payments.models import BkashPayment, CardPayment, Payment
+from payments.stub_gateway import start_stub_gateway
+
+STUB_CREDENTIALS = {
+    'APP_KEY': 'stub', 'APP_SECRET': 'stub', 'USERNAME': 'stub', 'PASSWORD': 'stub', 'API_KEY': 'stub',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Charge synthetic payments through the gateway adapters against the local '
+        'stub gateway and report throughput, latency and connection reuse. '
+        'Nothing is written to the database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--payments', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--gateway', choices=['bkash', 'card'], default='bkash')
+        parser.add_argument('--latency-ms', type=int, default=10, help='Stub delay per request')
+        parser.add_argument('--failure-rate', type=float, default=0.0, help='Share of stub requests that get HTTP 503')
+        parser.add_argument('--retries', type=int, default=2)
+
+    def handle(self, *args, **options):
+        server = start_stub_gateway(latency=options['latency_ms'] / 1000, failure_rate=options['failure_rate'])
+        session = build_session(pool_size=options['concurrency'], retries=options['retries'], backoff_factor=0.05)
+        gateway_class = BkashGateway if options['gateway'] == 'bkash' else CardGateway
+        gateway = gateway_class({**STUB_CREDENTIALS, 'BASE_URL': server.url}, session=session)
+
+        def charge(index):
+            started = time.perf_counter()
+            payment = self._payment(options['gateway'], index)
+            try:
+                if gateway.requires_authorization:
+                    # The stub treats created bKash payments as approved.
+                    payment.bkash_details.bkash_payment_id = gateway.create(payment)['bkash_payment_id']
+                gateway.charge(payment)
+                ok = True
+            except GatewayError:
+                ok = False
+            return ok, time.perf_counter() - started
+
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+                results = list(pool.map(charge, range(options['payments'])))
+        finally:
+            elapsed = time.perf_counter() - started
+            server.shutdown()
+            server.server_close()
+            session.close()
+
+        timings = sorted(duration * 1000 for _, duration in results)
+        failed = sum(1 for ok, _ in results if not ok)
+        self.stdout.write(f'Payments: {len(results)} ({failed} failed) in {elapsed:.2f} s')
+        self.stdout.write(f'Throughput: {len(results) / elapsed:.1f} payments/s')
+        self.stdout.write(
+            f'Latency ms: p50 {statistics.median(timings):.1f}, '
+            f'p95 {timings[int(len(timings) * 0.95) - 1]:.1f}, max {timings[-1]:.1f}'
+        )
+        counters = server.counters
+        self.stdout.write(
+            f"Stub saw {counters['requests']} requests over {counters['connections']} connections, "
+            f"{counters['token_grants']} token grants, {counters['injected_failures']} injected failures"
+        )
+
+    def _payment(self, gateway, index):
+        payment = Payment(amount=Decimal('100.00'), transaction_id=f'BENCH{index}{uuid.uuid4().hex[:6]}')
+        if gateway == 'bkash':
+            BkashPayment(payment=payment, mobile_number='01712345678')
+        else:
+            CardPayment(payment=payment, card_type='visa', card_last_four='4242', card_holder_name='Benchmark')
+        return payment
@@ -0,0 +1,8 @@
+from my_project.jobs import JobWorkerCommand
+from payments.jobs import payment_jobs
+
+
+class Command(JobWorkerCommand):
+    help = 'Run the background worker that processes queued payments.'
+    queue = payment_jobs
+    noun = 'payment'
@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from payments.models import PaymentLog
+from payments.transitions import purge_logs
+
+
+class Command(BaseCommand):
+    help = 'Delete payment logs older than PAYMENT_LOG_RETENTION_DAYS in small batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=settings.PAYMENT_LOG_RETENTION_DAYS,
+            help=f'Number of days of logs to keep (default: {settings.PAYMENT_LOG_RETENTION_DAYS})',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=5000,
+            help='Number of rows to delete per batch (default: 5000)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show how many logs would be deleted without deleting them',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        if options['dry_run']:
+            count = PaymentLog.objects.filter(created_at__lt=cutoff).count()
+            self.stdout.write(f'Would delete {count} payment logs older than {options["days"]} days.')
+            return
+        deleted = purge_logs(cutoff, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Purged {deleted} payment logs older than {options["days"]} days.'))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from payments.stub_gateway import StubGatewayServer
+
+
+class Command(BaseCommand):
+    help = 'Serve a local imitation of the bKash and card gateways for offline testing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8099)
+        parser.add_argument('--latency-ms', type=int, default=0, help='Delay added to every request')
+        parser.add_argument(
+            '--failure-rate',
+            type=float,
+            default=0.0,
+            help='Share of requests answered with HTTP 503 (0-1)',
+        )
+        parser.add_argument('--token-ttl', type=int, default=3600, help='bKash grant token lifetime in seconds')
+
+    def handle(self, *args, **options):
+        server = StubGatewayServer(
+            (options['host'], options['port']),
+            latency=options['latency_ms'] / 1000,
+            failure_rate=options['failure_rate'],
+            token_ttl=options['token_ttl'],
+        )
+        self.stdout.write(
+            f'Stub gateway listening on {server.url}\n'
+            f'Set BKASH_BASE_URL={server.url} and CARD_GATEWAY_URL={server.url} '
+            f'(with non-empty credentials) to use it.'
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f'Requests served: {dict(server.counters)}')
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.13 on 2026-10-18 16:35
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0003_paymentjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='paymentlog',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='paymentlog',
+            index=models.Index(fields=['created_at', 'id'], name='paymentlog_created_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.13 on 2026-10-18 17:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0007_payment_rollup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bkashpayment',
+            name='authorized_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='bkashpayment',
+            name='bkash_payment_id',
+            field=models.CharField(blank=True, max_length=50, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='bkashpayment',
+            name='bkash_url',
+            field=models.URLField(blank=True, max_length=500, null=True),
+        ),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from django.core.validators import MinLengthValidator, MaxLengthValidator
+from rest_framework.utils.encoders import JSONEncoder
 from account.models import OrderModel
 
 
@@ -32,9 +34,11 @@ class Payment(models.Model):
         ('refunded', 'Refunded'),
     ]
     
-    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='payments')
+    # Covered by payment_user_created_idx.
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='payments', db_index=False)
     order = models.OneToOneField(OrderModel, on_delete=models.CASCADE, related_name='payment', null=True, blank=True)
-    payment_method = models.ForeignKey(PaymentMethod, on_delete=models.PROTECT)
+    # Covered by payment_method_created_idx.
+    payment_method = models.ForeignKey(PaymentMethod, on_delete=models.PROTECT, db_index=False)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     currency = models.CharField(max_length=3, default='BDT')
     status = models.CharField(max_length=20, choices=PAYMENT_STATUS, default='pending')
@@ -56,6 +60,17 @@ class Payment(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Payment lists (newest first, keyset paginated) and their filters.
+            models.Index(fields=['created_at', 'id'], name='payment_created_idx'),
+            models.Index(fields=['user', 'created_at', 'id'], name='payment_user_created_idx'),
+            models.Index(fields=['status', 'created_at', 'id'], name='payment_status_created_idx'),
+            models.Index(fields=['payment_method', 'created_at', 'id'], name='payment_method_created_idx'),
+            # Sales rollups find changed payments by updated_at and bucket
+            # them by processed_at.
+            models.Index(fields=['updated_at'], name='payment_updated_idx'),
+            models.Index(fields=['processed_at'], name='payment_processed_idx'),
+        ]
     
     def __str__(self):
         return f"Payment {self.transaction_id} - {self.user.username} - {self.amount} {self.currency}"
@@ -78,6 +93,11 @@ class BkashPayment(models.Model):
     bkash_transaction_id = models.CharField(max_length=50, blank=True, null=True)
     sender_reference = models.CharField(max_length=50, blank=True, null=True)
     customer_msisdn = models.CharField(max_length=15, blank=True, null=True)
+    # Tokenized checkout: the worker creates the bKash payment and stores its
+    # paymentID and approval URL; the callback records the customer's approval.
+    bkash_payment_id = models.CharField(max_length=50, blank=True, null=True, unique=True)
+    bkash_url = models.URLField(max_length=500, blank=True, null=True)
+    authorized_at = models.DateTimeField(blank=True, null=True)
     
     def __str__(self):
         return f"bKash Payment - {self.mobile_number} - {self.payment.amount}"
@@ -105,11 +125,72 @@ class PaymentLog(models.Model):
     status_from = models.CharField(max_length=20)
     status_to = models.CharField(max_length=20)
     message = models.TextField(blank=True)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set by transition() when the status changes, not when a buffered row
+    # is finally inserted.
+    created_at = models.DateTimeField(default=timezone.now)
     created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Retention purges scan by age.
+            models.Index(fields=['created_at', 'id'], name='paymentlog_created_idx'),
+        ]
     
     def __str__(self):
-        return f"Payment {self.payment.transaction_id}: {self.status_from} → {self.status_to}"
\ No newline at end of file
+        return f"Payment {self.payment.transaction_id}: {self.status_from} → {self.status_to}"
+
+
+class PaymentJob(models.Model):
+    """Queue entry that hands a pending payment to the background worker."""
+
+    JOB_STATUS = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    payment = models.OneToOneField(Payment, on_delete=models.CASCADE, related_name='job')
+    status = models.CharField(max_length=10, choices=JOB_STATUS, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=64, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['run_after', 'id']
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='paymentjob_status_run_idx'),
+        ]
+
+    def __str__(self):
+        return f"Job for payment {self.payment_id} ({self.status})"
+
+
+class IdempotencyKey(models.Model):
+    """Outcome of a payment POST, replayed for retries with the same key.
+
+    A row with no ``status_code`` marks a request that is still running.
+    """
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys')
+    key = models.CharField(max_length=64)
+    scope = models.CharField(max_length=50)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    # Stored with DRF's encoder so replays match what the client received.
+    response_body = models.JSONField(null=True, blank=True, encoder=JSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'scope', 'key'], name='unique_idempotency_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.scope} {self.key} ({self.status_code or 'in progress'})"
@@ -1,6 +1,9 @@
+from django.db import transaction
 from rest_framework import serializers
+from .jobs import enqueue_payment
 from .models import PaymentMethod, Payment, BkashPayment, CardPayment, PaymentLog
 from account.models import OrderModel
+from my_project.serializers import DynamicFieldsMixin
 import uuid
 from datetime import datetime
 
@@ -11,7 +14,7 @@ class PaymentMethodSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'display_name', 'is_active', 'icon', 'description']
 
 
-class PaymentSerializer(serializers.ModelSerializer):
+class PaymentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     payment_method_name = serializers.CharField(source='payment_method.display_name', read_only=True)
     
     class Meta:
@@ -28,6 +31,13 @@ class PaymentSerializer(serializers.ModelSerializer):
         ]
 
 
+class AdminPaymentSerializer(PaymentSerializer):
+    username = serializers.CharField(source='user.username', read_only=True)
+
+    class Meta(PaymentSerializer.Meta):
+        fields = PaymentSerializer.Meta.fields + ['user', 'username', 'refund_amount']
+
+
 class BkashPaymentSerializer(serializers.ModelSerializer):
     amount = serializers.DecimalField(max_digits=10, decimal_places=2, write_only=True)
     pin = serializers.CharField(write_only=True, min_length=4, max_length=6)
@@ -53,32 +63,21 @@ class BkashPaymentSerializer(serializers.ModelSerializer):
                 'is_active': True
             }
         )
-        payment = Payment.objects.create(
-            user=request.user,
-            payment_method=payment_method,
-            amount=amount,
-            transaction_id=f"BKS{datetime.now().strftime('%Y%m%d%H%M%S')}{uuid.uuid4().hex[:6].upper()}",
-            mobile_number=validated_data['mobile_number'],
-            status='processing'
-        )
-        
-        bkash_payment = BkashPayment.objects.create(
-            payment=payment,
-            mobile_number=validated_data['mobile_number'],
-            bkash_transaction_id=f"BKS{uuid.uuid4().hex[:8].upper()}"
-        )
-        
-        payment.status = 'completed'
-        payment.processed_at = datetime.now()
-        payment.save()
-        
-        PaymentLog.objects.create(
-            payment=payment,
-            status_from='processing',
-            status_to='completed',
-            message='bKash payment processed successfully',
-            created_by=request.user
-        )
+        with transaction.atomic():
+            payment = Payment.objects.create(
+                user=request.user,
+                payment_method=payment_method,
+                amount=amount,
+                transaction_id=f"BKS{datetime.now().strftime('%Y%m%d%H%M%S')}{uuid.uuid4().hex[:6].upper()}",
+                mobile_number=validated_data['mobile_number'],
+                status='pending'
+            )
+            
+            bkash_payment = BkashPayment.objects.create(
+                payment=payment,
+                mobile_number=validated_data['mobile_number']
+            )
+            enqueue_payment(payment)
         
         return bkash_payment
 
@@ -133,35 +132,24 @@ class CardPaymentSerializer(serializers.ModelSerializer):
                 'is_active': True
             }
         )
-        payment = Payment.objects.create(
-            user=request.user,
-            payment_method=payment_method,
-            amount=amount,
-            transaction_id=f"{card_type.upper()}{datetime.now().strftime('%Y%m%d%H%M%S')}{uuid.uuid4().hex[:6].upper()}",
-            card_last_four=card_last_four,
-            card_brand=card_type,
-            status='processing'
-        )
-        
-        card_payment = CardPayment.objects.create(
-            payment=payment,
-            card_type=card_type,
-            card_last_four=card_last_four,
-            card_holder_name=validated_data['card_holder_name'],
-            authorization_code=f"AUTH{uuid.uuid4().hex[:8].upper()}"
-        )
-        
-        payment.status = 'completed'
-        payment.processed_at = datetime.now()
-        payment.save()
-        
-        PaymentLog.objects.create(
-            payment=payment,
-            status_from='processing',
-            status_to='completed',
-            message=f'{card_type} payment processed successfully',
-            created_by=request.user
-        )
+        with transaction.atomic():
+            payment = Payment.objects.create(
+                user=request.user,
+                payment_method=payment_method,
+                amount=amount,
+                transaction_id=f"{card_type.upper()}{datetime.now().strftime('%Y%m%d%H%M%S')}{uuid.uuid4().hex[:6].upper()}",
+                card_last_four=card_last_four,
+                card_brand=card_type,
+                status='pending'
+            )
+            
+            card_payment = CardPayment.objects.create(
+                payment=payment,
+                card_type=card_type,
+                card_last_four=card_last_four,
+                card_holder_name=validated_data['card_holder_name']
+            )
+            enqueue_payment(payment)
         
         return card_payment
 
@@ -197,7 +185,10 @@ class PaymentDetailSerializer(serializers.ModelSerializer):
         if hasattr(obj, 'bkash_details'):
             return {
                 'mobile_number': obj.bkash_details.mobile_number,
-                'bkash_transaction_id': obj.bkash_details.bkash_transaction_id
+                'bkash_transaction_id': obj.bkash_details.bkash_transaction_id,
+                'bkash_payment_id': obj.bkash_details.bkash_payment_id,
+                # Where the customer approves the payment, until they have.
+                'bkash_url': None if obj.bkash_details.authorized_at else obj.bkash_details.bkash_url,
             }
         return None
     
@@ -0,0 +1,176 @@
+"""A local HTTP server that imitates the bKash tokenized and card gateways.
+
+Point ``BKASH_BASE_URL`` / ``CARD_GATEWAY_URL`` at it (with any non-empty
+credentials) to exercise the real adapters offline. ``latency`` and
+``failure_rate`` slow down or fail (HTTP 503) a share of the requests, and
+``counters`` records what the server saw, so throughput, token reuse and
+connection reuse can be measured. Cards ending in 0002 are declined. A
+created bKash payment counts as approved by the customer straight away,
+and executing it a second time is refused as bKash does.
+"""
+import json
+import random
+import secrets
+import sys
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DECLINED_CARD = '0002'
+
+
+class StubGatewayServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, failure_rate=0.0, token_ttl=3600):
+        super().__init__(address, StubGatewayHandler)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.token_ttl = token_ttl
+        self.tokens = {}
+        self.executed = {}
+        self.counters = Counter()
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def handle_error(self, request, client_address):
+        # Clients that time out hang up before the reply is written.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+
+class StubGatewayHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps connections open between requests.
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; without TCP_NODELAY every
+    # response would wait on the client's delayed ACK.
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.count('connections')
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return self.send_json(400, {'message': 'Invalid JSON'})
+
+        self.server.count('requests')
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if self.server.failure_rate and random.random() < self.server.failure_rate:
+            self.server.count('injected_failures')
+            return self.send_json(503, {'message': 'Service unavailable'})
+
+        routes = {
+            '/tokenized/checkout/token/grant': self.grant_token,
+            '/tokenized/checkout/create': self.create_payment,
+            '/tokenized/checkout/execute': self.execute_payment,
+            '/tokenized/checkout/payment/status': self.query_payment,
+            '/v1/charges': self.charge_card,
+        }
+        handler = routes.get(self.path)
+        if handler is None:
+            return self.send_json(404, {'message': 'Not found'})
+        return handler(body)
+
+    def send_json(self, status, data):
+        payload = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def token_is_valid(self):
+        expires_at = self.server.tokens.get(self.headers.get('Authorization'))
+        return expires_at is not None and expires_at > time.monotonic()
+
+    def grant_token(self, body):
+        if not (self.headers.get('username') and self.headers.get('password') and body.get('app_key')):
+            return self.send_json(200, {'statusCode': '2001', 'statusMessage': 'Invalid App Key'})
+        self.server.count('token_grants')
+        token = secrets.token_hex(16)
+        with self.server.lock:
+            self.server.tokens[token] = time.monotonic() + self.server.token_ttl
+        return self.send_json(200, {
+            'statusCode': '0000',
+            'statusMessage': 'Successful',
+            'id_token': token,
+            'token_type': 'Bearer',
+            'expires_in': self.server.token_ttl,
+            'refresh_token': secrets.token_hex(16),
+        })
+
+    def create_payment(self, body):
+        if not self.token_is_valid():
+            return self.send_json(401, {'message': 'Unauthorized'})
+        self.server.count('bkash_payments')
+        payment_id = f'TR{secrets.token_hex(8).upper()}'
+        return self.send_json(200, {
+            'statusCode': '0000',
+            'statusMessage': 'Successful',
+            'paymentID': payment_id,
+            'bkashURL': f'{self.server.url}/checkout/{payment_id}',
+            'amount': body.get('amount'),
+            'currency': body.get('currency'),
+            'merchantInvoiceNumber': body.get('merchantInvoiceNumber'),
+            'transactionStatus': 'Initiated',
+        })
+
+    def execute_payment(self, body):
+        if not self.token_is_valid():
+            return self.send_json(401, {'message': 'Unauthorized'})
+        payment_id = body.get('paymentID')
+        with self.server.lock:
+            if payment_id in self.server.executed:
+                return self.send_json(200, {
+                    'statusCode': '2062', 'statusMessage': 'The payment has already been completed',
+                })
+            self.server.executed[payment_id] = secrets.token_hex(5).upper()
+        self.server.count('bkash_executions')
+        return self.query_payment(body)
+
+    def query_payment(self, body):
+        if not self.token_is_valid():
+            return self.send_json(401, {'message': 'Unauthorized'})
+        trx_id = self.server.executed.get(body.get('paymentID'))
+        return self.send_json(200, {
+            'statusCode': '0000',
+            'statusMessage': 'Successful',
+            'paymentID': body.get('paymentID'),
+            'trxID': trx_id or '',
+            'customerMsisdn': '01770618575',
+            'transactionStatus': 'Completed' if trx_id else 'Initiated',
+        })
+
+    def charge_card(self, body):
+        self.server.count('card_charges')
+        if body.get('card_last_four') == DECLINED_CARD:
+            return self.send_json(402, {'status': 'declined', 'message': 'Insufficient funds'})
+        return self.send_json(200, {
+            'status': 'approved',
+            'reference': body.get('reference'),
+            'authorization_code': secrets.token_hex(4).upper(),
+        })
+
+
+def start_stub_gateway(host='127.0.0.1', port=0, **options):
+    """Serve the stub from a background thread; call ``shutdown()`` when done."""
+    server = StubGatewayServer((host, port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -1,11 +1,23 @@
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
 from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
+from datetime import timedelta
 from decimal import Decimal
-from unittest.mock import patch
+from io import StringIO
+from unittest import skipIf
+from unittest.mock import Mock, patch
+import threading
 
-from .models import PaymentMethod, Payment, BkashPayment, CardPayment
+from . import idempotency
+from .gateways import BkashGateway, CardGateway, GatewayError, build_session
+from .jobs import claim_jobs, run_pending_jobs
+from .stub_gateway import start_stub_gateway
+from .transitions import InvalidTransition, PaymentLogBuffer, transition
+from .models import PaymentMethod, Payment, BkashPayment, CardPayment, IdempotencyKey, PaymentJob, PaymentLog
 from account.models import OrderModel
 
 
@@ -306,4 +318,715 @@ class PaymentSecurityTest(APITestCase):
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['transaction_id'], 'USER1_PAYMENT')
\ No newline at end of file
+        self.assertEqual(response.data[0]['transaction_id'], 'USER1_PAYMENT')
+
+class IdempotencyKeyTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="payer", password="testpass123")
+        self.client.force_authenticate(user=self.user)
+        self.payload = {'mobile_number': '01712345678', 'amount': '150.00', 'pin': '12345'}
+
+    def _pay(self, key, payload=None):
+        return self.client.post(
+            '/payments/bkash/', payload or self.payload, format='json', HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_replay_returns_original_response(self):
+        first = self._pay('retry-1')
+        replay = self._pay('retry-1')
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(replay.status_code, status.HTTP_200_OK)
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(
+            replay.data['payment']['transaction_id'],
+            first.data['payment']['transaction_id']
+        )
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_without_key_each_request_creates_a_payment(self):
+        self.client.post('/payments/bkash/', self.payload, format='json')
+        self.client.post('/payments/bkash/', self.payload, format='json')
+        self.assertEqual(Payment.objects.count(), 2)
+
+    def test_key_reused_with_different_body_is_rejected(self):
+        self._pay('retry-2')
+        response = self._pay('retry-2', {**self.payload, 'amount': '999.00'})
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_keys_are_scoped_per_user_and_endpoint(self):
+        self._pay('shared')
+        self.client.post('/payments/mock-payment/', {'amount': 10}, format='json', HTTP_IDEMPOTENCY_KEY='shared')
+        other = User.objects.create_user(username="other", password="testpass123")
+        self.client.force_authenticate(user=other)
+        self._pay('shared')
+
+        self.assertEqual(Payment.objects.count(), 3)
+
+    def test_validation_errors_are_replayed(self):
+        bad = {**self.payload, 'mobile_number': '123'}
+        first = self._pay('bad-1', bad)
+        replay = self._pay('bad-1', bad)
+
+        self.assertEqual(first.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(replay.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(replay.data, first.data)
+
+    def test_purge_removes_expired_keys(self):
+        self._pay('old')
+        self._pay('fresh')
+        IdempotencyKey.objects.filter(key='old').update(created_at=timezone.now() - timedelta(days=2))
+
+        out = StringIO()
+        call_command('purge_idempotency_keys', batch_size=1, stdout=out)
+
+        self.assertIn('Purged 1', out.getvalue())
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['fresh'])
+
+    def test_expired_key_can_be_reused(self):
+        self._pay('expired')
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+
+        response = self._pay('expired')
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Payment.objects.count(), 2)
+
+
+class IdempotencyClaimRaceTest(APITestCase):
+    """The claim race, made deterministic: another request takes the key
+    just before this request inserts it, so this request's insert loses."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="racer", password="testpass123")
+        self.client.force_authenticate(user=self.user)
+        self.payload = {'mobile_number': '01712345678', 'amount': '75.00', 'pin': '12345'}
+
+    def _pay(self):
+        return self.client.post('/payments/bkash/', self.payload, format='json', HTTP_IDEMPOTENCY_KEY='double-click')
+
+    def _lose_claim_to(self, winner):
+        """Run ``winner(request_hash)`` once, after the request is hashed and
+        before its key is claimed, so the request's own insert then fails."""
+        hash_request = idempotency.hash_request
+        ran = []
+
+        def hash_then_lose(request):
+            request_hash = hash_request(request)
+            if not ran:
+                ran.append(True)
+                winner(request_hash)
+            return request_hash
+
+        return patch('payments.idempotency.hash_request', side_effect=hash_then_lose)
+
+    def test_loser_replays_the_finished_winner(self):
+        winner = []
+        with self._lose_claim_to(lambda request_hash: winner.append(self._pay())):
+            loser = self._pay()
+
+        self.assertEqual((winner[0].status_code, loser.status_code), (200, 200))
+        self.assertEqual(loser['Idempotent-Replayed'], 'true')
+        self.assertEqual(loser.data, winner[0].data)
+        self.assertEqual(Payment.objects.count(), 1)
+
+    def test_loser_gets_409_while_the_winner_is_running(self):
+        def start_winner(request_hash):
+            IdempotencyKey.objects.create(user=self.user, scope='bkash', key='double-click', request_hash=request_hash)
+
+        with self._lose_claim_to(start_winner):
+            loser = self._pay()
+
+        self.assertEqual(loser.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Payment.objects.count(), 0)
+        self.assertIsNone(IdempotencyKey.objects.get().status_code)
+
+
+# The in-memory SQLite test database takes table locks that fail at once
+# instead of waiting, so concurrent writers error out nondeterministically.
+# IdempotencyClaimRaceTest covers the same race on every database.
+@skipIf(connection.vendor == 'sqlite', 'needs a database that handles concurrent writers')
+class IdempotencyConcurrencyTest(TransactionTestCase):
+    THREADS = 6
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="racer", password="testpass123")
+
+    def test_same_key_from_several_threads_creates_one_payment(self):
+        barrier = threading.Barrier(self.THREADS)
+        responses = []
+        errors = []
+
+        def pay():
+            client = APIClient()
+            client.force_authenticate(user=self.user)
+            barrier.wait()
+            try:
+                responses.append(client.post(
+                    '/payments/mock-payment/',
+                    {'payment_method': 'cash', 'amount': '75.00'},
+                    format='json',
+                    HTTP_IDEMPOTENCY_KEY='double-click',
+                ))
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=pay) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(responses), self.THREADS)
+        self.assertEqual(Payment.objects.count(), 1)
+        self.assertTrue(all(r.status_code in (200, 409) for r in responses))
+        transaction_ids = {r.data['transaction_id'] for r in responses if r.status_code == 200}
+        self.assertEqual(transaction_ids, {Payment.objects.get().transaction_id})
+
+
+class PaymentJobQueueTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="queued", password="testpass123")
+        self.client.force_authenticate(user=self.user)
+
+    def _pay(self):
+        response = self.client.post('/payments/bkash/', {
+            'mobile_number': '01712345678', 'amount': '80.00', 'pin': '1234'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return Payment.objects.get(transaction_id=response.data['payment']['transaction_id'])
+
+    def test_payment_is_accepted_as_pending_and_completed_by_worker(self):
+        payment = self._pay()
+        self.assertEqual(payment.status, 'pending')
+        self.assertEqual(payment.job.status, 'queued')
+        self.assertIsNone(payment.bkash_details.bkash_transaction_id)
+
+        out = StringIO()
+        call_command('process_payment_jobs', '--once', stdout=out)
+
+        payment.refresh_from_db()
+        self.assertIn('Processed 1', out.getvalue())
+        self.assertEqual(payment.status, 'completed')
+        self.assertIsNotNone(payment.processed_at)
+        self.assertTrue(BkashPayment.objects.get(payment=payment).bkash_transaction_id.startswith('BKS'))
+        self.assertEqual(payment.job.status, 'done')
+        self.assertEqual(
+            list(payment.logs.order_by('id').values_list('status_from', 'status_to')),
+            [('pending', 'processing'), ('processing', 'completed')],
+        )
+
+    def test_claimed_job_is_not_claimed_twice(self):
+        self._pay()
+        self.assertEqual(len(claim_jobs('worker-a')), 1)
+        self.assertEqual(claim_jobs('worker-b'), [])
+
+    def test_stale_running_job_is_reclaimed(self):
+        payment = self._pay()
+        claim_jobs('crashed-worker')
+        PaymentJob.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+
+        jobs = claim_jobs('worker-b')
+        self.assertEqual([job.payment_id for job in jobs], [payment.id])
+        self.assertEqual(jobs[0].attempts, 2)
+
+    def test_gateway_errors_are_retried_then_fail_the_payment(self):
+        payment = self._pay()
+        gateway = Mock(requires_authorization=False, **{'charge.side_effect': GatewayError('gateway down')})
+        with patch('payments.jobs.get_gateway', return_value=gateway):
+            for attempt in range(3):
+                PaymentJob.objects.update(run_after=timezone.now())
+                run_pending_jobs('worker')
+
+        payment.refresh_from_db()
+        job = payment.job
+        self.assertEqual(gateway.charge.call_count, 3)
+        self.assertEqual(job.attempts, 3)
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(payment.status, 'failed')
+        self.assertEqual(payment.failure_reason, 'gateway down')
+
+    def test_settled_payment_is_not_charged(self):
+        payment = self._pay()
+        transition(payment, 'pending', 'cancelled')
+        gateway = Mock(requires_authorization=False)
+        with patch('payments.jobs.get_gateway', return_value=gateway):
+            run_pending_jobs('worker')
+
+        gateway.charge.assert_not_called()
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'cancelled')
+        self.assertEqual(payment.job.status, 'done')
+
+    def test_reclaimed_processing_payment_is_not_charged_again(self):
+        payment = self._pay()
+        claim_jobs('crashed-worker')
+        transition(payment, 'pending', 'processing')
+        PaymentJob.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        gateway = Mock(requires_authorization=False)
+        with patch('payments.jobs.get_gateway', return_value=gateway):
+            run_pending_jobs('worker-b')
+
+        gateway.charge.assert_not_called()
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'processing')
+
+    def test_lock_is_renewed_per_job_and_reclaimed_jobs_are_skipped(self):
+        first, second = self._pay(), self._pay()
+        started = timezone.now()
+
+        def slow_charge(payment):
+            # While the first charge is slow, another worker takes over the
+            # second job of the batch.
+            self.assertGreaterEqual(PaymentJob.objects.get(payment=first).locked_at, started)
+            PaymentJob.objects.filter(payment=second).update(locked_by='worker-b')
+            return {'bkash_transaction_id': 'BKSLOW'}
+
+        gateway = Mock(requires_authorization=False, **{'charge.side_effect': slow_charge})
+        with patch('payments.jobs.get_gateway', return_value=gateway):
+            self.assertEqual(run_pending_jobs('worker-a'), 1)
+
+        self.assertEqual(gateway.charge.call_count, 1)
+        second.refresh_from_db()
+        self.assertEqual((second.status, second.job.status, second.job.locked_by), ('pending', 'running', 'worker-b'))
+
+    def test_failed_attempt_is_rescheduled_with_backoff(self):
+        self._pay()
+        gateway = Mock(requires_authorization=False, **{'charge.side_effect': GatewayError('timeout')})
+        with patch('payments.jobs.get_gateway', return_value=gateway):
+            run_pending_jobs('worker')
+
+        job = PaymentJob.objects.get()
+        self.assertEqual(job.status, 'queued')
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertEqual(job.last_error, 'timeout')
+        # Back to pending, so the retry is allowed to charge it.
+        self.assertEqual(job.payment.status, 'pending')
+
+    def test_status_long_poll_returns_when_worker_finishes(self):
+        payment = self._pay()
+        polls = []
+
+        def finish_during_poll(seconds):
+            polls.append(seconds)
+            run_pending_jobs('worker')
+
+        with patch('payments.views.time.sleep', side_effect=finish_during_poll):
+            response = self.client.get(f'/payments/status/{payment.transaction_id}/', {'wait': 10})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], 'completed')
+        self.assertEqual(len(polls), 1)
+        self.assertNotIn('Retry-After', response)
+
+    def test_status_without_wait_returns_immediately(self):
+        payment = self._pay()
+        with patch('payments.views.time.sleep') as sleep:
+            response = self.client.get(f'/payments/status/{payment.transaction_id}/')
+
+        sleep.assert_not_called()
+        self.assertEqual(response.data['status'], 'pending')
+        self.assertEqual(response['Retry-After'], '1')
+
+
+class GatewayAdapterTest(TestCase):
+    CREDENTIALS = {'APP_KEY': 'key', 'APP_SECRET': 'secret', 'USERNAME': 'merchant', 'PASSWORD': 'pass'}
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="gateway", password="testpass123")
+        self.method = PaymentMethod.objects.create(name='bkash', display_name='bKash')
+
+    def _stub(self, **options):
+        server = start_stub_gateway(**options)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def _gateway(self, gateway_class, server, **kwargs):
+        session = build_session(pool_size=2, retries=2, backoff_factor=0)
+        self.addCleanup(session.close)
+        return gateway_class({**self.CREDENTIALS, 'BASE_URL': server.url}, session=session, **kwargs)
+
+    def _payment(self, index=0):
+        payment = Payment.objects.create(
+            user=self.user, payment_method=self.method, amount=Decimal('50.00'), transaction_id=f'GW{index}'
+        )
+        BkashPayment.objects.create(payment=payment, mobile_number='01712345678')
+        return payment
+
+    def _create_bkash(self, gateway, payment):
+        BkashPayment.objects.filter(payment=payment).update(**gateway.create(payment))
+        payment.bkash_details.refresh_from_db()
+        return payment
+
+    def test_bkash_token_and_connection_are_reused(self):
+        server = self._stub()
+        gateway = self._gateway(BkashGateway, server)
+
+        results = [gateway.charge(self._create_bkash(gateway, self._payment(index))) for index in range(3)]
+
+        self.assertTrue(all(result['bkash_transaction_id'] for result in results))
+        self.assertEqual(server.counters['token_grants'], 1)
+        # A grant, then create, status query and execute per payment.
+        self.assertEqual(server.counters['requests'], 10)
+        self.assertEqual(server.counters['connections'], 1)
+
+    def test_bkash_create_returns_approval_url(self):
+        server = self._stub()
+        gateway = self._gateway(BkashGateway, server)
+
+        created = gateway.create(self._payment())
+
+        self.assertTrue(created['bkash_payment_id'].startswith('TR'))
+        self.assertEqual(created['bkash_url'], f"{server.url}/checkout/{created['bkash_payment_id']}")
+        self.assertEqual(server.counters['bkash_executions'], 0)
+
+    def test_bkash_retry_does_not_execute_twice(self):
+        server = self._stub()
+        gateway = self._gateway(BkashGateway, server)
+        payment = self._create_bkash(gateway, self._payment())
+
+        first = gateway.charge(payment)
+        retried = gateway.charge(payment)
+
+        self.assertEqual(retried, first)
+        self.assertEqual(server.counters['bkash_executions'], 1)
+
+    def test_bkash_token_is_granted_again_when_rejected(self):
+        server = self._stub()
+        gateway = self._gateway(BkashGateway, server)
+        gateway.charge(self._create_bkash(gateway, self._payment(1)))
+        server.tokens.clear()
+
+        gateway.charge(self._create_bkash(gateway, self._payment(2)))
+
+        self.assertEqual(server.counters['token_grants'], 2)
+
+    def test_unavailable_gateway_is_retried_then_reported_as_retryable(self):
+        server = self._stub(failure_rate=1.0)
+        gateway = self._gateway(CardGateway, server)
+        payment = self._payment()
+        CardPayment.objects.create(payment=payment, card_type='visa', card_last_four='4242', card_holder_name='A')
+
+        with self.assertRaises(GatewayError) as caught:
+            gateway.charge(payment)
+
+        self.assertTrue(caught.exception.retryable)
+        self.assertEqual(server.counters['requests'], 3)
+
+    def test_read_timeout_is_not_retried(self):
+        server = self._stub(latency=0.5)
+        gateway = self._gateway(CardGateway, server, timeout=(1, 0.1))
+        payment = self._payment()
+        CardPayment.objects.create(payment=payment, card_type='visa', card_last_four='4242', card_holder_name='A')
+
+        with self.assertRaisesMessage(GatewayError, 'timed out'):
+            gateway.charge(payment)
+
+        self.assertEqual(server.counters['requests'], 1)
+
+
+class GatewayJobTest(APITestCase):
+    def setUp(self):
+        self.server = start_stub_gateway()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.user = User.objects.create_user(username="cardholder", password="testpass123")
+        self.client.force_authenticate(user=self.user)
+
+    def _pay_by_card(self, card_number):
+        with self.settings(PAYMENT_GATEWAYS={'CARD': {'API_KEY': 'key', 'BASE_URL': self.server.url}}):
+            response = self.client.post('/payments/card/', {
+                'card_holder_name': 'John Doe',
+                'card_number': card_number,
+                'expiry_date': '12/30',
+                'cvv': '123',
+                'card_type': 'visa',
+                'amount': '200.00',
+            }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            run_pending_jobs('worker')
+        return Payment.objects.get(transaction_id=response.data['payment']['transaction_id'])
+
+    def test_worker_charges_through_configured_gateway(self):
+        payment = self._pay_by_card('4111111111114242')
+
+        self.assertEqual(payment.status, 'completed')
+        self.assertTrue(payment.card_details.authorization_code)
+        self.assertEqual(self.server.counters['card_charges'], 1)
+
+    def test_declined_card_fails_without_retrying(self):
+        payment = self._pay_by_card('4111111111110002')
+
+        self.assertEqual(payment.status, 'failed')
+        self.assertIn('Insufficient funds', payment.failure_reason)
+        self.assertEqual(payment.job.status, 'failed')
+        self.assertEqual(payment.job.attempts, 1)
+
+
+class BkashCheckoutTest(APITestCase):
+    def setUp(self):
+        self.server = start_stub_gateway()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        override = self.settings(PAYMENT_GATEWAYS={'BKASH': {
+            'APP_KEY': 'key', 'APP_SECRET': 'secret', 'USERNAME': 'merchant', 'PASSWORD': 'pass',
+            'BASE_URL': self.server.url,
+        }})
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create_user(username="bkash-payer", password="testpass123")
+        self.client.force_authenticate(user=self.user)
+
+    def _start_checkout(self):
+        response = self.client.post('/payments/bkash/', {
+            'mobile_number': '01712345678', 'amount': '80.00', 'pin': '1234'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        run_pending_jobs('worker')
+        return Payment.objects.get(transaction_id=response.data['payment']['transaction_id'])
+
+    def _callback(self, payment, outcome):
+        return self.client.post('/payments/bkash/callback/', {
+            'paymentID': payment.bkash_details.bkash_payment_id, 'status': outcome,
+        }, format='json')
+
+    def test_worker_creates_checkout_and_waits_for_approval(self):
+        payment = self._start_checkout()
+
+        self.assertEqual(payment.status, 'pending')
+        self.assertEqual(payment.job.status, 'done')
+        self.assertEqual(self.server.counters['bkash_executions'], 0)
+        response = self.client.get(f'/payments/status/{payment.transaction_id}/')
+        self.assertEqual(response.data['bkash_details']['bkash_url'], payment.bkash_details.bkash_url)
+        self.assertTrue(response.data['bkash_details']['bkash_url'].startswith(self.server.url))
+
+    def test_approved_checkout_is_executed_by_worker(self):
+        payment = self._start_checkout()
+
+        response = self._callback(payment, 'success')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data['bkash_details']['bkash_url'])
+        self.assertEqual(PaymentJob.objects.get(payment=payment).status, 'queued')
+        run_pending_jobs('worker')
+
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'completed')
+        self.assertTrue(payment.bkash_details.bkash_transaction_id)
+        self.assertEqual(self.server.counters['bkash_payments'], 1)
+        self.assertEqual(self.server.counters['bkash_executions'], 1)
+
+    def test_repeated_success_callback_queues_once(self):
+        payment = self._start_checkout()
+        self._callback(payment, 'success')
+        run_pending_jobs('worker')
+
+        self._callback(payment, 'success')
+
+        self.assertEqual(PaymentJob.objects.get(payment=payment).status, 'done')
+
+    def test_cancelled_checkout_is_not_executed(self):
+        payment = self._start_checkout()
+
+        response = self._callback(payment, 'cancel')
+        run_pending_jobs('worker')
+
+        self.assertEqual(response.data['status'], 'cancelled')
+        self.assertEqual(self.server.counters['bkash_executions'], 0)
+
+    def test_callback_for_another_users_payment_is_not_found(self):
+        payment = self._start_checkout()
+        self.client.force_authenticate(user=User.objects.create_user(username="other", password="testpass123"))
+
+        self.assertEqual(self._callback(payment, 'success').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_unknown_callback_status_is_rejected(self):
+        payment = self._start_checkout()
+
+        self.assertEqual(self._callback(payment, 'maybe').status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PaymentTransitionTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="audited", password="testpass123")
+        self.method = PaymentMethod.objects.create(name='cash', display_name='Cash on Delivery')
+
+    def _payment(self, index=0, **kwargs):
+        return Payment.objects.create(
+            user=self.user, payment_method=self.method, amount=Decimal('10.00'),
+            transaction_id=f'TRN{index}', **kwargs
+        )
+
+    def test_transition_updates_status_and_logs_once(self):
+        payment = self._payment()
+
+        with self.assertNumQueries(2):
+            moved_from = transition(payment, 'pending', 'completed', message='paid', user=self.user)
+
+        payment.refresh_from_db()
+        self.assertEqual(moved_from, 'pending')
+        self.assertEqual(payment.status, 'completed')
+        self.assertIsNotNone(payment.processed_at)
+        log = payment.logs.get()
+        self.assertEqual((log.status_from, log.status_to, log.created_by), ('pending', 'completed', self.user))
+
+    def test_stale_transition_changes_nothing(self):
+        payment = self._payment(status='failed')
+
+        self.assertIsNone(transition(payment.pk, 'processing', 'completed'))
+
+        payment.refresh_from_db()
+        self.assertEqual(payment.status, 'failed')
+        self.assertFalse(payment.logs.exists())
+
+    def test_disallowed_transition_is_rejected(self):
+        payment = self._payment(status='refunded')
+        with self.assertRaises(InvalidTransition):
+            transition(payment, 'refunded', 'completed')
+
+    def test_buffer_writes_logs_in_one_query(self):
+        payments = [self._payment(index) for index in range(5)]
+
+        with PaymentLogBuffer() as log:
+            for payment in payments:
+                transition(payment, 'pending', 'cancelled', log=log)
+            self.assertFalse(PaymentLog.objects.exists())
+            with self.assertNumQueries(1):
+                log.flush()
+
+        self.assertEqual(PaymentLog.objects.filter(status_to='cancelled').count(), 5)
+
+    def test_purge_deletes_old_logs_in_batches(self):
+        payment = self._payment()
+        with PaymentLogBuffer() as log:
+            for _ in range(5):
+                log.add(PaymentLog(payment=payment, status_from='pending', status_to='processing'))
+        PaymentLog.objects.filter(id__in=list(PaymentLog.objects.values_list('id', flat=True)[:3])).update(
+            created_at=timezone.now() - timedelta(days=400)
+        )
+
+        out = StringIO()
+        call_command('purge_payment_logs', days=365, batch_size=2, stdout=out)
+
+        self.assertIn('Purged 3', out.getvalue())
+        self.assertEqual(PaymentLog.objects.count(), 2)
+
+
+class AdminPaymentListTest(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username="boss", email="boss@example.com", password="pass12345")
+        self.customer = User.objects.create_user(username="buyer", password="testpass123")
+        self.client.force_authenticate(user=self.admin)
+        bkash = PaymentMethod.objects.create(name='bkash', display_name='bKash')
+        visa = PaymentMethod.objects.create(name='visa', display_name='Visa')
+        now = timezone.now()
+        rows = [
+            (bkash, 'completed', '100.00', 0),
+            (bkash, 'failed', '40.00', 0),
+            (visa, 'completed', '250.00', 1),
+            (visa, 'pending', '75.00', 3),
+            (bkash, 'completed', '60.00', 3),
+        ]
+        for index, (method, payment_status, amount, days_ago) in enumerate(rows):
+            payment = Payment.objects.create(
+                user=self.customer if index % 2 else self.admin,
+                payment_method=method,
+                amount=Decimal(amount),
+                status=payment_status,
+                transaction_id=f'ADM{index}',
+            )
+            Payment.objects.filter(pk=payment.pk).update(created_at=now - timedelta(days=days_ago, minutes=index))
+
+    def _ids(self, response):
+        return [row['transaction_id'] for row in response.data['results']]
+
+    def test_cursor_pages_cover_every_payment_once(self):
+        seen = []
+        response = self.client.get('/payments/admin/all/', {'page_size': 2})
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen += self._ids(response)
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+
+        self.assertEqual(seen, ['ADM0', 'ADM1', 'ADM2', 'ADM3', 'ADM4'])
+
+    def test_filters(self):
+        cases = [
+            ({'status': 'completed'}, ['ADM0', 'ADM2', 'ADM4']),
+            ({'status': 'failed,pending'}, ['ADM1', 'ADM3']),
+            ({'method': 'visa'}, ['ADM2', 'ADM3']),
+            ({'user': str(self.customer.id)}, ['ADM1', 'ADM3']),
+            ({'amount_min': '60', 'amount_max': '100'}, ['ADM0', 'ADM3', 'ADM4']),
+            ({'date_from': (timezone.localdate() - timedelta(days=1)).isoformat()}, ['ADM0', 'ADM1', 'ADM2']),
+            ({'date_to': (timezone.localdate() - timedelta(days=2)).isoformat()}, ['ADM3', 'ADM4']),
+        ]
+        for params, expected in cases:
+            with self.subTest(params=params):
+                response = self.client.get('/payments/admin/all/', params)
+                self.assertEqual(self._ids(response), expected)
+
+    def test_invalid_filter_is_rejected(self):
+        response = self.client.get('/payments/admin/all/', {'date_from': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(response.data['success'])
+
+    def test_stats_are_grouped_by_day_method_and_status(self):
+        response = self.client.get('/payments/admin/stats/')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['totals']['count'], 5)
+        self.assertEqual(response.data['totals']['amount'], Decimal('525.00'))
+        by_method = {row['method']: (row['count'], row['amount']) for row in response.data['by_method']}
+        self.assertEqual(by_method, {'bkash': (3, Decimal('200.00')), 'visa': (2, Decimal('325.00'))})
+        by_status = {row['status']: row['count'] for row in response.data['by_status']}
+        self.assertEqual(by_status, {'completed': 3, 'failed': 1, 'pending': 1})
+        self.assertEqual(sum(row['count'] for row in response.data['by_day']), 5)
+        self.assertEqual(len(response.data['by_day']), 3)
+
+    def test_stats_respect_filters(self):
+        response = self.client.get('/payments/admin/stats/', {'status': 'completed', 'method': 'bkash'})
+
+        self.assertEqual(response.data['totals']['count'], 2)
+        self.assertEqual(response.data['totals']['amount'], Decimal('160.00'))
+
+    def test_stats_require_admin(self):
+        self.client.force_authenticate(user=self.customer)
+        response = self.client.get('/payments/admin/stats/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class PaymentHistoryTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="history", password="testpass123")
+        self.client.force_authenticate(user=self.user)
+        method = PaymentMethod.objects.create(name='bkash', display_name='bKash')
+        for index, payment_status in enumerate(['completed', 'failed', 'completed', 'pending']):
+            Payment.objects.create(
+                user=self.user, payment_method=method, amount=Decimal('10.00'),
+                status=payment_status, transaction_id=f'HIS{index}',
+            )
+        Payment.objects.create(
+            user=User.objects.create_user(username="someone", password="testpass123"),
+            payment_method=method, amount=Decimal('10.00'), transaction_id='OTHER',
+        )
+
+    def test_cursor_pagination_with_status_filter(self):
+        response = self.client.get('/payments/history/', {'pagination': 'cursor', 'page_size': 1, 'status': 'completed'})
+        first = response.data['results']
+        second = self.client.get(response.data['next']).data
+
+        self.assertEqual([row['transaction_id'] for row in first], ['HIS2'])
+        self.assertEqual([row['transaction_id'] for row in second['results']], ['HIS0'])
+        self.assertIsNone(second['next'])
+
+    def test_field_selection(self):
+        response = self.client.get('/payments/history/', {'fields': 'transaction_id,status'})
+
+        self.assertEqual(response.data[0], {'transaction_id': 'HIS3', 'status': 'pending'})
+        self.assertEqual(len(response.data), 4)
@@ -0,0 +1,114 @@
+"""Payment status changes and their ``PaymentLog`` audit trail.
+
+All status changes go through ``transition()``. It is a single
+``UPDATE ... WHERE status = <from>``: a payment that has already moved on is
+left alone instead of being overwritten. The log row for a change that
+applied is either written straight away or collected in a
+``PaymentLogBuffer`` so a batch of changes is logged with one bulk INSERT.
+"""
+from django.utils import timezone
+
+from .models import Payment, PaymentLog
+
+ALLOWED_TRANSITIONS = {
+    'pending': {'processing', 'completed', 'failed', 'cancelled'},
+    # Back to pending when a failed gateway call is retried.
+    'processing': {'pending', 'completed', 'failed'},
+    'completed': {'refunded'},
+    'failed': set(),
+    'cancelled': set(),
+    'refunded': set(),
+}
+
+
+class InvalidTransition(ValueError):
+    pass
+
+
+class PaymentLogBuffer:
+    """Collects log rows and writes them in one query on ``flush()``.
+
+    Used as a context manager it flushes on exit, including when the block
+    raises, because the status updates it describes are already saved.
+    """
+
+    def __init__(self):
+        self.entries = []
+
+    def add(self, entry):
+        self.entries.append(entry)
+
+    def flush(self):
+        entries, self.entries = self.entries, []
+        if entries:
+            PaymentLog.objects.bulk_create(entries)
+        return len(entries)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
+
+
+def transition(payment, from_status, to_status, message='', user=None, log=None, **fields):
+    """Move ``payment`` from ``from_status`` to ``to_status``.
+
+    ``payment`` is a ``Payment`` or its primary key and ``from_status`` is a
+    status or a sequence of them, tried in order. ``fields`` are saved with
+    the status. Returns the status the payment moved from, or ``None`` when
+    it was in none of ``from_status`` and nothing changed.
+    """
+    from_statuses = (from_status,) if isinstance(from_status, str) else tuple(from_status)
+    for status in from_statuses:
+        if to_status not in ALLOWED_TRANSITIONS[status]:
+            raise InvalidTransition(f'A {status} payment cannot become {to_status}')
+
+    now = timezone.now()
+    fields['updated_at'] = now
+    if to_status == 'completed':
+        fields.setdefault('processed_at', now)
+
+    payment_id = getattr(payment, 'pk', payment)
+    for status in from_statuses:
+        if Payment.objects.filter(pk=payment_id, status=status).update(status=to_status, **fields):
+            break
+    else:
+        return None
+
+    entry = PaymentLog(
+        payment_id=payment_id,
+        status_from=status,
+        status_to=to_status,
+        message=message,
+        created_by=user,
+        created_at=now,
+    )
+    if log is None:
+        entry.save()
+    else:
+        log.add(entry)
+
+    if isinstance(payment, Payment):
+        payment.status = to_status
+        for name, value in fields.items():
+            setattr(payment, name, value)
+    return status
+
+
+def purge_logs(before, batch_size=5000):
+    """Delete logs created before ``before`` in batches; return the count.
+
+    Every batch is a separate short DELETE, so purging a large backlog never
+    holds one long transaction. Call it outside ``transaction.atomic()``.
+    """
+    deleted = 0
+    while True:
+        ids = list(
+            PaymentLog.objects.filter(created_at__lt=before)
+            .order_by('created_at', 'id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return deleted
+        deleted += PaymentLog.objects.filter(id__in=ids).delete()[0]
@@ -1,8 +1,8 @@
 from django.urls import path
 from payments.views import (
     PaymentMethodListView, BkashPaymentView, CardPaymentView, 
-    ProcessPaymentView, PaymentListView, PaymentDetailView,
-    PaymentStatusView, MockPaymentView, AdminPaymentListView
+    ProcessPaymentView, BkashCallbackView, PaymentListView, PaymentDetailView,
+    PaymentStatusView, MockPaymentView, AdminPaymentListView, AdminPaymentStatsView
 )
 
 urlpatterns = [
@@ -12,6 +12,7 @@ urlpatterns = [
     # Payment processing endpoints
     path('process/', ProcessPaymentView.as_view(), name='process-payment'),
     path('bkash/', BkashPaymentView.as_view(), name='bkash-payment'),
+    path('bkash/callback/', BkashCallbackView.as_view(), name='bkash-callback'),
     path('card/', CardPaymentView.as_view(), name='card-payment'),
     
     # Payment history and details
@@ -21,6 +22,7 @@ urlpatterns = [
     
     # Admin endpoints
     path('admin/all/', AdminPaymentListView.as_view(), name='admin-payments'),
+    path('admin/stats/', AdminPaymentStatsView.as_view(), name='admin-payment-stats'),
     
     # Legacy endpoint for backward compatibility
     path('mock-payment/', MockPaymentView.as_view(), name='mock-payment'),
@@ -2,17 +2,71 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions
 from django.shortcuts import get_object_or_404
-from datetime import datetime
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+import time
 import uuid
 
+from my_project.filters import parse_date_bound
+from my_project.pagination import KeysetPagination, cursor_requested
+from my_project.serializers import get_requested_fields
+
+from .idempotency import idempotent
+from .jobs import requeue_payment
 from .models import PaymentMethod, Payment, BkashPayment, CardPayment
+from .transitions import transition
 from .serializers import (
-    PaymentMethodSerializer, PaymentSerializer, BkashPaymentSerializer,
+    PaymentMethodSerializer, PaymentSerializer, AdminPaymentSerializer, BkashPaymentSerializer,
     CardPaymentSerializer, PaymentDetailSerializer
 )
 from account.models import OrderModel
 
 
+def _parse_amount(value):
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise ValueError(f'Invalid amount: {value}')
+
+
+def filter_payments(payments, params):
+    """Apply the admin payment filters from ``params``.
+
+    ``status`` and ``method`` accept comma-separated values; ``date_from``
+    and ``date_to`` are inclusive dates or datetimes. Raises ``ValueError``
+    for values that cannot be parsed.
+    """
+    statuses = [value for value in params.get('status', '').split(',') if value]
+    if statuses:
+        payments = payments.filter(status__in=statuses)
+
+    methods = [value for value in params.get('method', '').split(',') if value]
+    if methods:
+        payments = payments.filter(payment_method__name__in=methods)
+
+    user = params.get('user')
+    if user:
+        if not user.isdigit():
+            raise ValueError(f'Invalid user: {user}')
+        payments = payments.filter(user_id=int(user))
+
+    if params.get('date_from'):
+        payments = payments.filter(created_at__gte=parse_date_bound(params['date_from']))
+    if params.get('date_to'):
+        payments = payments.filter(created_at__lt=parse_date_bound(params['date_to'], end=True))
+
+    if params.get('amount_min'):
+        payments = payments.filter(amount__gte=_parse_amount(params['amount_min']))
+    if params.get('amount_max'):
+        payments = payments.filter(amount__lte=_parse_amount(params['amount_max']))
+    return payments
+
+
 class PaymentMethodListView(APIView):
     
     def get(self, request):
@@ -24,6 +78,7 @@ class PaymentMethodListView(APIView):
 class BkashPaymentView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
+    @idempotent('bkash')
     def post(self, request):
         serializer = BkashPaymentSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
@@ -32,7 +87,7 @@ class BkashPaymentView(APIView):
             payment_serializer = PaymentDetailSerializer(bkash_payment.payment)
             
             return Response({
-                'message': 'bKash payment processed successfully',
+                'message': 'bKash payment accepted and is being processed',
                 'payment': payment_serializer.data,
                 'success': True
             }, status=status.HTTP_200_OK)
@@ -44,9 +99,53 @@ class BkashPaymentView(APIView):
         }, status=status.HTTP_400_BAD_REQUEST)
 
 
+class BkashCallbackView(APIView):
+    """Records the outcome of the customer's bKash approval.
+
+    bKash sends the customer back to ``BKASH_CALLBACK_URL`` with
+    ``paymentID`` and ``status`` (``success``, ``failure`` or ``cancel``);
+    the frontend posts both here. An approved payment is queued for the
+    worker to execute, which also confirms the approval with bKash.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    OUTCOMES = {'failure': 'failed', 'cancel': 'cancelled'}
+
+    def post(self, request):
+        outcome = request.data.get('status')
+        if outcome != 'success' and outcome not in self.OUTCOMES:
+            return Response({
+                'message': 'status must be success, failure or cancel'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        details = get_object_or_404(
+            BkashPayment.objects.select_related('payment'),
+            bkash_payment_id=request.data.get('paymentID'),
+            payment__user=request.user,
+        )
+        payment = details.payment
+
+        if outcome == 'success':
+            with transaction.atomic():
+                if BkashPayment.objects.filter(pk=details.pk, authorized_at__isnull=True).update(
+                    authorized_at=timezone.now()
+                ):
+                    requeue_payment(payment)
+        else:
+            transition(
+                payment, 'pending', self.OUTCOMES[outcome], user=request.user,
+                message=f'bKash checkout ended with status {outcome}',
+                failure_reason=f'bKash checkout {outcome}',
+            )
+
+        payment = Payment.objects.select_related('payment_method', 'bkash_details').prefetch_related('logs').get(
+            pk=payment.pk
+        )
+        return Response(PaymentDetailSerializer(payment).data, status=status.HTTP_200_OK)
+
+
 class CardPaymentView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
+    @idempotent('card')
     def post(self, request):
         serializer = CardPaymentSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
@@ -55,7 +154,7 @@ class CardPaymentView(APIView):
             payment_serializer = PaymentDetailSerializer(card_payment.payment)
             
             return Response({
-                'message': f'{card_payment.card_type.title()} payment processed successfully',
+                'message': f'{card_payment.card_type.title()} payment accepted and is being processed',
                 'payment': payment_serializer.data,
                 'success': True
             }, status=status.HTTP_200_OK)
@@ -70,6 +169,7 @@ class CardPaymentView(APIView):
 class ProcessPaymentView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
+    @idempotent('process')
     def post(self, request):
         payment_method_name = request.data.get('payment_method')
         
@@ -104,7 +204,7 @@ class ProcessPaymentView(APIView):
             payment_serializer = PaymentDetailSerializer(bkash_payment.payment)
             
             return Response({
-                'message': 'bKash payment processed successfully',
+                'message': 'bKash payment accepted and is being processed',
                 'payment': payment_serializer.data,
                 'success': True
             }, status=status.HTTP_200_OK)
@@ -125,7 +225,7 @@ class ProcessPaymentView(APIView):
             payment_serializer = PaymentDetailSerializer(card_payment.payment)
             
             return Response({
-                'message': f'{card_type.title()} payment processed successfully',
+                'message': f'{card_type.title()} payment accepted and is being processed',
                 'payment': payment_serializer.data,
                 'success': True
             }, status=status.HTTP_200_OK)
@@ -138,11 +238,32 @@ class ProcessPaymentView(APIView):
 
 
 class PaymentListView(APIView):
+    """The user's payments, newest first.
+
+    Accepts the admin list filters and ``?fields=``. The full list is
+    returned unless cursor pagination is requested (``?pagination=cursor``).
+    """
     permission_classes = [permissions.IsAuthenticated]
+    ordering = ['-created_at', '-id']
     
     def get(self, request):
         payments = Payment.objects.filter(user=request.user).select_related('payment_method')
-        serializer = PaymentSerializer(payments, many=True)
+        try:
+            payments = filter_payments(payments, request.query_params)
+        except ValueError as exc:
+            return Response({
+                'message': str(exc),
+                'success': False
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        fields = get_requested_fields(request)
+        if cursor_requested(request):
+            paginator = KeysetPagination(self.ordering)
+            page = paginator.paginate_queryset(payments, request)
+            serializer = PaymentSerializer(page, many=True, fields=fields)
+            return paginator.get_paginated_response(serializer.data)
+
+        serializer = PaymentSerializer(payments.order_by(*self.ordering), many=True, fields=fields)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
@@ -164,22 +285,47 @@ class PaymentDetailView(APIView):
 
 
 class PaymentStatusView(APIView):
+    """Payment status, optionally long-polled while the worker processes it.
+
+    ``?wait=<seconds>`` (capped at ``PAYMENT_STATUS_MAX_WAIT``) holds the
+    request open until the status differs from ``?status=`` (default: the
+    status when the request arrived) or the payment leaves the pending
+    states, so clients can follow a payment without tight polling loops.
+    """
     permission_classes = [permissions.IsAuthenticated]
+    PENDING_STATUSES = ('pending', 'processing')
+    POLL_INTERVAL = 0.5
     
     def get(self, request, transaction_id):
-        try:
-            payment = Payment.objects.get(transaction_id=transaction_id, user=request.user)
-            serializer = PaymentDetailSerializer(payment)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        except Payment.DoesNotExist:
+        payments = Payment.objects.filter(transaction_id=transaction_id, user=request.user)
+        current = payments.values_list('status', flat=True).first()
+        if current is None:
             return Response({
                 'message': 'Payment not found'
             }, status=status.HTTP_404_NOT_FOUND)
 
+        try:
+            wait = min(float(request.query_params.get('wait', 0)), settings.PAYMENT_STATUS_MAX_WAIT)
+        except ValueError:
+            wait = 0
+        known_status = request.query_params.get('status', current)
+        deadline = time.monotonic() + wait
+        while current == known_status and current in self.PENDING_STATUSES and time.monotonic() < deadline:
+            time.sleep(self.POLL_INTERVAL)
+            current = payments.values_list('status', flat=True).first()
+
+        payment = payments.select_related('payment_method').prefetch_related('logs').get()
+        serializer = PaymentDetailSerializer(payment)
+        response = Response(serializer.data, status=status.HTTP_200_OK)
+        if payment.status in self.PENDING_STATUSES:
+            response['Retry-After'] = '1'
+        return response
+
 
 class MockPaymentView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    @idempotent('mock-payment')
     def post(self, request):
         data = request.data
         payment_method_name = data.get('payment_method', 'cash')
@@ -231,9 +377,74 @@ class MockPaymentView(APIView):
 
 
 class AdminPaymentListView(APIView):
+    """All payments, newest first, filtered and cursor-paginated."""
     permission_classes = [permissions.IsAdminUser]
+    ordering = ['-created_at', '-id']
     
     def get(self, request):
-        payments = Payment.objects.all().select_related('payment_method', 'user')
-        serializer = PaymentSerializer(payments, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
\ No newline at end of file
+        payments = Payment.objects.select_related('payment_method', 'user')
+        try:
+            payments = filter_payments(payments, request.query_params)
+        except ValueError as exc:
+            return Response({
+                'message': str(exc),
+                'success': False
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = KeysetPagination(self.ordering)
+        paginator.page_size = 50
+        page = paginator.paginate_queryset(payments, request)
+        serializer = AdminPaymentSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+
+class AdminPaymentStatsView(APIView):
+    """Payment counts and amounts grouped by day, method and status.
+
+    Accepts the same filters as the admin payment list. Without a date
+    range, the daily breakdown covers the last ``DEFAULT_DAYS`` days.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    DEFAULT_DAYS = 30
+
+    def get(self, request):
+        params = request.query_params.copy()
+        if not params.get('date_from') and not params.get('date_to'):
+            params['date_from'] = (timezone.localdate() - timedelta(days=self.DEFAULT_DAYS - 1)).isoformat()
+        try:
+            payments = filter_payments(Payment.objects.all(), params)
+        except ValueError as exc:
+            return Response({
+                'message': str(exc),
+                'success': False
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        totals = {'count': Count('id'), 'amount': Sum('amount'), 'refunded': Sum('refund_amount')}
+        # order_by() drops Payment.Meta.ordering, which would otherwise be
+        # added to the GROUP BY.
+        grouped = payments.order_by()
+        return Response({
+            'date_from': params.get('date_from'),
+            'date_to': params.get('date_to'),
+            'totals': self._with_zero(payments.aggregate(**totals)),
+            'by_day': [
+                self._with_zero(row)
+                for row in grouped.annotate(day=TruncDate('created_at')).values('day')
+                .annotate(**totals).order_by('day')
+            ],
+            'by_method': [
+                self._with_zero(row)
+                for row in grouped.values(method=F('payment_method__name'))
+                .annotate(**totals).order_by('method')
+            ],
+            'by_status': [
+                self._with_zero(row)
+                for row in grouped.values('status').annotate(**totals).order_by('status')
+            ],
+        }, status=status.HTTP_200_OK)
+
+    def _with_zero(self, row):
+        for field in ('amount', 'refunded'):
+            if row[field] is None:
+                row[field] = Decimal('0.00')
+        return row
\ No newline at end of file
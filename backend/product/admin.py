@@ -1,26 +1,42 @@
 from django.contrib import admin
+from django.db.models import Count, Q
+from .images import image_error
 from .models import Product, Category, Cart, Wishlist, Review, SiteSettings
 
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
-    list_display = ['name', 'product_count', 'created_at']
+    list_display = ['name', 'product_count', 'in_stock_count', 'created_at']
     search_fields = ['name', 'description']
     list_filter = ['created_at']
     ordering = ['name']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            total_products=Count('products'),
+            in_stock_products=Count('products', filter=Q(products__stock=True)),
+        )
     
     def product_count(self, obj):
-        return obj.products.count()
+        return obj.total_products
     product_count.short_description = 'Products'
+    product_count.admin_order_field = 'total_products'
+
+    def in_stock_count(self, obj):
+        return obj.in_stock_products
+    in_stock_count.short_description = 'In stock'
+    in_stock_count.admin_order_field = 'in_stock_products'
 
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ['name', 'category', 'price', 'stock', 'is_featured', 'average_rating', 'review_count', 'created_at']
+    list_display = [
+        'name', 'category', 'price', 'stock', 'is_featured', 'average_rating', 'rating_count', 'image_ok', 'created_at'
+    ]
     list_filter = ['stock', 'is_featured', 'category', 'created_at']
     search_fields = ['name', 'description', 'category__name']
     list_editable = ['stock', 'is_featured', 'price']
-    readonly_fields = ['average_rating', 'review_count', 'created_at', 'updated_at']
+    readonly_fields = ['average_rating', 'rating_count', 'rating_sum', 'image_error', 'created_at', 'updated_at']
     fieldsets = (
         ('Basic Information', {
             'fields': ('name', 'description', 'price', 'stock')
@@ -29,10 +45,10 @@ class ProductAdmin(admin.ModelAdmin):
             'fields': ('category', 'is_featured')
         }),
         ('Media', {
-            'fields': ('image',)
+            'fields': ('image', 'image_error')
         }),
         ('Statistics', {
-            'fields': ('average_rating', 'review_count'),
+            'fields': ('average_rating', 'rating_count', 'rating_sum'),
             'classes': ('collapse',)
         }),
         ('Timestamps', {
@@ -42,11 +58,20 @@ class ProductAdmin(admin.ModelAdmin):
     )
     ordering = ['-created_at']
 
+    def image_ok(self, obj):
+        return not image_error(obj.image, obj.image_variants)
+    image_ok.short_description = 'Image OK'
+    image_ok.boolean = True
+
+    def image_error(self, obj):
+        return image_error(obj.image, obj.image_variants) or '-'
+    image_error.short_description = 'Image error'
+
 
 @admin.register(SiteSettings)
 class SiteSettingsAdmin(admin.ModelAdmin):
     list_display = ['site_name', 'support_email', 'support_phone', 'updated_at']
-    readonly_fields = ['updated_at']
+    readonly_fields = ['hero_background_error', 'promo_background_error', 'updated_at']
 
     fieldsets = (
         ('Brand', {
@@ -56,7 +81,10 @@ class SiteSettingsAdmin(admin.ModelAdmin):
             'fields': ('support_email', 'support_phone', 'footer_address')
         }),
         ('Images', {
-            'fields': ('hero_background_image', 'promo_background_image')
+            'fields': (
+                'hero_background_image', 'hero_background_error',
+                'promo_background_image', 'promo_background_error',
+            )
         }),
         ('Timestamps', {
             'fields': ('updated_at',),
@@ -64,6 +92,14 @@ class SiteSettingsAdmin(admin.ModelAdmin):
         }),
     )
 
+    def hero_background_error(self, obj):
+        return image_error(obj.hero_background_image, obj.hero_background_variants) or '-'
+    hero_background_error.short_description = 'Hero background error'
+
+    def promo_background_error(self, obj):
+        return image_error(obj.promo_background_image, obj.promo_background_variants) or '-'
+    promo_background_error.short_description = 'Promo background error'
+
     def has_add_permission(self, request):
         return not SiteSettings.objects.exists()
 
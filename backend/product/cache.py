@@ -0,0 +1,205 @@
+import hashlib
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+CATALOGUE_VERSION_KEY = 'catalogue:version'
+CATALOGUE_HITS_KEY = 'catalogue:hits'
+CATALOGUE_MISSES_KEY = 'catalogue:misses'
+SITE_SETTINGS_VERSION_KEY = 'site_settings:version'
+
+cache = ConnectionProxy(caches, 'catalogue')
+
+
+def _increment(key):
+    cache.add(key, 0, None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # The key was evicted between add() and incr().
+        cache.set(key, 1, None)
+        return 1
+
+
+def _initial_version():
+    # Seed from the clock so a culled counter never reuses an old version.
+    return int(time.time() * 1000)
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), None)
+        version = cache.get(key)
+    return version
+
+
+def _bump_version(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = _initial_version()
+        cache.set(key, version, None)
+        return version
+
+
+def get_catalogue_version():
+    return _get_version(CATALOGUE_VERSION_KEY)
+
+
+def bump_catalogue_version():
+    return _bump_version(CATALOGUE_VERSION_KEY)
+
+
+# (instance, version, monotonic time the version was last confirmed)
+_site_settings = None
+
+
+def get_site_settings_snapshot():
+    """Return ``(SiteSettings, version)`` from a per-process copy.
+
+    The copy is trusted for ``SITE_SETTINGS_CACHE_TTL`` seconds. After that
+    the shared version counter is read, and the row is reloaded only when a
+    save in some worker has bumped it. The instance is shared by every
+    request in the process and must not be modified; load a fresh one with
+    ``SiteSettings.load()`` to edit it.
+    """
+    global _site_settings
+    from .models import SiteSettings
+
+    now = time.monotonic()
+    entry = _site_settings
+    if entry is not None and now - entry[2] < settings.SITE_SETTINGS_CACHE_TTL:
+        return entry[0], entry[1]
+
+    # Read the version before the row, so a save in between leaves a stale
+    # version behind and the next check reloads.
+    version = _get_version(SITE_SETTINGS_VERSION_KEY)
+    if entry is not None and entry[1] == version:
+        instance = entry[0]
+    else:
+        instance = SiteSettings.load()
+    _site_settings = (instance, version, now)
+    return instance, version
+
+
+def get_site_settings():
+    return get_site_settings_snapshot()[0]
+
+
+def invalidate_site_settings():
+    """Drop this process's copy and make every other worker reload theirs."""
+    global _site_settings
+    _bump_version(SITE_SETTINGS_VERSION_KEY)
+    _site_settings = None
+
+
+def get_catalogue_cache_stats():
+    hits = cache.get(CATALOGUE_HITS_KEY, 0)
+    misses = cache.get(CATALOGUE_MISSES_KEY, 0)
+    lookups = hits + misses
+    return {
+        'version': get_catalogue_version(),
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / lookups, 4) if lookups else 0,
+    }
+
+
+def build_catalogue_cache_key(namespace, request, version, view_kwargs, query_params=None):
+    params = []
+    for key, values in sorted(request.GET.lists()):
+        if query_params is not None and key not in query_params:
+            continue
+        values = sorted(value.strip() for value in values if value.strip())
+        params.extend((key, value) for value in values)
+
+    # Image URLs are absolute, so responses differ per scheme and host.
+    raw = '|'.join([
+        request.scheme,
+        request.get_host(),
+        urlencode(sorted(view_kwargs.items())),
+        urlencode(params),
+    ])
+    digest = hashlib.md5(raw.encode('utf-8')).hexdigest()
+    return f'catalogue:{version}:{namespace}:{digest}'
+
+
+def cache_catalogue_response(namespace, query_params=None):
+    """Serve anonymous GETs of a catalogue view from the versioned cache.
+
+    Keys combine the normalized query string with the catalogue version, so
+    every product, category or review write invalidates all entries at once.
+    Responses carry an ETag derived from the key and conditional requests
+    are answered with 304 without touching the view.
+    """
+
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(view, request, *args, **kwargs):
+            if request.user.is_authenticated:
+                return view_method(view, request, *args, **kwargs)
+
+            version = get_catalogue_version()
+            cache_key = build_catalogue_cache_key(namespace, request, version, kwargs, query_params)
+            digest = cache_key.rsplit(':', 1)[-1]
+            etag = f'"{version}-{digest[:16]}"'
+            headers = {
+                'ETag': etag,
+                'Cache-Control': 'public, max-age=0, must-revalidate',
+            }
+
+            if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+            if etag in if_none_match or '*' in if_none_match:
+                _increment(CATALOGUE_HITS_KEY)
+                return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+            data = cache.get(cache_key)
+            if data is not None:
+                _increment(CATALOGUE_HITS_KEY)
+                headers['X-Cache'] = 'HIT'
+                return Response(data, status=status.HTTP_200_OK, headers=headers)
+
+            _increment(CATALOGUE_MISSES_KEY)
+            response = view_method(view, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                cache.set(cache_key, response.data)
+                headers['X-Cache'] = 'MISS'
+                for header, value in headers.items():
+                    response[header] = value
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def warm_catalogue_cache():
+    """Render the busiest anonymous catalogue pages into the cache.
+
+    Returns the number of responses that were stored.
+    """
+    from django.test import RequestFactory
+
+    from .views import CategoryListView, ProductView
+
+    factory = RequestFactory(SERVER_NAME=settings.CACHE_WARMUP_HOST)
+    secure = not settings.DEBUG
+    targets = [
+        (CategoryListView.as_view(), '/api/categories/', {}),
+        (ProductView.as_view(), '/api/products/', {}),
+        (ProductView.as_view(), '/api/products/', {'featured': 'true'}),
+    ]
+    warmed = 0
+    for view, path, params in targets:
+        response = view(factory.get(path, params, secure=secure))
+        if response.status_code == status.HTTP_200_OK:
+            warmed += 1
+    return warmed
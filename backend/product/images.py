@@ -0,0 +1,253 @@
+"""Resized image derivatives built by a background worker.
+
+Saving a model that lists its image fields in ``IMAGE_VARIANT_FIELDS``
+(``Product.image``, the ``SiteSettings`` backgrounds) queues an
+``ImageJob`` when the stored image no longer matches the derivatives
+recorded for it. ``manage.py process_image_jobs`` claims jobs through the
+same ``my_project.jobs`` queue as the payment worker, resizes the original to each width in
+``IMAGE_DERIVATIVE_WIDTHS`` and saves WebP (AVIF when Pillow supports it)
+and JPEG/PNG copies beside it through the field's storage, so the same
+code serves ``FileSystemStorage`` and Cloudinary. The saved names are
+recorded in the model's variants JSON field:
+
+    {"source": "products/shoe.jpg", "width": 2400,
+     "formats": {"webp": {"320": "products/shoe-320w.webp", ...}, ...}}
+
+Upload requests only read the image header (``product.uploads``), so this
+worker is where pixels are first decoded. An image that fails to decode is
+recorded as ``{"source": ..., "error": ...}`` in the variants field, shown
+in the admin, and its job fails without retrying.
+"""
+import logging
+import posixpath
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from PIL import ExifTags, Image, ImageOps, features
+
+from my_project.jobs import JobQueue
+
+from .cache import bump_catalogue_version, invalidate_site_settings
+from .models import ImageJob, Product, SiteSettings
+
+logger = logging.getLogger(__name__)
+
+# Pillow format name, file extension and save options per output format.
+FORMATS = {
+    'avif': ('AVIF', 'avif', {'quality': 60}),
+    'webp': ('WEBP', 'webp', {'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'optimize': True, 'progressive': True}),
+    'png': ('PNG', 'png', {'optimize': True}),
+}
+
+
+class InvalidImage(Exception):
+    """The stored file could not be decoded as an image."""
+
+
+def output_formats(image):
+    """Formats to build for ``image``, best first; the last one is the fallback."""
+    modern = ['avif', 'webp'] if features.check('avif') else ['webp']
+    has_alpha = 'A' in image.getbands() or 'transparency' in image.info
+    return modern + ['png' if has_alpha else 'jpeg']
+
+
+def _encode(image, fmt):
+    pil_format, _, options = FORMATS[fmt]
+    if fmt == 'jpeg' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+    if fmt != 'png':
+        options = {**options, 'quality': options.get('quality', settings.IMAGE_DERIVATIVE_QUALITY)}
+    buffer = BytesIO()
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def build_variants(field_file):
+    """Resize and save the derivatives of ``field_file``; return the variants map.
+
+    Widths are built largest first, each resized from the previous one, so
+    at most the decoded original and one derivative are held at a time.
+    JPEGs are decoded at the smallest scale that still covers the largest
+    width.
+    """
+    storage = field_file.storage
+    with storage.open(field_file.name, 'rb') as source:
+        try:
+            image = Image.open(source)
+            width, height = image.size
+            if image.getexif().get(ExifTags.Base.Orientation) in (5, 6, 7, 8):
+                width, height = height, width
+            widths = [size for size in settings.IMAGE_DERIVATIVE_WIDTHS if size < width] or [width]
+            image.draft(image.mode, (max(widths), max(widths)))
+            image.load()
+            ImageOps.exif_transpose(image, in_place=True)
+        except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as exc:
+            raise InvalidImage(str(exc) or exc.__class__.__name__) from exc
+
+    base = posixpath.splitext(field_file.name)[0]
+    output = output_formats(image)
+    formats = {}
+    for size in sorted(widths, reverse=True):
+        if size != image.width:
+            image = image.resize((size, max(1, round(height * size / width))), Image.LANCZOS)
+        for fmt in output:
+            extension = FORMATS[fmt][1]
+            name = storage.save(f'{base}-{size}w.{extension}', ContentFile(_encode(image, fmt)))
+            formats.setdefault(fmt, {})[str(size)] = name
+    return {'source': field_file.name, 'width': width, 'formats': formats}
+
+
+def variant_names(variants):
+    return [name for names in (variants or {}).get('formats', {}).values() for name in names.values()]
+
+
+def delete_variants(storage, names):
+    for name in names:
+        try:
+            storage.delete(name)
+        except Exception:
+            logger.warning("Could not delete image derivative %s", name, exc_info=True)
+
+
+def remove_image_derivatives(instance):
+    """Drop the jobs and, after commit, the derivative files of a deleted ``instance``."""
+    ImageJob.objects.filter(
+        content_type=ContentType.objects.get_for_model(instance), object_id=instance.pk
+    ).delete()
+    for field_name, variants_field in instance.IMAGE_VARIANT_FIELDS.items():
+        names = variant_names(getattr(instance, variants_field))
+        if names:
+            storage = getattr(instance, field_name).storage
+            transaction.on_commit(lambda storage=storage, names=names: delete_variants(storage, names))
+
+
+def image_error(field_file, variants):
+    """The decode error recorded for the current ``field_file``, or ''."""
+    variants = variants or {}
+    if not field_file or variants.get('source') != field_file.name:
+        return ''
+    return variants.get('error', '')
+
+
+def build_srcsets(field_file, variants, request=None):
+    """``{format: srcset}`` for ``field_file``, or None while it has no derivatives.
+
+    Formats are listed best first, matching the ``<source>`` order of a
+    ``<picture>`` element.
+    """
+    variants = variants or {}
+    if not field_file or variants.get('source') != field_file.name or variants.get('error'):
+        return None
+    storage = field_file.storage
+    srcsets = {}
+    for fmt in FORMATS:
+        names = variants['formats'].get(fmt)
+        if not names:
+            continue
+        candidates = []
+        for width, name in sorted(names.items(), key=lambda item: int(item[0])):
+            url = storage.url(name)
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            candidates.append(f'{url} {width}w')
+        srcsets[fmt] = ', '.join(candidates)
+    return srcsets
+
+
+def enqueue_stale_images(instance):
+    """Queue a job for every image field of ``instance`` whose derivatives are out of date.
+
+    Returns the number of jobs queued.
+    """
+    content_type = None
+    queued = 0
+    for field_name, variants_field in instance.IMAGE_VARIANT_FIELDS.items():
+        name = getattr(instance, field_name).name or ''
+        if name == (getattr(instance, variants_field) or {}).get('source', ''):
+            continue
+        content_type = content_type or ContentType.objects.get_for_model(instance)
+        # Requeue an existing job; clearing locked_by stops a worker still
+        # busy with the previous image from marking it done.
+        ImageJob.objects.update_or_create(
+            content_type=content_type, object_id=instance.pk, field_name=field_name,
+            defaults={
+                'status': 'queued', 'attempts': 0, 'run_after': timezone.now(),
+                'locked_by': '', 'locked_at': None, 'last_error': '',
+            },
+        )
+        queued += 1
+    return queued
+
+
+def process_image(job):
+    """Rebuild the derivatives for the image named by ``job``."""
+    model = job.content_type.model_class()
+    instance = model.objects.filter(pk=job.object_id).first()
+    if instance is None:
+        return
+    field_file = getattr(instance, job.field_name)
+    variants_field = model.IMAGE_VARIANT_FIELDS[job.field_name]
+    previous = getattr(instance, variants_field) or {}
+
+    failure = None
+    try:
+        variants = build_variants(field_file) if field_file else {}
+    except InvalidImage as exc:
+        variants, failure = {'source': field_file.name, 'error': str(exc)}, exc
+    # Only record the derivatives if the image was not replaced meanwhile;
+    # the save that replaced it queued its own job.
+    unchanged = Q(**{job.field_name: field_file.name}) if field_file else (
+        Q(**{f'{job.field_name}__isnull': True}) | Q(**{job.field_name: ''})
+    )
+    if not model.objects.filter(unchanged, pk=instance.pk).update(**{variants_field: variants}):
+        delete_variants(field_file.storage, variant_names(variants))
+        return
+
+    kept = set(variant_names(variants))
+    delete_variants(field_file.storage, [name for name in variant_names(previous) if name not in kept])
+    # update() skips post_save, so drop the cached responses that carry the URLs.
+    if model is SiteSettings:
+        invalidate_site_settings()
+    else:
+        bump_catalogue_version()
+    if failure is not None:
+        raise failure
+
+
+class ImageJobQueue(JobQueue):
+    model = ImageJob
+    lock_timeout_setting = 'IMAGE_JOB_LOCK_TIMEOUT'
+    select_related = ('content_type',)
+    logger = logging.getLogger(__name__)
+
+    def process(self, job, context=None):
+        process_image(job)
+        return True
+
+    def is_retryable(self, exc):
+        # Decoding the same file again gives the same result.
+        return not isinstance(exc, InvalidImage)
+
+
+image_jobs = ImageJobQueue()
+claim_jobs = image_jobs.claim
+run_job = image_jobs.run_job
+run_pending_jobs = image_jobs.run_pending
+
+
+def enqueue_missing(models=None):
+    """Queue jobs for every stored image without current derivatives; return the count."""
+    queued = 0
+    for model in models or (Product, SiteSettings):
+        columns = [name for pair in model.IMAGE_VARIANT_FIELDS.items() for name in pair]
+        for instance in model.objects.only('pk', *columns).iterator():
+            queued += enqueue_stale_images(instance)
+    return queued
@@ -4,6 +4,7 @@ from django.utils import timezone
 from datetime import timedelta
 from product.models import Cart, Wishlist, Review
 from payments.models import Payment, PaymentLog
+from payments.transitions import purge_logs
 from account.models import OrderModel
 
 
@@ -48,15 +49,16 @@ class Command(BaseCommand):
             )
 
         try:
+            # Payment logs are purged in batches, each committed on its own,
+            # so this stays outside the transaction below.
+            if options['cleanup_logs']:
+                self._cleanup_old_logs(cutoff_date, dry_run)
+
             with transaction.atomic():
                 # Clean up stale cart items that haven't been updated
                 if options['cleanup_carts']:
                     self._cleanup_old_carts(cutoff_date, dry_run)
                 
-                # Remove old payment logs to save space
-                if options['cleanup_logs']:
-                    self._cleanup_old_logs(cutoff_date, dry_run)
-                
                 # Remove orphaned records that reference deleted objects
                 self._cleanup_orphaned_data(dry_run)
                 
@@ -91,15 +93,14 @@ class Command(BaseCommand):
 
     def _cleanup_old_logs(self, cutoff_date, dry_run):
         """Clean up old payment logs"""
-        old_logs = PaymentLog.objects.filter(created_at__lt=cutoff_date)
-        count = old_logs.count()
-        
-        if count > 0:
-            if not dry_run:
-                deleted_count = old_logs.delete()[0]
-                self.stdout.write(f'  ✓ Deleted {deleted_count} old payment logs')
-            else:
-                self.stdout.write(f'  🔍 Would delete {count} old payment logs')
+        if dry_run:
+            count = PaymentLog.objects.filter(created_at__lt=cutoff_date).count()
+            self.stdout.write(f'  🔍 Would delete {count} old payment logs')
+            return
+
+        deleted_count = purge_logs(cutoff_date)
+        if deleted_count > 0:
+            self.stdout.write(f'  ✓ Deleted {deleted_count} old payment logs')
         else:
             self.stdout.write('  ✓ No old payment logs to clean')
 
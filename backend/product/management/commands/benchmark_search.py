@@ -0,0 +1,83 @@
+import random
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from product.models import Category, Product
+from product.search import FallbackSearchBackend, get_search_backend
+
+WORDS = [
+    'rice', 'basmati', 'organic', 'fresh', 'mango', 'tea', 'coffee', 'cable',
+    'wireless', 'speaker', 'chocolate', 'biscuit', 'shampoo', 'detergent',
+    'spice', 'turmeric', 'cumin', 'yogurt', 'butter', 'noodles', 'premium',
+    'family', 'pack', 'classic', 'dhaka', 'local', 'imported', 'sweet',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the full-text search index against the legacy icontains filter '
+        'on a synthetic catalogue. All generated rows are rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100000, help='Synthetic products to generate')
+        parser.add_argument('--repeat', type=int, default=5, help='Timed runs per query')
+        parser.add_argument(
+            '--query',
+            action='append',
+            dest='queries',
+            help='Search phrase to benchmark (repeatable)',
+        )
+
+    def handle(self, *args, **options):
+        queries = options['queries'] or ['rice', 'organic tea', 'wirel', 'sweet mango pack']
+        indexed_backend = get_search_backend()
+        legacy_backend = FallbackSearchBackend()
+
+        with transaction.atomic():
+            self._generate(options['products'])
+            started = time.perf_counter()
+            indexed_backend.rebuild()
+            self.stdout.write(f'Index build: {(time.perf_counter() - started) * 1000:.0f} ms')
+
+            self.stdout.write(f'{"query":<20} {"legacy ms":>10} {"indexed ms":>11} {"matches":>8}')
+            for query in queries:
+                legacy_ms, legacy_count = self._time(legacy_backend, query, options['repeat'])
+                indexed_ms, indexed_count = self._time(indexed_backend, query, options['repeat'])
+                self.stdout.write(
+                    f'{query:<20} {legacy_ms:>10.1f} {indexed_ms:>11.1f} '
+                    f'{indexed_count:>8}' + ('' if legacy_count == indexed_count else f' (legacy {legacy_count})')
+                )
+            transaction.set_rollback(True)
+
+    def _generate(self, count):
+        rng = random.Random(42)
+        categories = [
+            Category.objects.create(name=f'Benchmark {word}') for word in WORDS[:10]
+        ]
+        batch = []
+        for index in range(count):
+            batch.append(Product(
+                name=' '.join(rng.sample(WORDS, 3)) + f' {index}',
+                description=' '.join(rng.choices(WORDS, k=20)),
+                price=Decimal(rng.randint(100, 10000)) / 100,
+                stock=True,
+                category=rng.choice(categories),
+            ))
+            if len(batch) == 5000:
+                Product.objects.bulk_create(batch)
+                batch = []
+        Product.objects.bulk_create(batch)
+
+    def _time(self, backend, query, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            queryset = backend.search(Product.objects.all(), query)
+            matches = queryset.count()
+            list(queryset.order_by('-search_rank', '-created_at')[:12])
+            timings.append((time.perf_counter() - started) * 1000)
+        return sorted(timings)[len(timings) // 2], matches
@@ -4,6 +4,7 @@ from django.contrib.auth.models import User
 from django.core.management.base import BaseCommand
 
 from payments.models import PaymentMethod
+from product.cache import warm_catalogue_cache
 from product.models import Category, Product
 
 
@@ -14,6 +15,7 @@ class Command(BaseCommand):
         self._create_superuser()
         self._seed_payment_methods()
         self._seed_products()
+        self._warm_caches()
         self.stdout.write(self.style.SUCCESS('Bootstrap complete.'))
 
     def _seed_payment_methods(self):
@@ -186,6 +188,10 @@ class Command(BaseCommand):
         if count:
             self.stdout.write(self.style.SUCCESS(f'Seeded {count} sample products.'))
 
+    def _warm_caches(self):
+        warmed = warm_catalogue_cache()
+        self.stdout.write(self.style.SUCCESS(f'Warmed {warmed} catalogue cache entries.'))
+
     def _create_superuser(self):
         username = os.getenv('DJANGO_SUPERUSER_USERNAME')
         email = os.getenv('DJANGO_SUPERUSER_EMAIL', '')
@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from product.models import Category, Product
+from product.views import StandardResultsSetPagination, filter_products
+
+# Filter combinations the storefront sends to /api/products/.
+PRODUCT_QUERY_COMBINATIONS = [
+    ('newest', {}),
+    ('category', {'category': '{category}'}),
+    ('category + in stock', {'category': '{category}', 'stock': 'true'}),
+    ('featured', {'featured': 'true'}),
+    ('in stock', {'stock': 'true'}),
+    ('price range by price', {'price_min': '10', 'price_max': '100', 'ordering': 'price_low'}),
+    ('price high to low', {'ordering': 'price_high'}),
+    ('name', {'ordering': 'name'}),
+    ('top rated', {'ordering': 'rating'}),
+]
+
+
+class Command(BaseCommand):
+    help = 'Print EXPLAIN plans for the product list queries so index usage can be verified.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--analyze',
+            action='store_true',
+            help='Execute the queries and report actual timings (PostgreSQL only)',
+        )
+        parser.add_argument(
+            '--combination',
+            action='append',
+            dest='combinations',
+            help='Only explain the named combination (repeatable)',
+        )
+
+    def handle(self, *args, **options):
+        category = Category.objects.order_by('id').values_list('id', flat=True).first() or 1
+        explain_options = {}
+        if options['analyze'] and connection.vendor == 'postgresql':
+            explain_options = {'analyze': True, 'buffers': True}
+
+        page_size = StandardResultsSetPagination.page_size
+        for label, params in PRODUCT_QUERY_COMBINATIONS:
+            if options['combinations'] and label not in options['combinations']:
+                continue
+            params = {key: value.format(category=category) for key, value in params.items()}
+            products, order_by = filter_products(Product.objects.all(), params)
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{label}: {params or "(no filters)"}'))
+            self.stdout.write(f'ORDER BY {", ".join(order_by)}')
+            self.stdout.write(products[:page_size].explain(**explain_options))
+            self.stdout.write('')
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import CommandError
+
+from my_project.jobs import JobWorkerCommand
+from product.images import enqueue_missing, image_jobs
+
+
+class Command(JobWorkerCommand):
+    help = 'Run the background worker that builds resized image derivatives.'
+    queue = image_jobs
+    noun = 'image'
+    default_poll_interval = 2.0
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--backfill',
+            action='store_true',
+            help='First queue jobs for stored images that have no current derivatives',
+        )
+
+    def handle(self, *args, **options):
+        if settings.IMAGE_JOBS_REQUIRE_CLOUDINARY and not settings.USE_CLOUDINARY:
+            raise CommandError(
+                'IMAGE_JOBS_REQUIRE_CLOUDINARY is set but Cloudinary is not configured; '
+                'derivatives written to local disk would not reach the web service.'
+            )
+        if options['backfill']:
+            self.stdout.write(f'Queued {enqueue_missing()} image jobs.')
+        super().handle(*args, **options)
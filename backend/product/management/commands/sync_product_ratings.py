@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+
+from product.cache import bump_catalogue_version
+from product.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Backfill or verify the denormalized rating aggregates and histograms stored on products.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Report products whose stored aggregates drifted without fixing them',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Number of products to read and update per batch (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        star_fields = list(Product.RATING_COUNT_FIELDS.values())
+        products = Product.objects.annotate(
+            expected_sum=Coalesce(Sum('reviews__rating'), 0),
+            expected_count=Count('reviews'),
+            **{
+                f'expected_{field}': Count('reviews', filter=Q(reviews__rating=star))
+                for star, field in Product.RATING_COUNT_FIELDS.items()
+            },
+        ).only('id', 'name', 'rating_sum', 'rating_count', 'average_rating', *star_fields).order_by('id')
+
+        drifted = []
+        for product in products.iterator(chunk_size=batch_size):
+            expected_average = Product.compute_average_rating(product.expected_sum, product.expected_count)
+            expected_histogram = {field: getattr(product, f'expected_{field}') for field in star_fields}
+            if (
+                product.rating_sum == product.expected_sum
+                and product.rating_count == product.expected_count
+                and product.average_rating == expected_average
+                and all(getattr(product, field) == count for field, count in expected_histogram.items())
+            ):
+                continue
+
+            if options['check']:
+                self.stdout.write(
+                    f'Product {product.id} ({product.name}): stored '
+                    f'{product.rating_count} reviews / {product.average_rating}, '
+                    f'expected {product.expected_count} / {expected_average}'
+                )
+            product.rating_sum = product.expected_sum
+            product.rating_count = product.expected_count
+            product.average_rating = expected_average
+            for field, count in expected_histogram.items():
+                setattr(product, field, count)
+            drifted.append(product)
+
+        if options['check']:
+            if drifted:
+                raise CommandError(f'{len(drifted)} products have stale rating aggregates.')
+            self.stdout.write(self.style.SUCCESS('Rating aggregates are consistent.'))
+            return
+
+        Product.objects.bulk_update(
+            drifted,
+            ['rating_sum', 'rating_count', 'average_rating', *star_fields],
+            batch_size=batch_size,
+        )
+        if drifted:
+            bump_catalogue_version()
+        self.stdout.write(self.style.SUCCESS(f'Updated rating aggregates for {len(drifted)} products.'))
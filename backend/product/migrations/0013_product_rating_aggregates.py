@@ -0,0 +1,43 @@
+# Generated by Django 4.2.13 on 2026-10-18 09:00
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Product = apps.get_model('product', 'Product')
+    rated = Product.objects.annotate(
+        total=Sum('reviews__rating'),
+        total_count=Count('reviews'),
+    ).filter(total_count__gt=0)
+    for product in rated.iterator():
+        product.rating_sum = product.total
+        product.rating_count = product.total_count
+        product.average_rating = round(product.total / product.total_count, 1)
+        product.save(update_fields=['rating_sum', 'rating_count', 'average_rating'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0012_sitesettings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='average_rating',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
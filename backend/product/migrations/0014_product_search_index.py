@@ -0,0 +1,49 @@
+from django.db import migrations
+
+
+SQLITE_CREATE = [
+    "CREATE VIRTUAL TABLE product_search USING fts5("
+    "name, description, category, tokenize = 'unicode61 remove_diacritics 2')",
+    "INSERT INTO product_search(rowid, name, description, category) "
+    "SELECT p.id, p.name, p.description, COALESCE(c.name, '') "
+    "FROM product_product p LEFT JOIN product_category c ON c.id = p.category_id",
+]
+
+POSTGRES_CREATE = [
+    "CREATE TABLE product_search ("
+    "product_id bigint PRIMARY KEY REFERENCES product_product(id) ON DELETE CASCADE, "
+    "document tsvector NOT NULL)",
+    "CREATE INDEX product_search_document_gin ON product_search USING GIN (document)",
+    "INSERT INTO product_search(product_id, document) "
+    "SELECT p.id, "
+    "setweight(to_tsvector('simple', p.name), 'A') || "
+    "setweight(to_tsvector('simple', COALESCE(c.name, '')), 'B') || "
+    "setweight(to_tsvector('simple', p.description), 'C') "
+    "FROM product_product p LEFT JOIN product_category c ON c.id = p.category_id",
+]
+
+CREATE_STATEMENTS = {
+    'sqlite': SQLITE_CREATE,
+    'postgresql': POSTGRES_CREATE,
+}
+
+
+def create_search_index(apps, schema_editor):
+    for statement in CREATE_STATEMENTS.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in CREATE_STATEMENTS:
+        schema_editor.execute('DROP TABLE IF EXISTS product_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('product', '0013_product_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,14 +1,15 @@
-from django.db import models
+from django.conf import settings
+from django.db import models, transaction
 from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
 from django.core.validators import MinValueValidator, MaxValueValidator, FileExtensionValidator
 from django.utils import timezone
 from django.core.exceptions import ValidationError
-from django.db.models import Avg
 
 
 def validate_image_size(image):
-    if image.size > 5 * 1024 * 1024:
-        raise ValidationError("Maximum file size is 5MB")
+    if image.size > settings.IMAGE_UPLOAD_MAX_SIZE:
+        raise ValidationError(f"Maximum file size is {settings.IMAGE_UPLOAD_MAX_SIZE // (1024 * 1024)}MB")
 
 
 class Category(models.Model):
@@ -50,8 +51,16 @@ class SiteSettings(models.Model):
             validate_image_size,
         ],
     )
+    # Resized WebP/AVIF/JPEG copies of the images above (see product.images).
+    hero_background_variants = models.JSONField(default=dict, blank=True, editable=False)
+    promo_background_variants = models.JSONField(default=dict, blank=True, editable=False)
     updated_at = models.DateTimeField(auto_now=True)
 
+    IMAGE_VARIANT_FIELDS = {
+        'hero_background_image': 'hero_background_variants',
+        'promo_background_image': 'promo_background_variants',
+    }
+
     class Meta:
         verbose_name = 'Site Settings'
         verbose_name_plural = 'Site Settings'
@@ -83,27 +92,104 @@ class Product(models.Model):
             validate_image_size
         ]
     )
-    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='products')
+    # Covered by the leading column of product_cat_created_idx.
+    category = models.ForeignKey(
+        Category, on_delete=models.SET_NULL, null=True, blank=True, related_name='products', db_index=False
+    )
+    # Resized WebP/AVIF/JPEG copies of the image (see product.images).
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_featured = models.BooleanField(default=False)
+    # Denormalized review aggregates, maintained by Review.save and the
+    # review post_delete signal so listings never aggregate per row.
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    average_rating = models.FloatField(default=0, editable=False)
+    # Review count per star rating, kept alongside the aggregates above.
+    rating_1_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_2_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_3_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_4_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_5_count = models.PositiveIntegerField(default=0, editable=False)
+
+    RATING_COUNT_FIELDS = {star: f'rating_{star}_count' for star in range(1, 6)}
+    IMAGE_VARIANT_FIELDS = {'image': 'image_variants'}
     
     class Meta:
         ordering = ['-created_at']
+        # Each index mirrors a ProductView filter/ordering combination, ending
+        # in the id tiebreaker the list orderings use. Boolean filters compile
+        # to a bare column test, so stock and is_featured are partial index
+        # conditions rather than key columns; the category index serves the
+        # in-stock filter as a residual check. Check plans with
+        # `manage.py explain_product_queries`.
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='product_created_idx'),
+            models.Index(fields=['category', '-created_at', '-id'], name='product_cat_created_idx'),
+            models.Index(
+                fields=['-created_at', '-id'],
+                condition=models.Q(is_featured=True),
+                name='product_featured_created_idx',
+            ),
+            models.Index(
+                fields=['-created_at', '-id'],
+                condition=models.Q(stock=True),
+                name='product_in_stock_created_idx',
+            ),
+            models.Index(fields=['price', 'id'], name='product_price_idx'),
+            models.Index(fields=['name', 'id'], name='product_name_idx'),
+            models.Index(fields=['-average_rating', '-rating_count', '-id'], name='product_rating_idx'),
+        ]
     
     def __str__(self):
         return self.name
     
-    @property
-    def average_rating(self):
-        result = self.reviews.aggregate(avg_rating=Avg('rating'))
-        if result['avg_rating']:
-            return round(result['avg_rating'], 1)
-        return 0
-    
     @property
     def review_count(self):
-        return self.reviews.count()
+        return self.rating_count
+
+    @staticmethod
+    def compute_average_rating(rating_sum, rating_count):
+        if not rating_count:
+            return 0
+        return round(rating_sum / rating_count, 1)
+
+    @property
+    def rating_histogram(self):
+        return {star: getattr(self, field) for star, field in self.RATING_COUNT_FIELDS.items()}
+
+    def apply_rating_change(self, added=None, removed=None):
+        """Record a review rating ``added`` and/or ``removed`` (1-5 or None)."""
+        deltas = {}
+        for rating, delta in ((added, 1), (removed, -1)):
+            field = self.RATING_COUNT_FIELDS.get(rating)
+            if field is not None:
+                deltas[field] = deltas.get(field, 0) + delta
+        sum_delta = (added or 0) - (removed or 0)
+        count_delta = (added is not None) - (removed is not None)
+
+        with transaction.atomic():
+            current = Product.objects.select_for_update().filter(pk=self.pk).values(
+                'rating_sum', 'rating_count', *deltas
+            ).first()
+            if current is None:
+                return
+            rating_sum = max(current['rating_sum'] + sum_delta, 0)
+            rating_count = max(current['rating_count'] + count_delta, 0)
+            average_rating = self.compute_average_rating(rating_sum, rating_count)
+            counts = {field: max(current[field] + delta, 0) for field, delta in deltas.items()}
+            Product.objects.filter(pk=self.pk).update(
+                rating_sum=rating_sum,
+                rating_count=rating_count,
+                average_rating=average_rating,
+                **counts,
+            )
+        self.rating_sum = rating_sum
+        self.rating_count = rating_count
+        self.average_rating = average_rating
+        for field, count in counts.items():
+            setattr(self, field, count)
 
 
 class Cart(models.Model):
@@ -153,6 +239,11 @@ class Review(models.Model):
     class Meta:
         unique_together = ('product', 'user')
         ordering = ['-created_at']
+        indexes = [
+            # Paginated product reviews, newest first, optionally by rating.
+            models.Index(fields=['product', '-created_at', '-id'], name='review_product_created_idx'),
+            models.Index(fields=['product', 'rating', '-created_at', '-id'], name='review_product_rating_idx'),
+        ]
     
     def __str__(self):
         return f"{self.user.username} - {self.product.name} ({self.rating}★)"
@@ -160,12 +251,52 @@ class Review(models.Model):
     def save(self, *args, **kwargs):
         # Auto-verify if user has purchased this product
         if not self.is_verified:
-            from account.models import OrderModel
-            user_orders = OrderModel.objects.filter(
-                user=self.user, 
-                ordered_item__icontains=self.product.name,
-                paid_status=True
-            )
-            if user_orders.exists():
-                self.is_verified = True
-        super().save(*args, **kwargs)
\ No newline at end of file
+            from account.models import OrderItem
+            self.is_verified = OrderItem.has_purchased(self.user_id, self.product_id)
+
+        previous_rating = None
+        if not self._state.adding:
+            previous_rating = Review.objects.filter(pk=self.pk).values_list('rating', flat=True).first()
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if previous_rating is None:
+                self.product.apply_rating_change(added=self.rating)
+            elif previous_rating != self.rating:
+                self.product.apply_rating_change(added=self.rating, removed=previous_rating)
+
+
+class ImageJob(models.Model):
+    """Queue entry asking the image worker to rebuild one image's derivatives."""
+
+    JOB_STATUS = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    field_name = models.CharField(max_length=50)
+    status = models.CharField(max_length=10, choices=JOB_STATUS, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=64, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['run_after', 'id']
+        constraints = [
+            models.UniqueConstraint(fields=['content_type', 'object_id', 'field_name'], name='unique_image_job'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='imagejob_status_run_idx'),
+        ]
+
+    def __str__(self):
+        return f"Images for {self.content_type.model} {self.object_id}.{self.field_name} ({self.status})"
@@ -0,0 +1,160 @@
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+
+from .models import Category, Product
+
+SEARCH_TABLE = 'product_search'
+MAX_SEARCH_TOKENS = 8
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(query):
+    return TOKEN_RE.findall(query.lower())[:MAX_SEARCH_TOKENS]
+
+
+class FallbackSearchBackend:
+    """Unindexed icontains matching, used on databases without a search index."""
+
+    def search(self, queryset, query):
+        for token in tokenize(query):
+            queryset = queryset.filter(
+                Q(name__icontains=token)
+                | Q(description__icontains=token)
+                | Q(category__name__icontains=token)
+            )
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    def index_products(self, where='', params=()):
+        return 0
+
+    def index_product(self, product_id):
+        return self.index_products('WHERE p.id = %s', [product_id])
+
+    def index_category(self, category_id):
+        if category_id is None:
+            return self.index_products('WHERE p.category_id IS NULL')
+        return self.index_products('WHERE p.category_id = %s', [category_id])
+
+    def remove_product(self, product_id):
+        pass
+
+    def rebuild(self):
+        return 0
+
+
+class IndexedSearchBackend(FallbackSearchBackend):
+    """Shared plumbing for the side table that mirrors searchable product text."""
+
+    product_table = Product._meta.db_table
+    category_table = Category._meta.db_table
+
+    def _execute(self, sql, params=()):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.rowcount
+
+    def _source_sql(self, where):
+        return (
+            f'SELECT p.id, p.name, p.description, COALESCE(c.name, \'\') '
+            f'FROM {self.product_table} p '
+            f'LEFT JOIN {self.category_table} c ON c.id = p.category_id '
+            f'{where}'
+        )
+
+    def rebuild(self):
+        self._execute(f'DELETE FROM {SEARCH_TABLE}')
+        return self.index_products()
+
+    def search(self, queryset, query):
+        tokens = tokenize(query)
+        if not tokens:
+            return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+        match = self.build_query(tokens)
+        # Joining the index table lets the full-text match drive the query;
+        # a correlated subquery would re-run the match for every product row.
+        return queryset.extra(
+            tables=[SEARCH_TABLE],
+            where=[self.join_sql, self.match_sql],
+            params=[match],
+            select={'search_rank': self.rank_sql},
+            select_params=self.rank_params(match),
+        )
+
+    def rank_params(self, match):
+        return []
+
+
+class SQLiteSearchBackend(IndexedSearchBackend):
+    """FTS5 virtual table keyed by product rowid, ranked with weighted bm25."""
+
+    # bm25 weights follow the column order: name, description, category.
+    # It returns lower-is-better scores, so the sign is flipped.
+    join_sql = f'{SEARCH_TABLE}.rowid = {Product._meta.db_table}.id'
+    match_sql = f'{SEARCH_TABLE} MATCH %s'
+    rank_sql = f'-bm25({SEARCH_TABLE}, 10.0, 1.0, 5.0)'
+
+    def build_query(self, tokens):
+        return ' '.join(f'"{token}"*' for token in tokens)
+
+    def index_products(self, where='', params=()):
+        if where:
+            self._execute(
+                f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN '
+                f'(SELECT p.id FROM {self.product_table} p {where})',
+                params,
+            )
+        return self._execute(
+            f'INSERT INTO {SEARCH_TABLE}(rowid, name, description, category) '
+            + self._source_sql(where),
+            params,
+        )
+
+    def remove_product(self, product_id):
+        self._execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [product_id])
+
+
+class PostgresSearchBackend(IndexedSearchBackend):
+    """tsvector document per product behind a GIN index, ranked with ts_rank."""
+
+    join_sql = f'{SEARCH_TABLE}.product_id = {Product._meta.db_table}.id'
+    match_sql = f"{SEARCH_TABLE}.document @@ to_tsquery('simple', %s)"
+    rank_sql = f"ts_rank({SEARCH_TABLE}.document, to_tsquery('simple', %s))"
+    document_sql = (
+        "setweight(to_tsvector('simple', src.name), 'A') || "
+        "setweight(to_tsvector('simple', src.category), 'B') || "
+        "setweight(to_tsvector('simple', src.description), 'C')"
+    )
+
+    def build_query(self, tokens):
+        return ' & '.join(f'{token}:*' for token in tokens)
+
+    def rank_params(self, match):
+        return [match]
+
+    def index_products(self, where='', params=()):
+        return self._execute(
+            f'INSERT INTO {SEARCH_TABLE}(product_id, document) '
+            f'SELECT src.id, {self.document_sql} '
+            f'FROM ({self._source_sql(where)}) AS src(id, name, description, category) '
+            f'ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document',
+            params,
+        )
+
+    def remove_product(self, product_id):
+        self._execute(f'DELETE FROM {SEARCH_TABLE} WHERE product_id = %s', [product_id])
+
+
+SEARCH_BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_search_backend():
+    return SEARCH_BACKENDS.get(connection.vendor, FallbackSearchBackend)()
+
+
+def search_products(queryset, query):
+    return get_search_backend().search(queryset, query)
@@ -1,6 +1,12 @@
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
 from rest_framework import serializers
+from .images import build_srcsets, image_error
 from .models import Product, Category, Cart, Wishlist, Review, SiteSettings
+from .uploads import UploadedImageField
 from django.contrib.auth.models import User
+from account.models import BillingAddress, OrderItem, OrderModel
+from my_project.serializers import DynamicFieldsMixin
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -11,18 +17,32 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'description', 'product_count', 'created_at']
     
     def get_product_count(self, obj):
+        # CategoryListView annotates the count; a lone category queries it.
+        if hasattr(obj, 'in_stock_count'):
+            return obj.in_stock_count
         return obj.products.filter(stock=True).count()
 
 
 class SiteSettingsSerializer(serializers.ModelSerializer):
+    serializer_field_mapping = {**serializers.ModelSerializer.serializer_field_mapping, models.ImageField: UploadedImageField}
+    hero_background_srcset = serializers.SerializerMethodField()
+    promo_background_srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = SiteSettings
         fields = [
             'site_name', 'hero_eyebrow', 'hero_title', 'hero_subtitle',
             'support_email', 'support_phone', 'footer_address',
-            'hero_background_image', 'promo_background_image', 'updated_at'
+            'hero_background_image', 'hero_background_srcset',
+            'promo_background_image', 'promo_background_srcset', 'updated_at'
         ]
 
+    def get_hero_background_srcset(self, obj):
+        return build_srcsets(obj.hero_background_image, obj.hero_background_variants, self.context.get('request'))
+
+    def get_promo_background_srcset(self, obj):
+        return build_srcsets(obj.promo_background_image, obj.promo_background_variants, self.context.get('request'))
+
 
 class ReviewSerializer(serializers.ModelSerializer):
     user_name = serializers.CharField(source='user.username', read_only=True)
@@ -41,40 +61,104 @@ class ReviewSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class WishlistAwareListSerializer(serializers.ListSerializer):
+    """Resolve wishlist membership for a whole list with a single query.
+
+    The product ids found on the page are looked up once and stored in the
+    shared serializer context as ``wishlist_product_ids``, which
+    ``ProductCardSerializer.get_is_in_wishlist`` answers from in memory.
+    """
+
+    def get_product_id(self, item):
+        return item.pk
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        request = self.context.get('request')
+        if request is not None and request.user.is_authenticated:
+            product_ids = [self.get_product_id(item) for item in items]
+            self.context['wishlist_product_ids'] = set(
+                Wishlist.objects.filter(
+                    user=request.user, product_id__in=product_ids
+                ).values_list('product_id', flat=True)
+            )
+        return super().to_representation(items)
+
+
+class ProductItemListSerializer(WishlistAwareListSerializer):
+    def get_product_id(self, item):
+        return item.product_id
+
+
+class ProductCardSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     category_name = serializers.CharField(source='category.name', read_only=True)
     average_rating = serializers.ReadOnlyField()
     review_count = serializers.ReadOnlyField()
-    reviews = ReviewSerializer(many=True, read_only=True)
     is_in_wishlist = serializers.SerializerMethodField()
-    
+    # {format: srcset} of the resized copies, or null until they are built.
+    image_srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = Product
         fields = [
-            'id', 'name', 'description', 'price', 'stock', 'image', 
-            'category', 'category_name', 'created_at', 'updated_at', 
-            'is_featured', 'average_rating', 'review_count', 'reviews',
-            'is_in_wishlist'
+            'id', 'name', 'price', 'stock', 'image', 'image_srcset', 'category_name',
+            'average_rating', 'review_count', 'is_in_wishlist'
         ]
-    
+        list_serializer_class = WishlistAwareListSerializer
+
     def get_is_in_wishlist(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
+            wishlist_product_ids = self.context.get('wishlist_product_ids')
+            if wishlist_product_ids is not None:
+                return obj.id in wishlist_product_ids
             return Wishlist.objects.filter(user=request.user, product=obj).exists()
         return False
 
+    def get_image_srcset(self, obj):
+        return build_srcsets(obj.image, obj.image_variants, self.context.get('request'))
+
+
+class ProductSerializer(ProductCardSerializer):
+    # Only the newest reviews are prefetched (see product.views.with_review_authors).
+    reviews = ReviewSerializer(many=True, read_only=True)
+    rating_histogram = serializers.ReadOnlyField()
+    
+    class Meta(ProductCardSerializer.Meta):
+        fields = [
+            'id', 'name', 'description', 'price', 'stock', 'image', 'image_srcset',
+            'category', 'category_name', 'created_at', 'updated_at', 
+            'is_featured', 'average_rating', 'review_count', 'rating_histogram',
+            'reviews', 'is_in_wishlist'
+        ]
+
 
 class ProductCreateUpdateSerializer(serializers.ModelSerializer):
+    serializer_field_mapping = {**serializers.ModelSerializer.serializer_field_mapping, models.ImageField: UploadedImageField}
+    # Set by the derivative worker when the stored image cannot be decoded.
+    image_error = serializers.SerializerMethodField()
+
     class Meta:
         model = Product
         fields = [
             'id', 'name', 'description', 'price', 'stock', 'image', 
-            'category', 'is_featured'
+            'category', 'is_featured', 'image_error'
         ]
 
+    def get_image_error(self, obj):
+        return image_error(obj.image, obj.image_variants) or None
+
+
+class CartProductSerializer(serializers.ModelSerializer):
+    """Product snapshot embedded in cart lines; reads only the product row."""
+
+    class Meta:
+        model = Product
+        fields = ['id', 'name', 'price', 'stock', 'image']
+
 
 class CartItemSerializer(serializers.ModelSerializer):
-    product = ProductSerializer(read_only=True)
+    product = CartProductSerializer(read_only=True)
     product_id = serializers.IntegerField(write_only=True)
     total_price = serializers.ReadOnlyField()
     
@@ -113,14 +197,193 @@ class CartItemSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Product does not exist")
 
 
+class CartOperationSerializer(serializers.Serializer):
+    SET = 'set'
+    INCREMENT = 'increment'
+    REMOVE = 'remove'
+
+    product_id = serializers.IntegerField()
+    op = serializers.ChoiceField(choices=[SET, INCREMENT, REMOVE], default=SET)
+    quantity = serializers.IntegerField(min_value=0, default=1)
+
+    def validate(self, attrs):
+        if attrs['op'] == self.INCREMENT and attrs['quantity'] < 1:
+            raise serializers.ValidationError({'quantity': 'Increment must be at least 1.'})
+        return attrs
+
+
+class CartBulkUpdateSerializer(serializers.Serializer):
+    """Apply a batch of cart operations in one transaction.
+
+    Operations run in order against the user's current cart; a ``set`` to
+    zero removes the line. Every product is validated with one query and the
+    resulting rows are written with ``bulk_create``/``bulk_update``.
+    """
+
+    MAX_OPERATIONS = 200
+
+    operations = CartOperationSerializer(many=True, allow_empty=False, max_length=MAX_OPERATIONS)
+
+    def validate_operations(self, operations):
+        product_ids = {operation['product_id'] for operation in operations}
+        stock = dict(Product.objects.filter(id__in=product_ids).values_list('id', 'stock'))
+
+        errors = []
+        for operation in operations:
+            product_id = operation['product_id']
+            adds_items = operation['op'] != CartOperationSerializer.REMOVE and operation['quantity'] > 0
+            if product_id not in stock:
+                errors.append({'product_id': ['Product does not exist']})
+            elif adds_items and not stock[product_id]:
+                errors.append({'product_id': ['Product is out of stock']})
+            else:
+                errors.append({})
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return operations
+
+    def save(self):
+        user = self.context['request'].user
+        operations = self.validated_data['operations']
+        product_ids = {operation['product_id'] for operation in operations}
+
+        with transaction.atomic():
+            existing = {
+                item.product_id: item
+                for item in Cart.objects.select_for_update().filter(user=user, product_id__in=product_ids)
+            }
+            quantities = {product_id: item.quantity for product_id, item in existing.items()}
+            for operation in operations:
+                product_id = operation['product_id']
+                if operation['op'] == CartOperationSerializer.REMOVE:
+                    quantities[product_id] = 0
+                elif operation['op'] == CartOperationSerializer.INCREMENT:
+                    quantities[product_id] = quantities.get(product_id, 0) + operation['quantity']
+                else:
+                    quantities[product_id] = operation['quantity']
+
+            now = timezone.now()
+            to_create, to_update, to_delete = [], [], []
+            for product_id, quantity in quantities.items():
+                item = existing.get(product_id)
+                if item is None:
+                    if quantity:
+                        to_create.append(Cart(user=user, product_id=product_id, quantity=quantity))
+                elif not quantity:
+                    to_delete.append(item.pk)
+                elif quantity != item.quantity:
+                    item.quantity = quantity
+                    item.updated_at = now
+                    to_update.append(item)
+
+            if to_create:
+                Cart.objects.bulk_create(to_create)
+            if to_update:
+                Cart.objects.bulk_update(to_update, ['quantity', 'updated_at'])
+            if to_delete:
+                Cart.objects.filter(pk__in=to_delete).delete()
+
+        return {'created': len(to_create), 'updated': len(to_update), 'removed': len(to_delete)}
+
+
+class CheckoutSerializer(serializers.Serializer):
+    """Turn the user's cart into a paid-pending order in one transaction.
+
+    The user and cart rows are locked, prices are snapshotted into
+    ``OrderItem`` rows, the total is summed in SQL and the cart is emptied
+    before commit. An ``idempotency_key`` makes retries return the order
+    created first.
+    """
+
+    name = serializers.CharField(max_length=120, required=False)
+    address = serializers.CharField(max_length=300, required=False)
+    address_id = serializers.IntegerField(required=False)
+
+    def validate_address_id(self, value):
+        try:
+            return BillingAddress.objects.get(id=value, user=self.context['request'].user)
+        except BillingAddress.DoesNotExist:
+            raise serializers.ValidationError("Address not found")
+
+    def validate(self, attrs):
+        billing = attrs.pop('address_id', None)
+        if billing is not None:
+            attrs.setdefault('name', billing.name)
+            attrs.setdefault('address', (
+                f"{billing.house_no}, {billing.landmark}, {billing.city}, "
+                f"{billing.state} - {billing.pin_code}"
+            )[:300])
+        return attrs
+
+    def save(self, idempotency_key=None):
+        """Return ``(order, created)``; ``created`` is False for a replay."""
+        user = self.context['request'].user
+        try:
+            with transaction.atomic():
+                return self._checkout(user, idempotency_key)
+        except IntegrityError:
+            # A concurrent request with the same key committed first.
+            if idempotency_key is None:
+                raise
+            return OrderModel.objects.get(user=user, checkout_key=idempotency_key), False
+
+    def _checkout(self, user, idempotency_key):
+        # Checkouts for one user run one at a time. A concurrent request with
+        # the same key waits here and then finds the order committed first,
+        # rather than an already emptied cart.
+        list(User.objects.select_for_update().filter(pk=user.pk).values_list('pk', flat=True))
+        if idempotency_key is not None:
+            order = OrderModel.objects.filter(user=user, checkout_key=idempotency_key).first()
+            if order is not None:
+                return order, False
+
+        cart = Cart.objects.filter(user=user)
+        lines = list(
+            cart.select_for_update(of=('self',)).select_related('product').only(
+                'id', 'quantity', 'product__id', 'product__name', 'product__price', 'product__stock'
+            ).order_by('id')
+        )
+        if not lines:
+            raise serializers.ValidationError({'detail': 'Your cart is empty.'})
+        sold_out = [line.product.name for line in lines if not line.product.stock]
+        if sold_out:
+            raise serializers.ValidationError({'detail': f"Out of stock: {', '.join(sold_out)}"})
+
+        total_price = cart.filter(pk__in=[line.pk for line in lines]).aggregate(
+            total=models.Sum(models.F('quantity') * models.F('product__price'))
+        )['total']
+        summary = ', '.join(f"{line.quantity} x {line.product.name}" for line in lines)
+        order = OrderModel.objects.create(
+            user=user,
+            name=self.validated_data.get('name') or user.get_full_name() or user.username,
+            address=self.validated_data.get('address'),
+            ordered_item=summary if len(summary) <= 200 else summary[:197] + '...',
+            total_price=total_price,
+            checkout_key=idempotency_key,
+        )
+        OrderItem.objects.bulk_create([
+            OrderItem(
+                order=order,
+                product_id=line.product.id,
+                product_name=line.product.name,
+                quantity=line.quantity,
+                unit_price=line.product.price,
+            )
+            for line in lines
+        ])
+        cart.filter(pk__in=[line.pk for line in lines]).delete()
+        return order, True
+
+
 class WishlistItemSerializer(serializers.ModelSerializer):
-    product = ProductSerializer(read_only=True)
+    product = ProductCardSerializer(read_only=True)
     product_id = serializers.IntegerField(write_only=True)
     
     class Meta:
         model = Wishlist
         fields = ['id', 'product', 'product_id', 'created_at']
         read_only_fields = ['created_at']
+        list_serializer_class = ProductItemListSerializer
     
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
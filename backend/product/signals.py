@@ -0,0 +1,70 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_catalogue_version, invalidate_site_settings
+from .images import enqueue_stale_images, remove_image_derivatives
+from .models import Category, Product, Review, SiteSettings
+from .search import get_search_backend
+
+
+@receiver(post_delete, sender=Review)
+def remove_review_rating(sender, instance, **kwargs):
+    # Reuse the loaded product when there is one so callers holding it see
+    # the new aggregates; cascades only carry the foreign key.
+    if Review.product.is_cached(instance):
+        product = instance.product
+    else:
+        product = Product(pk=instance.product_id)
+    product.apply_rating_change(removed=instance.rating)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def invalidate_catalogue_cache(sender, **kwargs):
+    bump_catalogue_version()
+
+
+@receiver(post_save, sender=SiteSettings)
+@receiver(post_delete, sender=SiteSettings)
+def refresh_site_settings(sender, **kwargs):
+    # After commit, or another worker could cache the old row under the new version.
+    transaction.on_commit(invalidate_site_settings)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=SiteSettings)
+def queue_image_derivatives(sender, instance, **kwargs):
+    enqueue_stale_images(instance)
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=SiteSettings)
+def delete_image_derivatives(sender, instance, **kwargs):
+    remove_image_derivatives(instance)
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    get_search_backend().index_product(instance.pk)
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    get_search_backend().remove_product(instance.pk)
+
+
+@receiver(post_save, sender=Category)
+def reindex_category_products(sender, instance, created, **kwargs):
+    if not created:
+        get_search_backend().index_category(instance.pk)
+
+
+@receiver(post_delete, sender=Category)
+def reindex_uncategorized_products(sender, instance, **kwargs):
+    # SET_NULL has already detached the products by the time this runs.
+    get_search_backend().index_category(None)
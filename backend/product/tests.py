@@ -1,12 +1,35 @@
-from django.test import TestCase, Client
+from django.test import TestCase, TransactionTestCase, Client, skipUnlessDBFeature
 from django.urls import reverse
+from django.conf import settings
+from django.contrib.admin import site as admin_site
 from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from io import BytesIO, StringIO
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from decimal import Decimal
 import json
+import os
+import runpy
+import shutil
+import tempfile
+import threading
+from unittest import mock
 
-from .models import Product, Category, Cart, Wishlist, Review
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image
+
+from account.models import BillingAddress, OrderModel
+
+from .admin import ProductAdmin
+from .cache import get_site_settings, invalidate_site_settings
+from .images import run_pending_jobs as run_image_jobs
+from .models import Product, Category, Cart, Wishlist, Review, SiteSettings, ImageJob
 
 
 class CategoryModelTest(TestCase):
@@ -81,6 +104,68 @@ class ProductModelTest(TestCase):
         self.assertEqual(self.product.average_rating, 4.0)
         self.assertEqual(self.product.review_count, 2)
 
+    def test_rating_aggregates_follow_review_writes(self):
+        review = Review.objects.create(
+            product=self.product,
+            user=self.user,
+            rating=5,
+            comment="Great product!"
+        )
+        review.rating = 2
+        review.save()
+
+        product = Product.objects.get(id=self.product.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(product.average_rating, 2.0)
+            self.assertEqual(product.review_count, 1)
+            self.assertEqual(product.rating_histogram, {1: 0, 2: 1, 3: 0, 4: 0, 5: 0})
+
+        review.delete()
+        product.refresh_from_db()
+        self.assertEqual(product.rating_sum, 0)
+        self.assertEqual(product.rating_count, 0)
+        self.assertEqual(product.average_rating, 0)
+        self.assertEqual(product.rating_2_count, 0)
+
+    def test_user_deletion_updates_rating_aggregates(self):
+        Review.objects.create(product=self.product, user=self.user, rating=4, comment="Good")
+        self.user.delete()
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.review_count, 0)
+        self.assertEqual(self.product.average_rating, 0)
+
+
+class SyncProductRatingsCommandTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="rater", password="testpass123")
+        self.product = Product.objects.create(name="Rated", price=Decimal('10.00'), stock=True)
+        Review.objects.create(product=self.product, user=self.user, rating=3, comment="Fine")
+        Product.objects.filter(id=self.product.id).update(
+            rating_sum=0, rating_count=0, average_rating=0, rating_3_count=0
+        )
+
+    def test_check_reports_drift(self):
+        with self.assertRaises(CommandError):
+            call_command('sync_product_ratings', '--check', stdout=StringIO())
+
+    def test_backfill_repairs_drift(self):
+        call_command('sync_product_ratings', stdout=StringIO())
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.rating_sum, 3)
+        self.assertEqual(self.product.rating_count, 1)
+        self.assertEqual(self.product.average_rating, 3.0)
+        self.assertEqual(self.product.rating_histogram, {1: 0, 2: 0, 3: 1, 4: 0, 5: 0})
+        call_command('sync_product_ratings', '--check', stdout=StringIO())
+
+    def test_check_reports_histogram_drift(self):
+        call_command('sync_product_ratings', stdout=StringIO())
+        Product.objects.filter(id=self.product.id).update(rating_3_count=0, rating_4_count=1)
+
+        with self.assertRaises(CommandError):
+            call_command('sync_product_ratings', '--check', stdout=StringIO())
+
 
 class CartModelTest(TestCase):
     def setUp(self):
@@ -279,7 +364,62 @@ class ReviewAPITest(APITestCase):
         response = self.client.get(url)
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['rating_histogram'], {1: 0, 2: 0, 3: 0, 4: 1, 5: 0})
+
+    def create_reviews(self, ratings):
+        users = User.objects.bulk_create(
+            User(username=f"reviewer{i}", password="x") for i in range(len(ratings))
+        )
+        for user, rating in zip(users, ratings):
+            Review.objects.create(
+                product=self.product, user=user, rating=rating, comment="Review",
+                is_verified=rating == 5,
+            )
+
+    def test_reviews_are_cursor_paginated(self):
+        self.create_reviews([5, 4, 3, 5, 1] * 5)
+        url = reverse('product-reviews', kwargs={'product_id': self.product.id})
+
+        seen = []
+        response = self.client.get(url, {'page_size': 10})
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(review['id'] for review in response.data['results'])
+            if response.data['next'] is None:
+                break
+            response = self.client.get(response.data['next'])
+
+        expected = list(Review.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+        self.assertEqual(response.data['review_count'], 25)
+        self.assertEqual(response.data['rating_histogram'], {1: 5, 2: 0, 3: 5, 4: 5, 5: 10})
+
+    def test_review_filters(self):
+        self.create_reviews([5, 4, 3, 5, 1])
+        url = reverse('product-reviews', kwargs={'product_id': self.product.id})
+
+        response = self.client.get(url, {'rating': '4,5'})
+        self.assertEqual(sorted(review['rating'] for review in response.data['results']), [4, 5, 5])
+
+        response = self.client.get(url, {'verified': 'true'})
+        self.assertEqual([review['rating'] for review in response.data['results']], [5, 5])
+
+        response = self.client.get(url, {'rating': '6'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_product_detail_embeds_latest_reviews_and_histogram(self):
+        self.create_reviews([5, 4, 3, 2, 1, 5, 4])
+        url = reverse('product-details', kwargs={'pk': self.product.id})
+
+        # Product, its newest reviews with their authors, and the wishlist check.
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+
+        latest = list(Review.objects.order_by('-created_at', '-id').values_list('id', flat=True)[:5])
+        self.assertEqual([review['id'] for review in response.data['reviews']], latest)
+        self.assertEqual(response.data['review_count'], 7)
+        self.assertEqual(response.data['rating_histogram'], {1: 1, 2: 1, 3: 1, 4: 2, 5: 2})
 
     def test_duplicate_review_prevention(self):
         # Create first review
@@ -353,4 +493,861 @@ class ProductFilterTest(APITestCase):
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data['results']), 1)
-        self.assertEqual(response.data['results'][0]['name'], 'Laptop')
\ No newline at end of file
+        self.assertEqual(response.data['results'][0]['name'], 'Laptop')
+
+
+class WishlistMembershipQueryTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="shopper", password="testpass123")
+        self.client.force_authenticate(user=self.user)
+
+    def _create_products(self, count):
+        products = [
+            Product.objects.create(name=f"Product {i}", price=Decimal('10.00'), stock=True)
+            for i in range(count)
+        ]
+        for product in products[::2]:
+            Wishlist.objects.create(user=self.user, product=product)
+        return products
+
+    def _count_list_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('products-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return len(queries), response
+
+    def test_product_list_queries_do_not_grow_with_page_size(self):
+        self._create_products(2)
+        small_page_queries, _ = self._count_list_queries()
+
+        Product.objects.all().delete()
+        self._create_products(10)
+        full_page_queries, response = self._count_list_queries()
+
+        self.assertEqual(small_page_queries, full_page_queries)
+        wishlisted = set(Wishlist.objects.filter(user=self.user).values_list('product_id', flat=True))
+        for item in response.data['results']:
+            self.assertEqual(item['is_in_wishlist'], item['id'] in wishlisted)
+
+    def test_wishlist_payload_marks_items(self):
+        self._create_products(3)
+        response = self.client.get(reverse('wishlist'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(all(item['product']['is_in_wishlist'] for item in response.data))
+
+
+class ProductRepresentationTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="reviewer", password="testpass123")
+        self.product = Product.objects.create(
+            name="Headphones",
+            description="Over-ear headphones",
+            price=Decimal('80.00'),
+            stock=True
+        )
+        Review.objects.create(product=self.product, user=self.user, rating=4, comment="Solid")
+
+    def test_product_list_defaults_to_card(self):
+        response = self.client.get(reverse('products-list'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        item = response.data['results'][0]
+        self.assertNotIn('reviews', item)
+        self.assertNotIn('description', item)
+        self.assertEqual(item['average_rating'], 4.0)
+        self.assertEqual(item['review_count'], 1)
+
+    def test_product_list_full_view(self):
+        response = self.client.get(reverse('products-list'), {'view': 'full'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results'][0]['reviews']), 1)
+
+    def test_product_list_field_selection(self):
+        response = self.client.get(reverse('products-list'), {'fields': 'id,name,price'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name', 'price'})
+
+    def test_product_detail_keeps_reviews(self):
+        response = self.client.get(reverse('product-details', kwargs={'pk': self.product.id}))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['description'], "Over-ear headphones")
+        self.assertEqual(response.data['reviews'][0]['user_name'], "reviewer")
+
+    def test_cart_items_use_card(self):
+        self.client.force_authenticate(user=self.user)
+        Cart.objects.create(user=self.user, product=self.product, quantity=1)
+
+        response = self.client.get(reverse('cart'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('reviews', response.data['items'][0]['product'])
+
+
+class SiteSettingsCacheTest(APITestCase):
+    def setUp(self):
+        invalidate_site_settings()
+        self.url = reverse('site-settings')
+
+    def test_repeated_reads_do_not_query(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data['site_name'], 'Auntor Shopping Mall')
+
+        with self.assertNumQueries(0):
+            for _ in range(3):
+                response = self.client.get(self.url)
+            get_site_settings()
+        self.assertEqual(response.data, first.data)
+        self.assertIn('max-age=', response['Cache-Control'])
+
+    def test_conditional_request_returns_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_save_invalidates_every_worker(self):
+        etag = self.client.get(self.url)['ETag']
+        site_settings = SiteSettings.load()
+        site_settings.site_name = 'Auntor Bazaar'
+        with self.captureOnCommitCallbacks(execute=True):
+            site_settings.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['site_name'], 'Auntor Bazaar')
+        self.assertNotEqual(response['ETag'], etag)
+
+    @override_settings(SITE_SETTINGS_CACHE_TTL=0)
+    def test_other_workers_reload_after_version_bump(self):
+        self.client.get(self.url)
+        # Another worker saved: the row changed and the shared version moved,
+        # but this process's copy was never dropped.
+        SiteSettings.objects.filter(pk=1).update(site_name='Elsewhere')
+        caches['catalogue'].incr('site_settings:version')
+
+        self.assertEqual(get_site_settings().site_name, 'Elsewhere')
+
+    def test_admin_update(self):
+        admin = User.objects.create_superuser(username="owner", email="o@example.com", password="pass12345")
+        self.client.get(self.url)
+        self.client.force_authenticate(user=admin)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(self.url, {'hero_title': 'Fresh deals'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(self.url).data['hero_title'], 'Fresh deals')
+
+
+def make_image(name='photo.jpg', size=(1200, 800), mode='RGB', fmt='JPEG'):
+    buffer = BytesIO()
+    Image.new(mode, size, 'red').save(buffer, fmt)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type=f'image/{fmt.lower()}')
+
+
+@override_settings(IMAGE_DERIVATIVE_WIDTHS=[320, 640, 1600])
+class ImageDerivativeTest(APITestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        caches['catalogue'].clear()
+
+    def test_upload_queues_job_and_worker_builds_variants(self):
+        product = Product.objects.create(name="Lamp", price=Decimal('30.00'), image=make_image())
+
+        self.assertEqual(ImageJob.objects.get().status, 'queued')
+        self.assertEqual(Product.objects.get(pk=product.pk).image_variants, {})
+        card = self.client.get(reverse('products-list')).data['results'][0]
+        self.assertIsNone(card['image_srcset'])
+
+        self.assertEqual(run_image_jobs('test-worker'), 1)
+
+        product.refresh_from_db()
+        variants = product.image_variants
+        self.assertEqual(variants['source'], product.image.name)
+        self.assertEqual(set(variants['formats']['webp']), {'320', '640'})
+        self.assertIn('jpeg', variants['formats'])
+        with product.image.storage.open(variants['formats']['webp']['320']) as derivative:
+            self.assertEqual(Image.open(derivative).size, (320, 213))
+        self.assertEqual(ImageJob.objects.get().status, 'done')
+
+        card = self.client.get(reverse('products-list')).data['results'][0]
+        self.assertRegex(card['image_srcset']['webp'], r'^http://testserver/media/products/.+-320w\.webp 320w, .+-640w\.webp 640w$')
+        self.assertTrue(card['image_srcset']['jpeg'].startswith('http://testserver/media/'))
+
+    def test_replacing_image_rebuilds_and_removes_old_variants(self):
+        product = Product.objects.create(name="Lamp", price=Decimal('30.00'), image=make_image())
+        run_image_jobs('test-worker')
+        product.refresh_from_db()
+        old_names = [name for names in product.image_variants['formats'].values() for name in names.values()]
+
+        product.image = make_image('logo.png', size=(500, 500), mode='RGBA', fmt='PNG')
+        product.save()
+        self.assertEqual(ImageJob.objects.get().status, 'queued')
+        run_image_jobs('test-worker')
+
+        product.refresh_from_db()
+        self.assertEqual(set(product.image_variants['formats']), {'webp', 'png'})
+        self.assertTrue(all(not product.image.storage.exists(name) for name in old_names))
+
+    def test_saving_without_image_change_queues_nothing(self):
+        product = Product.objects.create(name="Lamp", price=Decimal('30.00'), image=make_image())
+        run_image_jobs('test-worker')
+        product.refresh_from_db()
+
+        product.name = "Desk lamp"
+        product.save()
+
+        self.assertEqual(ImageJob.objects.filter(status='queued').count(), 0)
+
+    def test_site_settings_backgrounds(self):
+        invalidate_site_settings()
+        site_settings = SiteSettings.load()
+        site_settings.hero_background_image = make_image('hero.jpg', size=(2000, 600))
+        site_settings.save()
+        call_command('process_image_jobs', '--once', stdout=StringIO())
+
+        response = self.client.get(reverse('site-settings'))
+
+        self.assertIn('320w', response.data['hero_background_srcset']['webp'])
+        self.assertIn('1600w', response.data['hero_background_srcset']['jpeg'])
+        self.assertIsNone(response.data['promo_background_srcset'])
+
+    def test_widths_are_resized_from_the_previous_derivative(self):
+        product = Product.objects.create(name="Lamp", price=Decimal('30.00'), image=make_image())
+        resize = Image.Image.resize
+        sources = []
+
+        def record_source(image, size, *args, **kwargs):
+            sources.append((image.size, size))
+            return resize(image, size, *args, **kwargs)
+
+        with mock.patch.object(Image.Image, 'resize', autospec=True, side_effect=record_source):
+            run_image_jobs('test-worker')
+
+        self.assertEqual(sources, [((1200, 800), (640, 427)), ((640, 427), (320, 213))])
+        product.refresh_from_db()
+        self.assertEqual(product.image_variants['width'], 1200)
+
+    def test_deleting_product_removes_jobs_and_variants(self):
+        product = Product.objects.create(name="Lamp", price=Decimal('30.00'), image=make_image())
+        run_image_jobs('test-worker')
+        product.refresh_from_db()
+        names = [name for names in product.image_variants['formats'].values() for name in names.values()]
+        storage = product.image.storage
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.delete()
+
+        self.assertFalse(ImageJob.objects.exists())
+        self.assertTrue(names)
+        self.assertTrue(all(not storage.exists(name) for name in names))
+
+    def test_undecodable_image_is_reported_without_retrying(self):
+        image = make_image()
+        truncated = SimpleUploadedFile('photo.jpg', image.read()[:2000], content_type='image/jpeg')
+        product = Product.objects.create(name="Lamp", price=Decimal('30.00'), image=truncated)
+
+        run_image_jobs('test-worker')
+
+        job = ImageJob.objects.get()
+        self.assertEqual((job.status, job.attempts), ('failed', 1))
+        product.refresh_from_db()
+        self.assertEqual(product.image_variants['source'], product.image.name)
+        self.assertIn('truncated', product.image_variants['error'])
+        self.assertIsNone(self.client.get(reverse('products-list')).data['results'][0]['image_srcset'])
+
+        admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='pass')
+        self.client.force_authenticate(user=admin)
+        response = self.client.put(reverse('product-update', args=[product.pk]), {'price': '31.00'}, format='json')
+        self.assertIn('truncated', response.data['image_error'])
+        product_admin = ProductAdmin(Product, admin_site)
+        self.assertFalse(product_admin.image_ok(product))
+        self.assertIn('truncated', product_admin.image_error(product))
+
+    def test_backfill_queues_images_without_variants(self):
+        product = Product.objects.create(name="Lamp", price=Decimal('30.00'), image=make_image())
+        ImageJob.objects.all().delete()
+
+        out = StringIO()
+        call_command('process_image_jobs', '--backfill', '--once', stdout=out)
+
+        self.assertIn('Queued 1 image jobs.', out.getvalue())
+        product.refresh_from_db()
+        self.assertEqual(product.image_variants['source'], product.image.name)
+
+    @override_settings(IMAGE_JOBS_REQUIRE_CLOUDINARY=True, USE_CLOUDINARY=False)
+    def test_worker_refuses_local_media_when_cloudinary_is_required(self):
+        Product.objects.create(name="Lamp", price=Decimal('30.00'), image=make_image())
+
+        with self.assertRaisesMessage(CommandError, 'Cloudinary is not configured'):
+            call_command('process_image_jobs', '--once', stdout=StringIO())
+
+        self.assertEqual(ImageJob.objects.get().status, 'queued')
+
+
+class ImageUploadTest(APITestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.admin = User.objects.create_superuser(username='admin', email='admin@example.com', password='pass')
+        self.client.force_authenticate(user=self.admin)
+
+    def create_product(self, image):
+        return self.client.post(
+            reverse('product-create'),
+            {'name': 'Lamp', 'description': 'Desk lamp', 'price': '30.00', 'image': image},
+            format='multipart',
+        )
+
+    def test_valid_image_is_accepted(self):
+        response = self.create_product(make_image())
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Product.objects.get().image.size, make_image().size)
+
+    @override_settings(IMAGE_UPLOAD_MAX_REQUEST_SIZE=1024)
+    def test_request_over_content_length_limit_is_rejected(self):
+        response = self.create_product(make_image())
+
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertFalse(Product.objects.exists())
+
+    @override_settings(IMAGE_UPLOAD_MAX_SIZE=1024)
+    def test_file_over_size_limit_is_rejected(self):
+        response = self.create_product(make_image())
+
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        self.assertFalse(Product.objects.exists())
+
+    def test_non_image_content_type_is_rejected(self):
+        response = self.create_product(SimpleUploadedFile('photo.jpg', b'\xff\xd8\xff' + b'0' * 64, content_type='text/html'))
+
+        self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+    def test_file_without_image_magic_bytes_is_rejected(self):
+        response = self.create_product(SimpleUploadedFile('photo.jpg', b'<html></html>', content_type='image/jpeg'))
+
+        self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+        self.assertFalse(Product.objects.exists())
+
+    def test_corrupt_header_is_rejected(self):
+        response = self.create_product(SimpleUploadedFile('photo.png', b'\x89PNG\r\n\x1a\n' + b'0' * 64, content_type='image/png'))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('image', response.data['detail'])
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=100 * 100)
+    def test_image_over_pixel_limit_is_rejected(self):
+        response = self.create_product(make_image(size=(200, 200)))
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('image', response.data['detail'])
+
+    def test_site_settings_upload_is_checked(self):
+        response = self.client.put(
+            reverse('site-settings'),
+            {'hero_background_image': SimpleUploadedFile('hero.jpg', b'GIF89a', content_type='image/jpeg')},
+            format='multipart',
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+    def test_json_update_is_unaffected(self):
+        product = Product.objects.create(name="Lamp", price=Decimal('30.00'))
+
+        response = self.client.put(reverse('product-update', args=[product.pk]), {'price': '35.00'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        product.refresh_from_db()
+        self.assertEqual(product.price, Decimal('35.00'))
+
+
+class CatalogueCacheTest(APITestCase):
+    def setUp(self):
+        caches['catalogue'].clear()
+        self.category = Category.objects.create(name="Audio")
+        self.product = Product.objects.create(
+            name="Speaker",
+            price=Decimal('40.00'),
+            stock=True,
+            category=self.category
+        )
+        self.url = reverse('products-list')
+
+    def test_anonymous_list_served_from_cache(self):
+        first = self.client.get(self.url, {'ordering': 'name', 'utm_source': 'mail'})
+        self.assertEqual(first['X-Cache'], 'MISS')
+
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url, {'utm_source': 'ads', 'ordering': 'name'})
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_conditional_request_returns_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_catalogue_writes_invalidate_cache(self):
+        etag = self.client.get(self.url)['ETag']
+        self.product.name = "Bookshelf Speaker"
+        self.product.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'][0]['name'], "Bookshelf Speaker")
+
+    def test_category_list_counts_in_one_query(self):
+        for name in ("Video", "Games", "Books"):
+            category = Category.objects.create(name=name)
+            Product.objects.create(name=f"{name} A", price=Decimal('5.00'), stock=True, category=category)
+            Product.objects.create(name=f"{name} B", price=Decimal('5.00'), stock=False, category=category)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('categories-list'))
+        self.assertEqual(
+            {row['name']: row['product_count'] for row in response.data},
+            {"Audio": 1, "Books": 1, "Games": 1, "Video": 1},
+        )
+
+        Product.objects.create(name="Books C", price=Decimal('5.00'), stock=True, category=category)
+        response = self.client.get(reverse('categories-list'))
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(next(row for row in response.data if row["name"] == "Books")["product_count"], 2)
+
+    def test_category_list_and_detail_are_cached(self):
+        self.client.get(reverse('categories-list'))
+        self.assertEqual(self.client.get(reverse('categories-list'))['X-Cache'], 'HIT')
+
+        detail_url = reverse('product-details', kwargs={'pk': self.product.id})
+        self.client.get(detail_url)
+        self.assertEqual(self.client.get(detail_url)['X-Cache'], 'HIT')
+
+    def test_authenticated_requests_bypass_cache(self):
+        user = User.objects.create_user(username="member", password="testpass123")
+        self.client.force_authenticate(user=user)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.has_header('X-Cache'))
+
+    def test_stats_endpoint_reports_hits_and_misses(self):
+        self.client.get(self.url)
+        self.client.get(self.url)
+        admin = User.objects.create_superuser(username="admin", password="testpass123")
+        self.client.force_authenticate(user=admin)
+
+        response = self.client.get(reverse('catalogue-cache-stats'))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['hits'], 1)
+        self.assertEqual(response.data['misses'], 1)
+
+    @override_settings(CACHE_WARMUP_HOST='testserver')
+    def test_warmup_prefills_catalogue_pages(self):
+        from product.cache import warm_catalogue_cache
+
+        self.assertEqual(warm_catalogue_cache(), 3)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, secure=True)
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+    def test_warmup_on_render_uses_the_external_hostname(self):
+        from product.cache import warm_catalogue_cache
+
+        host = 'auntor-shopping-mall-api.onrender.com'
+        environ = {'RENDER_EXTERNAL_HOSTNAME': host, 'ALLOWED_HOSTS': '.onrender.com'}
+        with mock.patch.dict(os.environ, environ):
+            os.environ.pop('CACHE_WARMUP_HOST', None)
+            render_settings = runpy.run_path(settings.BASE_DIR / 'my_project' / 'settings.py')
+        self.assertEqual(render_settings['CACHE_WARMUP_HOST'], host)
+
+        with override_settings(ALLOWED_HOSTS=['.onrender.com'], CACHE_WARMUP_HOST=render_settings['CACHE_WARMUP_HOST']):
+            warm_catalogue_cache()
+            response = self.client.get(self.url, secure=True, HTTP_HOST=host)
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+
+class ProductSearchTest(APITestCase):
+    def setUp(self):
+        caches['catalogue'].clear()
+        self.grocery = Category.objects.create(name="Groceries")
+        self.rice = Product.objects.create(
+            name="Basmati Rice 2kg",
+            description="Long grain rice",
+            price=Decimal('6.49'),
+            stock=True,
+            category=self.grocery
+        )
+        self.cooker = Product.objects.create(
+            name="Electric Cooker",
+            description="Cooks rice and steams vegetables",
+            price=Decimal('39.99'),
+            stock=True
+        )
+        self.url = reverse('products-list')
+
+    def _search(self, query):
+        response = self.client.get(self.url, {'search': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['id'] for item in response.data['results']]
+
+    def test_name_matches_rank_above_description_matches(self):
+        self.assertEqual(self._search('rice'), [self.rice.id, self.cooker.id])
+
+    def test_prefix_matching(self):
+        self.assertEqual(self._search('basm'), [self.rice.id])
+
+    def test_all_terms_must_match(self):
+        self.assertEqual(self._search('rice steams'), [self.cooker.id])
+
+    def test_category_names_are_searchable(self):
+        self.assertEqual(self._search('grocer'), [self.rice.id])
+
+    def test_index_follows_product_and_category_writes(self):
+        self.cooker.name = "Electric Kettle"
+        self.cooker.description = "Boils water"
+        self.cooker.save()
+        self.grocery.name = "Pantry"
+        self.grocery.save()
+
+        self.assertEqual(self._search('kettle'), [self.cooker.id])
+        self.assertEqual(self._search('pantry'), [self.rice.id])
+        self.assertEqual(self._search('grocer'), [])
+
+        self.rice.delete()
+        self.assertEqual(self._search('basmati'), [])
+
+    def test_rebuild_command_restores_index(self):
+        from product.search import get_search_backend
+
+        get_search_backend().remove_product(self.rice.id)
+        self.assertEqual(self._search('basmati'), [])
+
+        call_command('rebuild_search_index', stdout=StringIO())
+        caches['catalogue'].clear()
+        self.assertEqual(self._search('basmati'), [self.rice.id])
+
+
+    def test_fallback_backend_accepts_catalogue_writes(self):
+        from product.search import SEARCH_BACKENDS
+
+        with mock.patch.dict(SEARCH_BACKENDS, clear=True):
+            self.rice.name = "Jasmine Rice 2kg"
+            self.rice.save()
+            self.grocery.name = "Pantry"
+            self.grocery.save()
+            Category.objects.create(name="Snacks").delete()
+            self.assertEqual(self._search('jasmine'), [self.rice.id])
+
+class ProductCursorPaginationTest(APITestCase):
+    def setUp(self):
+        caches['catalogue'].clear()
+        self.category = Category.objects.create(name="Electronics")
+        # Repeated prices and names exercise the id tiebreaker.
+        for index in range(7):
+            Product.objects.create(
+                name=f"Gadget {index % 2}",
+                price=Decimal('10.00') + (index % 3),
+                category=self.category,
+            )
+        self.url = reverse('products-list')
+
+    def _walk(self, params):
+        ids = []
+        url = self.url
+        params = {'pagination': 'cursor', 'page_size': 3, **params}
+        while url:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            ids.extend(item['id'] for item in response.data['results'])
+            url, params = response.data['next'], None
+        return ids
+
+    def test_walks_every_ordering_without_gaps_or_duplicates(self):
+        products = Product.objects.all()
+        expected = {
+            'price_low': list(products.order_by('price', 'id').values_list('id', flat=True)),
+            'price_high': list(products.order_by('-price', '-id').values_list('id', flat=True)),
+            'name': list(products.order_by('name', 'id').values_list('id', flat=True)),
+            '-created_at': list(products.order_by('-created_at', '-id').values_list('id', flat=True)),
+            'rating': list(products.order_by('-average_rating', '-rating_count', '-id').values_list('id', flat=True)),
+        }
+        for ordering, ids in expected.items():
+            with self.subTest(ordering=ordering):
+                self.assertEqual(self._walk({'ordering': ordering}), ids)
+
+    def test_skips_count_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'pagination': 'cursor'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(any('COUNT(' in query['sql'].upper() for query in queries.captured_queries))
+
+    def test_invalid_cursor_returns_404(self):
+        for cursor in ['not-base64!', 'W10=']:
+            with self.subTest(cursor=cursor):
+                response = self.client.get(self.url, {'cursor': cursor})
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_page_numbers_remain_default(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['count'], 7)
+
+
+class ExplainProductQueriesCommandTest(TestCase):
+    def test_every_combination_is_served_by_an_index(self):
+        Category.objects.create(name="Electronics")
+        out = StringIO()
+        call_command('explain_product_queries', stdout=out)
+        plans = out.getvalue()
+        self.assertIn('top rated', plans)
+        if connection.vendor == 'sqlite':
+            self.assertNotIn('TEMP B-TREE', plans)
+            self.assertNotIn('SCAN product_product\n', plans)
+
+
+class CartSummaryQueryTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="shopper", password="testpass123")
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('cart')
+
+    def _add_items(self, count):
+        for index in range(count):
+            product = Product.objects.create(name=f"Item {index}", price=Decimal('2.50'), stock=True)
+            Cart.objects.create(user=self.user, product=product, quantity=index + 1)
+
+    def test_query_count_does_not_grow_with_cart_size(self):
+        for size in (1, 6):
+            Cart.objects.filter(user=self.user).delete()
+            self._add_items(size)
+            with self.subTest(size=size), self.assertNumQueries(1):
+                response = self.client.get(self.url)
+            self.assertEqual(response.data['total_items'], size)
+
+    def test_totals_are_computed_by_the_database(self):
+        self._add_items(3)
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['total_price'], Decimal('15.00'))
+        self.assertEqual(
+            set(response.data['items'][0]['product']),
+            {'id', 'name', 'price', 'stock', 'image'},
+        )
+
+    def test_empty_cart(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.data['total_items'], 0)
+        self.assertEqual(response.data['total_price'], 0)
+        self.assertEqual(response.data['items'], [])
+
+
+class CartBulkUpdateTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="syncer", password="testpass123")
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('cart')
+        self.products = [
+            Product.objects.create(name=f"Item {index}", price=Decimal('4.00'), stock=True)
+            for index in range(4)
+        ]
+        self.sold_out = Product.objects.create(name="Sold out", price=Decimal('1.00'), stock=False)
+
+    def _quantities(self):
+        return dict(Cart.objects.filter(user=self.user).values_list('product_id', 'quantity'))
+
+    def test_applies_set_increment_and_remove(self):
+        first, second, third, fourth = self.products
+        Cart.objects.create(user=self.user, product=first, quantity=2)
+        Cart.objects.create(user=self.user, product=second, quantity=1)
+        Cart.objects.create(user=self.user, product=third, quantity=5)
+
+        response = self.client.patch(self.url, [
+            {'product_id': first.id, 'op': 'increment', 'quantity': 3},
+            {'product_id': second.id, 'op': 'remove'},
+            {'product_id': third.id, 'op': 'set', 'quantity': 0},
+            {'product_id': fourth.id, 'quantity': 4},
+            {'product_id': fourth.id, 'op': 'increment', 'quantity': 1},
+        ], format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._quantities(), {first.id: 5, fourth.id: 5})
+        self.assertEqual(response.data['total_items'], 2)
+        self.assertEqual(response.data['total_price'], Decimal('40.00'))
+        self.assertEqual(response.data['changes'], {'created': 1, 'updated': 1, 'removed': 2})
+
+    def test_rejects_whole_batch_on_invalid_product(self):
+        response = self.client.patch(self.url, {'operations': [
+            {'product_id': self.products[0].id, 'quantity': 1},
+            {'product_id': self.sold_out.id, 'quantity': 1},
+            {'product_id': 999999, 'quantity': 1},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = response.data['operations']
+        self.assertEqual(errors[0], {})
+        self.assertIn('out of stock', str(errors[1]))
+        self.assertIn('does not exist', str(errors[2]))
+        self.assertEqual(self._quantities(), {})
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        def sync(quantity):
+            operations = [{'product_id': product.id, 'quantity': quantity} for product in self.products]
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.patch(self.url, operations, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len(queries)
+
+        self.assertEqual(sync(1), sync(2))
+        self.assertLessEqual(sync(3), 8)
+
+
+class CheckoutTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="buyer", password="testpass123")
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse('checkout')
+        self.rice = Product.objects.create(name="Rice", price=Decimal('3.50'), stock=True)
+        self.tea = Product.objects.create(name="Tea", price=Decimal('2.25'), stock=True)
+        Cart.objects.create(user=self.user, product=self.rice, quantity=2)
+        Cart.objects.create(user=self.user, product=self.tea, quantity=1)
+
+    def test_converts_cart_into_order(self):
+        response = self.client.post(self.url, {'address': '12 Lake Road'}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        order = OrderModel.objects.get(user=self.user)
+        self.assertEqual(response.data['id'], order.id)
+        self.assertEqual(order.total_price, Decimal('9.25'))
+        self.assertEqual(order.address, '12 Lake Road')
+        self.assertEqual(order.ordered_item, '2 x Rice, 1 x Tea')
+        self.assertEqual(
+            sorted(order.items.values_list('product_name', 'quantity', 'unit_price')),
+            [('Rice', 2, Decimal('3.50')), ('Tea', 1, Decimal('2.25'))]
+        )
+        self.assertFalse(Cart.objects.filter(user=self.user).exists())
+
+        # Later catalogue changes do not rewrite the order lines.
+        Product.objects.filter(pk=self.rice.pk).update(price=Decimal('9.99'))
+        self.assertEqual(order.items.get(product=self.rice).unit_price, Decimal('3.50'))
+
+    def test_same_idempotency_key_replays_the_order(self):
+        first = self.client.post(self.url, {}, format='json', HTTP_IDEMPOTENCY_KEY='checkout-1')
+        Cart.objects.create(user=self.user, product=self.tea, quantity=5)
+        replay = self.client.post(self.url, {}, format='json', HTTP_IDEMPOTENCY_KEY='checkout-1')
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(replay.status_code, status.HTTP_200_OK)
+        self.assertEqual(replay['Idempotent-Replayed'], 'true')
+        self.assertEqual(replay.data['id'], first.data['id'])
+        self.assertNotIn('checkout_key', replay.data)
+        self.assertEqual(OrderModel.objects.filter(user=self.user).count(), 1)
+        self.assertTrue(Cart.objects.filter(user=self.user).exists())
+
+    def test_request_waiting_for_lock_replays_concurrent_order(self):
+        # Simulate a same-key request committing while this one waits for
+        # the user lock: it must replay that order, not see an empty cart.
+        lock = User.objects.select_for_update
+        concurrent = []
+
+        def commit_concurrent_checkout_first():
+            if not concurrent:
+                concurrent.append(None)
+                concurrent[0] = self.client.post(self.url, {}, format='json', HTTP_IDEMPOTENCY_KEY='checkout-1')
+            return lock()
+
+        with mock.patch.object(User.objects, 'select_for_update', side_effect=commit_concurrent_checkout_first):
+            response = self.client.post(self.url, {}, format='json', HTTP_IDEMPOTENCY_KEY='checkout-1')
+
+        self.assertEqual(concurrent[0].status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['id'], concurrent[0].data['id'])
+        self.assertEqual(OrderModel.objects.filter(user=self.user).count(), 1)
+
+    def test_keys_are_scoped_per_user(self):
+        self.client.post(self.url, {}, format='json', HTTP_IDEMPOTENCY_KEY='shared')
+        other = User.objects.create_user(username="other", password="testpass123")
+        Cart.objects.create(user=other, product=self.rice, quantity=1)
+        self.client.force_authenticate(user=other)
+
+        response = self.client.post(self.url, {}, format='json', HTTP_IDEMPOTENCY_KEY='shared')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(OrderModel.objects.count(), 2)
+
+    def test_empty_cart_is_rejected(self):
+        Cart.objects.filter(user=self.user).delete()
+        response = self.client.post(self.url, {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(OrderModel.objects.exists())
+
+    def test_out_of_stock_item_rolls_back(self):
+        Product.objects.filter(pk=self.tea.pk).update(stock=False)
+        response = self.client.post(self.url, {}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('Tea', str(response.data))
+        self.assertFalse(OrderModel.objects.exists())
+        self.assertEqual(Cart.objects.filter(user=self.user).count(), 2)
+
+    def test_uses_saved_billing_address(self):
+        address = BillingAddress.objects.create(
+            name="Buyer Name", user=self.user, phone_number="01712345678", pin_code="1207",
+            house_no="House 5", landmark="Near Park", city="Dhaka", state="Dhaka"
+        )
+        response = self.client.post(self.url, {'address_id': address.id}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['name'], "Buyer Name")
+        self.assertEqual(response.data['address'], "House 5, Near Park, Dhaka, Dhaka - 1207")
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrentCheckoutTest(TransactionTestCase):
+    def test_same_key_checkouts_create_one_order(self):
+        user = User.objects.create_user(username="buyer", password="testpass123")
+        Cart.objects.create(user=user, product=Product.objects.create(name="Rice", price=Decimal('3.50')), quantity=2)
+        barrier = threading.Barrier(2)
+        responses = []
+
+        def checkout():
+            client = APIClient()
+            client.force_authenticate(user=user)
+            barrier.wait()
+            try:
+                responses.append(client.post(reverse('checkout'), {}, format='json', HTTP_IDEMPOTENCY_KEY='checkout-1'))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(
+            sorted(response.status_code for response in responses),
+            [status.HTTP_200_OK, status.HTTP_201_CREATED],
+        )
+        self.assertEqual(len({response.data['id'] for response in responses}), 1)
+        self.assertEqual(OrderModel.objects.filter(user=user).count(), 1)
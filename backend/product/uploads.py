@@ -0,0 +1,111 @@
+"""Streaming handling of product and site image uploads.
+
+``StreamingImageUploadMixin`` replaces the default upload handlers of a
+view, so multipart bodies go straight to temporary files rather than being
+buffered in memory. ``ImageUploadHandler`` runs in front of the temporary
+file handler and rejects a request as early as it can: on ``Content-Length``
+before the body is read, on the part's declared content type, on the magic
+bytes of the first chunk and as soon as a file passes the size limit.
+
+``UploadedImageField`` then checks only the image header (format and pixel
+dimensions). Pixels are decoded by the image derivative worker
+(``product.images``), outside the request.
+"""
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, TemporaryFileUploadHandler
+from PIL import Image
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+
+# Leading bytes of each accepted format; WebP also carries "WEBP" at offset 8.
+IMAGE_SIGNATURES = {
+    'JPEG': b'\xff\xd8\xff',
+    'PNG': b'\x89PNG\r\n\x1a\n',
+    'WEBP': b'RIFF',
+}
+IMAGE_CONTENT_TYPES = {'image/jpeg', 'image/png', 'image/webp', 'application/octet-stream'}
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Upload is too large.'
+    default_code = 'upload_too_large'
+
+
+class UnsupportedImage(APIException):
+    status_code = status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+    default_detail = 'Upload a JPEG, PNG or WebP image.'
+    default_code = 'unsupported_image'
+
+
+def sniff_image_format(head):
+    """Return the format named by the magic bytes in ``head``, or None."""
+    for image_format, signature in IMAGE_SIGNATURES.items():
+        if head.startswith(signature) and (image_format != 'WEBP' or head[8:12] == b'WEBP'):
+            return image_format
+    return None
+
+
+class ImageUploadHandler(FileUploadHandler):
+    """Reject oversized or non-image uploads while the body is still arriving.
+
+    Chunks are passed on unchanged to the next handler.
+    """
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length > settings.IMAGE_UPLOAD_MAX_REQUEST_SIZE:
+            raise UploadTooLarge()
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        if content_type not in IMAGE_CONTENT_TYPES:
+            raise UnsupportedImage()
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        if start == 0 and sniff_image_format(raw_data[:12]) is None:
+            raise UnsupportedImage()
+        self.received += len(raw_data)
+        if self.received > settings.IMAGE_UPLOAD_MAX_SIZE:
+            raise UploadTooLarge(f'Images may be at most {settings.IMAGE_UPLOAD_MAX_SIZE // (1024 * 1024)}MB.')
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+
+class StreamingImageUploadMixin:
+    """Stream the view's multipart uploads to temporary files through ``ImageUploadHandler``."""
+
+    def initialize_request(self, request, *args, **kwargs):
+        request.upload_handlers = [ImageUploadHandler(request), TemporaryFileUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
+
+
+class UploadedImageField(serializers.FileField):
+    """Image field that reads only the image header in the request.
+
+    DRF's ``ImageField`` decodes the upload with ``Image.verify()`` while the
+    request waits; here the format and pixel count are checked from the
+    header, and the pixels are decoded later by the derivative worker.
+    """
+    default_error_messages = {
+        'invalid_image': 'Upload a valid image. The file you uploaded was either not an image or a corrupted image.',
+        'too_many_pixels': 'Images may be at most {max_pixels} pixels.',
+    }
+
+    def to_internal_value(self, data):
+        file = super().to_internal_value(data)
+        try:
+            # Image.open() parses the header without decoding pixel data.
+            with Image.open(file) as image:
+                image_format, (width, height) = image.format, image.size
+        except Exception:
+            self.fail('invalid_image')
+        finally:
+            file.seek(0)
+        if image_format not in IMAGE_SIGNATURES:
+            self.fail('invalid_image')
+        if width * height > settings.IMAGE_UPLOAD_MAX_PIXELS:
+            self.fail('too_many_pixels', max_pixels=settings.IMAGE_UPLOAD_MAX_PIXELS)
+        return file
@@ -13,12 +13,16 @@ urlpatterns = [
     path('categories/', views.CategoryListView.as_view(), name="categories-list"),
     path('category-create/', views.CategoryCreateView.as_view(), name="category-create"),
     path('site-settings/', views.SiteSettingsView.as_view(), name='site-settings'),
+    path('catalogue-cache/stats/', views.CatalogueCacheStatsView.as_view(), name='catalogue-cache-stats'),
     
     # Cart URLs
     path('cart/', views.CartView.as_view(), name="cart"),
     path('cart/item/<int:pk>/', views.CartItemView.as_view(), name="cart-item"),
     path('cart/clear/', views.CartClearView.as_view(), name="cart-clear"),
     
+    # Checkout URLs
+    path('checkout/', views.CheckoutView.as_view(), name="checkout"),
+    
     # Wishlist URLs
     path('wishlist/', views.WishlistView.as_view(), name="wishlist"),
     path('wishlist/item/<int:pk>/', views.WishlistItemView.as_view(), name="wishlist-item"),
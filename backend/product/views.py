@@ -1,5 +1,8 @@
+from django.conf import settings
 from django.shortcuts import get_object_or_404
-from django.db.models import Q, Avg, Count
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Prefetch, Q, Sum, Window
+from django.db.models.functions import RowNumber
+from django.utils.http import parse_etags
 from rest_framework import status, permissions, filters
 from rest_framework.views import APIView
 from rest_framework.response import Response
@@ -8,20 +11,106 @@ from rest_framework.pagination import PageNumberPagination
 from django_filters.rest_framework import DjangoFilterBackend
 from django_filters import rest_framework as django_filters
 
+from account.models import OrderModel
+from account.serializers import AllOrdersListSerializer
+from my_project.filters import parse_bool
+from my_project.pagination import KeysetPagination, cursor_requested
+from my_project.serializers import get_requested_fields
+
+from .cache import cache_catalogue_response, get_catalogue_cache_stats, get_site_settings_snapshot
 from .models import Product, Category, Cart, Wishlist, Review, SiteSettings
+from .search import search_products
+from .uploads import StreamingImageUploadMixin
 from .serializers import (
-    ProductSerializer, ProductCreateUpdateSerializer, CategorySerializer,
-    CartItemSerializer, WishlistItemSerializer, ReviewSerializer,
+    ProductSerializer, ProductCardSerializer, ProductCreateUpdateSerializer, CategorySerializer,
+    CartItemSerializer, CartBulkUpdateSerializer, CheckoutSerializer, WishlistItemSerializer, ReviewSerializer,
     CartSummarySerializer, SiteSettingsSerializer
 )
 
 
+PRODUCT_LIST_QUERY_PARAMS = (
+    'search', 'price_min', 'price_max', 'category', 'stock', 'featured',
+    'ordering', 'page', 'page_size', 'view', 'fields', 'pagination', 'cursor',
+)
+
+PRODUCT_SERIALIZERS = {
+    'card': ProductCardSerializer,
+    'full': ProductSerializer,
+}
+
+
+# Newest reviews embedded per product by the full product serializer; the
+# rest are paged through ProductReviewsView.
+EMBEDDED_REVIEW_COUNT = 5
+
+
+def with_review_authors(queryset):
+    # Prefetch cannot take a sliced queryset on Django 4.2, so number each
+    # product's reviews and keep the first few.
+    latest = Review.objects.select_related('user').annotate(
+        position=Window(
+            RowNumber(),
+            partition_by=F('product_id'),
+            order_by=[F('created_at').desc(), F('id').desc()],
+        )
+    ).filter(position__lte=EMBEDDED_REVIEW_COUNT).order_by('-created_at', '-id')
+    return queryset.prefetch_related(Prefetch('reviews', queryset=latest))
+
+
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 12
     page_size_query_param = 'page_size'
     max_page_size = 100
 
 
+PRODUCT_ORDERINGS = {
+    'price_low': ['price', 'id'],
+    'price_high': ['-price', '-id'],
+    'rating': ['-average_rating', '-rating_count', '-id'],
+    'name': ['name', 'id'],
+    '-created_at': ['-created_at', '-id'],
+}
+
+
+def filter_products(products, params):
+    """Apply the product list filters and ordering from ``params``.
+
+    Returns the filtered queryset and the ``order_by`` fields, which always
+    end in ``id`` so cursor pagination has a unique position.
+    """
+    # Price range filter
+    price_min = params.get('price_min')
+    price_max = params.get('price_max')
+    if price_min:
+        products = products.filter(price__gte=price_min)
+    if price_max:
+        products = products.filter(price__lte=price_max)
+    
+    # Category filter
+    category = params.get('category')
+    if category:
+        products = products.filter(category_id=category)
+    
+    # Stock filter
+    stock_filter = params.get('stock')
+    if stock_filter is not None:
+        products = products.filter(stock=stock_filter.lower() == 'true')
+    
+    # Featured filter
+    featured = params.get('featured')
+    if featured:
+        products = products.filter(is_featured=featured.lower() == 'true')
+    
+    search = params.get('search', '')
+    ordering = params.get('ordering', 'relevance' if search else '-created_at')
+    if ordering == 'relevance' and search:
+        order_by = ['-search_rank', '-created_at', '-id']
+    else:
+        # Default: newest first
+        order_by = PRODUCT_ORDERINGS.get(ordering, PRODUCT_ORDERINGS['-created_at'])
+    return products.order_by(*order_by), order_by
+
+
 class ProductFilter(django_filters.FilterSet):
     name = django_filters.CharFilter(lookup_expr='icontains')
     description = django_filters.CharFilter(lookup_expr='icontains')
@@ -44,72 +133,47 @@ class ProductView(APIView):
     ordering_fields = ['name', 'price', 'created_at', 'average_rating']
     ordering = ['-created_at']
 
+    @cache_catalogue_response('products', query_params=PRODUCT_LIST_QUERY_PARAMS)
     def get(self, request):
-        products = Product.objects.all().select_related('category').prefetch_related('reviews')
+        serializer_class = PRODUCT_SERIALIZERS.get(request.GET.get('view'), ProductCardSerializer)
+        products = Product.objects.all().select_related('category')
+        if serializer_class is ProductSerializer:
+            products = with_review_authors(products)
+        else:
+            products = products.defer('description')
         
         search = request.GET.get('search', '')
         if search:
-            products = products.filter(
-                Q(name__icontains=search) | 
-                Q(description__icontains=search) |
-                Q(category__name__icontains=search)
-            )
-        
-        # Price range filter
-        price_min = request.GET.get('price_min')
-        price_max = request.GET.get('price_max')
-        if price_min:
-            products = products.filter(price__gte=price_min)
-        if price_max:
-            products = products.filter(price__lte=price_max)
+            products = search_products(products, search)
         
-        # Category filter
-        category = request.GET.get('category')
-        if category:
-            products = products.filter(category_id=category)
+        products, order_by = filter_products(products, request.GET)
         
-        # Stock filter
-        stock_filter = request.GET.get('stock')
-        if stock_filter is not None:
-            products = products.filter(stock=stock_filter.lower() == 'true')
-        
-        # Featured filter
-        featured = request.GET.get('featured')
-        if featured:
-            products = products.filter(is_featured=featured.lower() == 'true')
-        
-        ordering = request.GET.get('ordering', '-created_at')
-        if ordering == 'price_low':
-            products = products.order_by('price')
-        elif ordering == 'price_high':
-            products = products.order_by('-price')
-        elif ordering == 'rating':
-            products = products.annotate(avg_rating=Avg('reviews__rating')).order_by('-avg_rating')
-        elif ordering == 'name':
-            products = products.order_by('name')
+        # Pagination. Keyset (cursor) mode is opt-in and needs a plain column
+        # ordering, so relevance-ranked searches keep page numbers.
+        if cursor_requested(request) and order_by[0] != '-search_rank':
+            paginator = KeysetPagination(order_by)
         else:
-            products = products.order_by('-created_at')  # Default: newest first
-        
-        # Pagination
-        paginator = self.pagination_class()
+            paginator = self.pagination_class()
         page = paginator.paginate_queryset(products, request)
         
+        fields = get_requested_fields(request)
         if page is not None:
-            serializer = ProductSerializer(page, many=True, context={'request': request})
+            serializer = serializer_class(page, many=True, context={'request': request}, fields=fields)
             return paginator.get_paginated_response(serializer.data)
         
-        serializer = ProductSerializer(products, many=True, context={'request': request})
+        serializer = serializer_class(products, many=True, context={'request': request}, fields=fields)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
 class ProductDetailView(APIView):
+    @cache_catalogue_response('product', query_params=('fields',))
     def get(self, request, pk):
-        product = get_object_or_404(Product, id=pk)
-        serializer = ProductSerializer(product, context={'request': request})
+        product = get_object_or_404(with_review_authors(Product.objects.select_related('category')), id=pk)
+        serializer = ProductSerializer(product, context={'request': request}, fields=get_requested_fields(request))
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
-class ProductCreateView(APIView):
+class ProductCreateView(StreamingImageUploadMixin, APIView):
     permission_classes = [permissions.IsAdminUser]
 
     def post(self, request):
@@ -132,7 +196,7 @@ class ProductDeleteView(APIView):
             return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
 
 
-class ProductEditView(APIView):
+class ProductEditView(StreamingImageUploadMixin, APIView):
     permission_classes = [permissions.IsAdminUser]
 
     def put(self, request, pk):
@@ -149,13 +213,25 @@ class ProductEditView(APIView):
 
 
 # Category Views
+def with_product_counts(queryset):
+    return queryset.annotate(in_stock_count=Count('products', filter=Q(products__stock=True)))
+
+
 class CategoryListView(APIView):
+    @cache_catalogue_response('categories', query_params=())
     def get(self, request):
-        categories = Category.objects.all()
+        categories = with_product_counts(Category.objects.all())
         serializer = CategorySerializer(categories, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+class CatalogueCacheStatsView(APIView):
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request):
+        return Response(get_catalogue_cache_stats(), status=status.HTTP_200_OK)
+
+
 class CategoryCreateView(APIView):
     permission_classes = [permissions.IsAdminUser]
     
@@ -167,7 +243,7 @@ class CategoryCreateView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class SiteSettingsView(APIView):
+class SiteSettingsView(StreamingImageUploadMixin, APIView):
     def get_permissions(self):
         if self.request.method in ['PUT', 'PATCH']:
             return [permissions.IsAdminUser()]
@@ -177,8 +253,17 @@ class SiteSettingsView(APIView):
         return SiteSettings.load()
 
     def get(self, request):
-        serializer = SiteSettingsSerializer(self.get_object(), context={'request': request})
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        site_settings, version = get_site_settings_snapshot()
+        headers = {
+            'ETag': f'"site-settings-{version}"',
+            'Cache-Control': f'public, max-age={settings.SITE_SETTINGS_MAX_AGE}',
+        }
+        if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        if headers['ETag'] in if_none_match or '*' in if_none_match:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        serializer = SiteSettingsSerializer(site_settings, context={'request': request})
+        return Response(serializer.data, status=status.HTTP_200_OK, headers=headers)
 
     def put(self, request):
         serializer = SiteSettingsSerializer(
@@ -194,23 +279,38 @@ class SiteSettingsView(APIView):
 
 
 # Cart Views
+def cart_with_totals(user):
+    """Cart lines for ``user`` with the cart total attached to every row.
+
+    The total is a window aggregate over the same query, so the summary,
+    the lines and their product snapshots come back in one round trip.
+    """
+    line_total = ExpressionWrapper(
+        F('quantity') * F('product__price'),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+    return Cart.objects.filter(user=user).select_related('product').only(
+        'id', 'quantity', 'created_at', 'updated_at', 'product_id',
+        'product__id', 'product__name', 'product__price', 'product__stock', 'product__image',
+    ).annotate(
+        cart_total=Window(Sum(line_total), output_field=DecimalField(max_digits=12, decimal_places=2)),
+    )
+
+
 class CartView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        cart_items = Cart.objects.filter(user=request.user).select_related('product')
-        total_items = cart_items.count()
-        total_price = sum(item.total_price for item in cart_items)
-        
-        serializer = CartItemSerializer(cart_items, many=True)
-        
-        response_data = {
-            'total_items': total_items,
-            'total_price': total_price,
+        return Response(self.get_summary(request), status=status.HTTP_200_OK)
+
+    def get_summary(self, request):
+        cart_items = list(cart_with_totals(request.user))
+        serializer = CartItemSerializer(cart_items, many=True, context={'request': request})
+        return {
+            'total_items': len(cart_items),
+            'total_price': cart_items[0].cart_total if cart_items else 0,
             'items': serializer.data
         }
-        
-        return Response(response_data, status=status.HTTP_200_OK)
 
     def post(self, request):
         serializer = CartItemSerializer(data=request.data, context={'request': request})
@@ -219,6 +319,17 @@ class CartView(APIView):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    def patch(self, request):
+        """Apply a list of set/increment/remove operations to the cart at once."""
+        data = request.data
+        if isinstance(data, list):
+            data = {'operations': data}
+        serializer = CartBulkUpdateSerializer(data=data, context={'request': request})
+        if serializer.is_valid():
+            changes = serializer.save()
+            return Response({**self.get_summary(request), 'changes': changes}, status=status.HTTP_200_OK)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
 
 class CartItemView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -252,13 +363,39 @@ class CartClearView(APIView):
         return Response({"detail": "Cart cleared."}, status=status.HTTP_204_NO_CONTENT)
 
 
+# Checkout Views
+class CheckoutView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        idempotency_key = request.headers.get('Idempotency-Key') or None
+        if idempotency_key is not None and len(idempotency_key) > 64:
+            return Response(
+                {"detail": "Idempotency-Key must be at most 64 characters."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        serializer = CheckoutSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        order, created = serializer.save(idempotency_key=idempotency_key)
+
+        order = OrderModel.objects.prefetch_related('items').get(pk=order.pk)
+        response = Response(
+            AllOrdersListSerializer(order).data,
+            status=status.HTTP_201_CREATED if created else status.HTTP_200_OK
+        )
+        if not created:
+            response['Idempotent-Replayed'] = 'true'
+        return response
+
+
 # Wishlist Views
 class WishlistView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
         wishlist_items = Wishlist.objects.filter(user=request.user).select_related('product')
-        serializer = WishlistItemSerializer(wishlist_items, many=True)
+        serializer = WishlistItemSerializer(wishlist_items, many=True, context={'request': request})
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     def post(self, request):
@@ -282,16 +419,53 @@ class WishlistItemView(APIView):
 
 
 # Review Views
+def filter_reviews(reviews, params):
+    """Apply the review list filters from ``params``.
+
+    ``rating`` takes comma-separated star ratings and ``verified``
+    true/false. Raises ``ValueError`` for values that cannot be parsed.
+    """
+    ratings = [value for value in params.get('rating', '').split(',') if value]
+    if ratings:
+        if not all(value in ('1', '2', '3', '4', '5') for value in ratings):
+            raise ValueError(f"Invalid rating: {params['rating']}")
+        reviews = reviews.filter(rating__in=[int(value) for value in ratings])
+    if params.get('verified'):
+        reviews = reviews.filter(is_verified=parse_bool(params['verified']))
+    return reviews
+
+
 class ProductReviewsView(APIView):
+    """A product's reviews, newest first, cursor-paginated.
+
+    The star histogram and totals come from the counters stored on the
+    product, so they cost no aggregate query whatever the review count.
+    """
+    ordering = ['-created_at', '-id']
+
     def get(self, request, product_id):
-        try:
-            product = Product.objects.get(id=product_id)
-        except Product.DoesNotExist:
+        product = Product.objects.filter(id=product_id).only(
+            'id', 'rating_count', 'average_rating', *Product.RATING_COUNT_FIELDS.values()
+        ).first()
+        if product is None:
             return Response({"detail": "Product not found."}, status=status.HTTP_404_NOT_FOUND)
-        
-        reviews = Review.objects.filter(product=product).select_related('user')
-        serializer = ReviewSerializer(reviews, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+
+        try:
+            reviews = filter_reviews(Review.objects.filter(product=product), request.query_params)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        paginator = KeysetPagination(self.ordering)
+        paginator.page_size = 10
+        page = paginator.paginate_queryset(reviews.select_related('user'), request)
+        serializer = ReviewSerializer(page, many=True)
+        return Response({
+            'next': paginator.get_next_link(),
+            'review_count': product.rating_count,
+            'average_rating': product.average_rating,
+            'rating_histogram': product.rating_histogram,
+            'results': serializer.data,
+        }, status=status.HTTP_200_OK)
 
     def post(self, request, product_id):
         if not request.user.is_authenticated:
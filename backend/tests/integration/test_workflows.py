@@ -3,13 +3,15 @@ Integration tests for complete user workflows
 """
 from django.test import TestCase, TransactionTestCase
 from django.contrib.auth.models import User
+from django.core.management import call_command
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
 from decimal import Decimal
 from datetime import datetime, timezone
+from io import StringIO
 
-from account.models import BillingAddress, OrderModel
+from account.models import BillingAddress, OrderItem, OrderModel
 from product.models import Category, Product, Cart, Wishlist, Review
 from payments.models import PaymentMethod, Payment, BkashPayment
 
@@ -450,8 +452,10 @@ class PaymentWorkflowTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertTrue(response.data['success'])
         self.assertIn('payment', response.data)
+        self.assertEqual(response.data['payment']['status'], 'pending')
         
-        # Step 3: Verify payment was created
+        # Step 3: Let the payment worker process it and verify the payment
+        call_command('process_payment_jobs', '--once', stdout=StringIO())
         payment = Payment.objects.get(user=self.user)
         self.assertEqual(payment.amount, Decimal('100.00'))
         self.assertEqual(payment.status, 'completed')
@@ -481,7 +485,8 @@ class PaymentWorkflowTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertTrue(response.data['success'])
         
-        # Verify payment was created
+        # Verify payment was processed by the worker
+        call_command('process_payment_jobs', '--once', stdout=StringIO())
         payment = Payment.objects.get(user=self.user, amount=Decimal('200.00'))
         self.assertEqual(payment.status, 'completed')
         self.assertEqual(payment.card_last_four, '1111')
@@ -517,13 +522,19 @@ class ReviewWorkflowTest(APITestCase):
             paid_status=True,
             total_price=Decimal('99.99')
         )
+        OrderItem.objects.create(
+            order=self.order,
+            product=self.product,
+            product_name=self.product.name,
+            unit_price=self.product.price
+        )
         
     def test_complete_review_workflow(self):
         """Test complete product review workflow"""
         # Step 1: Get product reviews (should be empty)
         response = self.client.get(f'/api/products/{self.product.id}/reviews/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 0)
+        self.assertEqual(len(response.data['results']), 0)
         
         # Step 2: Add product review
         review_data = {
@@ -542,8 +553,8 @@ class ReviewWorkflowTest(APITestCase):
         # Step 4: Get product reviews (should show new review)
         response = self.client.get(f'/api/products/{self.product.id}/reviews/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]['rating'], 5)
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertEqual(response.data['results'][0]['rating'], 5)
         
         # Step 5: Update review
         updated_review_data = {
@@ -1,8 +1,11 @@
 """
 Performance tests for the e-commerce application
 """
+import os
 import time
 import threading
+import tracemalloc
+from unittest import skipUnless
 from django.test import TestCase, TransactionTestCase
 from django.contrib.auth.models import User
 from rest_framework.test import APITestCase, APIClient
@@ -383,6 +386,44 @@ class MemoryPerformanceTest(TestCase):
             self.assertEqual(count, 1000)
 
 
+@skipUnless(os.getenv('RUN_EXPORT_BENCHMARK'), 'set RUN_EXPORT_BENCHMARK=1 to export 1M rows')
+class ExportMemoryBenchmark(TransactionTestCase):
+    """Streaming exports keep memory flat however many rows they write"""
+
+    ROWS = 1_000_000
+    BATCH = 10_000
+
+    def setUp(self):
+        category = Category.objects.create(name='Bulk')
+        for start in range(0, self.ROWS, self.BATCH):
+            Product.objects.bulk_create(
+                Product(name=f'Product {i}', price=Decimal('9.99'), category=category)
+                for i in range(start, start + self.BATCH)
+            )
+        admin = User.objects.create_superuser('exporter', 'exporter@example.com', 'pass12345')
+        self.client = APIClient()
+        self.client.force_authenticate(user=admin)
+
+    def test_product_export_memory_stays_flat(self):
+        response = self.client.get('/api/analytics/export/products.csv')
+        self.assertEqual(response.status_code, 200)
+
+        lines = 0
+        samples = []
+        tracemalloc.start()
+        try:
+            for chunk in response.streaming_content:
+                lines += chunk.count(b'\n')
+                if lines // 100_000 > len(samples):
+                    samples.append(tracemalloc.get_traced_memory()[0] / 1024 / 1024)  # MB
+        finally:
+            tracemalloc.stop()
+
+        self.assertEqual(lines, self.ROWS + 1)
+        # Growth after the first 100k rows would mean rows are being kept.
+        self.assertLess(max(samples) - samples[0], 20)
+
+
 class CachePerformanceTest(TestCase):
     """Test caching performance"""
     
@@ -8,7 +8,8 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from decimal import Decimal
 from datetime import datetime, timezone
 
-from account.models import BillingAddress, OrderModel
+from account.models import BillingAddress, OrderItem, OrderModel
+from account.ordered_items import parse_ordered_item
 from product.models import Category, Product, Cart, Wishlist, Review
 from payments.models import PaymentMethod, Payment, BkashPayment, CardPayment, PaymentLog
 
@@ -294,12 +295,18 @@ class ReviewModelTest(TestCase):
     def test_auto_verification(self):
         """Test auto-verification when user has purchased product"""
         # Create an order with the product
-        OrderModel.objects.create(
+        order = OrderModel.objects.create(
             name='Test Order',
             ordered_item='Test Product',
             user=self.user,
             paid_status=True
         )
+        OrderItem.objects.create(
+            order=order,
+            product=self.product,
+            product_name=self.product.name,
+            unit_price=self.product.price
+        )
         
         # Create review
         review = Review.objects.create(
@@ -311,6 +318,77 @@ class ReviewModelTest(TestCase):
         
         self.assertTrue(review.is_verified)
 
+    def test_similar_product_name_does_not_verify(self):
+        """Test that buying a product with a similar name does not verify"""
+        other = Product.objects.create(name='Test Product Pro', price=Decimal('20.00'))
+        order = OrderModel.objects.create(
+            name='Test Order',
+            ordered_item='Test Product Pro',
+            user=self.user,
+            paid_status=True
+        )
+        OrderItem.objects.create(order=order, product=other, product_name=other.name, unit_price=other.price)
+
+        review = Review.objects.create(product=self.product, user=self.user, rating=4, comment='Good')
+        self.assertFalse(review.is_verified)
+
+    def test_unpaid_order_does_not_verify(self):
+        """Test that an unpaid order does not verify a review"""
+        order = OrderModel.objects.create(name='Test Order', user=self.user, paid_status=False)
+        OrderItem.objects.create(
+            order=order, product=self.product, product_name=self.product.name, unit_price=self.product.price
+        )
+
+        review = Review.objects.create(product=self.product, user=self.user, rating=4, comment='Good')
+        self.assertFalse(review.is_verified)
+
+
+class OrderedItemParsingTest(TestCase):
+    """Test parsing of the legacy ordered_item text"""
+
+    def test_single_and_comma_separated_items(self):
+        self.assertEqual(parse_ordered_item('Office Chair'), [('Office Chair', 1)])
+        self.assertEqual(
+            parse_ordered_item('Product 1, Product 2'),
+            [('Product 1', 1), ('Product 2', 1)]
+        )
+
+    def test_quantities(self):
+        self.assertEqual(
+            parse_ordered_item('2 x Rice; Tea x3\nMango (4)'),
+            [('Rice', 2), ('Tea', 3), ('Mango', 4)]
+        )
+
+    def test_known_name_containing_separator(self):
+        self.assertEqual(
+            parse_ordered_item('Rice, Basmati', known_names={'rice, basmati'}),
+            [('Rice, Basmati', 1)]
+        )
+
+    def test_placeholders(self):
+        self.assertEqual(parse_ordered_item('Not Set'), [])
+        self.assertEqual(parse_ordered_item(None), [])
+
+    def test_backfill_migration_creates_items(self):
+        from importlib import import_module
+        from django.apps import apps
+
+        migration = import_module('account.migrations.0027_backfill_order_items')
+        user = User.objects.create_user('buyer')
+        chair = Product.objects.create(name='Office Chair', price=Decimal('120.00'))
+        desk = Product.objects.create(name='Desk', price=Decimal('300.00'))
+        order = OrderModel.objects.create(
+            name='Legacy', user=user, ordered_item='office chair x 2, Desk, Unknown Lamp'
+        )
+
+        migration.backfill_order_items(apps, None)
+
+        items = {item.product_id: item for item in order.items.all()}
+        self.assertEqual(set(items), {chair.id, desk.id})
+        self.assertEqual(items[chair.id].quantity, 2)
+        self.assertEqual(items[chair.id].product_name, 'Office Chair')
+        self.assertEqual(items[desk.id].unit_price, Decimal('300.00'))
+
 
 class PaymentModelTest(TestCase):
     """Test Payment models"""
@@ -551,4 +551,71 @@ class OrderViewTest(APITestCase):
             'delivered_at': '2023-12-01T10:00:00Z'
         }
         response = self.client.put(url, data)
-        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN) 
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN) 
+
+
+class OrderListPaginationTest(APITestCase):
+    """Test filtering, field selection and cursor pagination of the order list"""
+
+    def setUp(self):
+        self.user = User.objects.create_user('shopper', 'shopper@example.com', 'testpass123')
+        self.other = User.objects.create_user('other', 'other@example.com', 'testpass123')
+        self.staff = User.objects.create_user('staff', 'staff@example.com', 'staffpass', is_staff=True)
+        self.orders = [
+            OrderModel.objects.create(
+                name=f'Order {index}',
+                user=self.user if index < 4 else self.other,
+                paid_status=index % 2 == 0,
+                is_delivered=index == 0,
+                paid_at='2024-01-0%dT10:00:00Z' % (index + 1),
+            )
+            for index in range(6)
+        ]
+        self.url = '/account/all-orders-list/'
+
+    def _names(self, rows):
+        return [row['name'] for row in rows]
+
+    def test_default_response_is_full_list_newest_first(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.url)
+        self.assertEqual(self._names(response.data), ['Order 3', 'Order 2', 'Order 1', 'Order 0'])
+
+    def test_cursor_pages_for_staff(self):
+        self.client.force_authenticate(user=self.staff)
+        seen = []
+        response = self.client.get(self.url, {'pagination': 'cursor', 'page_size': 4})
+        while True:
+            seen += self._names(response.data['results'])
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        self.assertEqual(seen, [f'Order {index}' for index in range(5, -1, -1)])
+
+    def test_filters(self):
+        self.client.force_authenticate(user=self.staff)
+        cases = [
+            ({'paid': 'true'}, ['Order 4', 'Order 2', 'Order 0']),
+            ({'paid': 'true', 'delivered': 'false'}, ['Order 4', 'Order 2']),
+            ({'user': str(self.other.id)}, ['Order 5', 'Order 4']),
+            ({'date_from': '2024-01-02', 'date_to': '2024-01-03'}, ['Order 2', 'Order 1']),
+        ]
+        for params, expected in cases:
+            with self.subTest(params=params):
+                self.assertEqual(self._names(self.client.get(self.url, params).data), expected)
+
+    def test_customers_cannot_list_other_users_orders(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.url, {'user': str(self.other.id)})
+        self.assertEqual(self._names(response.data), ['Order 3', 'Order 2', 'Order 1', 'Order 0'])
+
+    def test_invalid_filter_is_rejected(self):
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.get(self.url, {'paid': 'maybe'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_field_selection_skips_items(self):
+        self.client.force_authenticate(user=self.user)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {'fields': 'id,name,paid_status'})
+        self.assertEqual(set(response.data[0]), {'id', 'name', 'paid_status'})